@@ -77,6 +77,31 @@ app.add_middleware(
 )
 
 
+# ============================================================================
+# 生命周期
+# ============================================================================
+
+@app.on_event("startup")
+def startup_system():
+    """初始化共享的系统实例（知识库、向量存储、embedding 模型）"""
+    from .system import init_system
+    init_system()
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    """关闭数据库连接池"""
+    from knowledge_base.db_connection import close_pg_pool
+    close_pg_pool()
+
+
+@app.on_event("shutdown")
+def close_converter():
+    """关闭 LibreOffice 转换池"""
+    from utils import close_doc_converter
+    close_doc_converter()
+
+
 # ============================================================================
 # 注册路由
 # ============================================================================
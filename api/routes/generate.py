@@ -9,7 +9,7 @@ from pydantic import BaseModel
 
 from ..auth import get_current_user
 from ..iam_client import UserContext
-from ..config import settings
+from ..system import get_system
 
 
 router = APIRouter(prefix="/generate", tags=["生成辅助"])
@@ -52,26 +52,6 @@ class ValidateInputRequest(BaseModel):
     subject: SubjectInput
 
 
-# ============================================================================
-# 获取系统实例
-# ============================================================================
-
-_system = None
-
-def get_system():
-    global _system
-    if _system is None:
-        import sys
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        from main import RealEstateKBSystem
-        _system = RealEstateKBSystem(
-            kb_path=settings.kb_path,
-            enable_llm=settings.enable_llm,
-            enable_vector=settings.enable_vector,
-        )
-    return _system
-
-
 # ============================================================================
 # 接口
 # ============================================================================
@@ -3,12 +3,13 @@
 """
 
 import os
+import uuid
 from typing import List, Optional
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query
 
 from ..auth import get_current_user, require_editor, require_viewer
 from ..config import settings
-from main import RealEstateKBSystem
+from ..system import get_system
 from utils import detect_report_type
 from ..dependencies import (
     CurrentUser,
@@ -20,57 +21,37 @@ from ..iam_client import UserContext
 
 router = APIRouter(prefix="/kb", tags=["知识库"])
 
-_system = None
-
-def get_system():
-    global _system
-    if _system is None:
-        _system = RealEstateKBSystem(
-            kb_path=settings.kb_path,
-            enable_llm=settings.enable_llm,
-            enable_vector=settings.enable_vector,
-        )
-    return _system
-
-
 @router.get("/reports", summary="报告列表")
 async def list_reports(
     report_type: str = Query(None, description="报告类型筛选"),
     keyword: str = Query(None, description="关键词搜索"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: str = Query(None, description="游标（上一页返回的 next_cursor，传入时忽略页码）"),
+    total_mode: str = Query("exact", pattern="^(exact|estimate|none)$", description="总数统计：精确/估算/不统计"),
     user: UserContext = Depends(CurrentUser(required=False))
 ):
     """
-    获取报告列表（分页）
+    获取报告列表（分页，筛选和分页在数据库中完成）
     """
     system = get_system()
 
-    # 获取全部报告
-    all_reports = system.kb.list_reports(report_type)
-
-    # 关键词筛选
-    if keyword:
-        keyword = keyword.lower()
-        all_reports = [
-            r for r in all_reports
-            if keyword in (r.get('address', '') or '').lower()
-            or keyword in (r.get('source_file', '') or '').lower()
-        ]
-
-    # 分页
-    total = len(all_reports)
-    start = (page - 1) * page_size
-    end = start + page_size
-    reports = all_reports[start:end]
+    try:
+        result = system.kb.page_reports(
+            report_type=report_type,
+            keyword=keyword,
+            limit=page_size,
+            cursor=cursor,
+            offset=(page - 1) * page_size,
+            total_mode=total_mode,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "success": True,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size,
-        "reports": reports,
+        **_page_info(result, page, page_size),
+        "reports": result["items"],
     }
 
 
@@ -86,63 +67,50 @@ async def list_cases(
     max_price: float = Query(None, description="最高价格"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: str = Query(None, description="游标（上一页返回的 next_cursor，传入时忽略页码）"),
+    total_mode: str = Query("exact", pattern="^(exact|estimate|none)$", description="总数统计：精确/估算/不统计"),
     user: UserContext = Depends(CurrentUser(required=False))
 ):
     """
-    获取案例列表（分页+筛选）
+    获取案例列表（分页+筛选，筛选和分页在数据库中完成）
     """
     system = get_system()
 
-    # 获取全部案例
-    all_cases = system.kb.list_cases(report_type)
-
-    # 筛选
-    filtered = []
-    for c in all_cases:
-        # 区域筛选
-        if district and c.get('district') != district:
-            continue
-
-        # 用途筛选
-        if usage and c.get('usage') != usage:
-            continue
-
-        # 面积筛选
-        area = c.get('area') or 0
-        if min_area and area < min_area:
-            continue
-        if max_area and area > max_area:
-            continue
-
-        # 价格筛选
-        price = c.get('price') or 0
-        if min_price and price < min_price:
-            continue
-        if max_price and price > max_price:
-            continue
-
-        # 关键词
-        if keyword:
-            keyword_lower = keyword.lower()
-            address = (c.get('address') or '').lower()
-            if keyword_lower not in address:
-                continue
+    try:
+        result = system.kb.page_cases(
+            report_type=report_type,
+            district=district,
+            usage=usage,
+            keyword=keyword,
+            min_area=min_area,
+            max_area=max_area,
+            min_price=min_price,
+            max_price=max_price,
+            limit=page_size,
+            cursor=cursor,
+            offset=(page - 1) * page_size,
+            total_mode=total_mode,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        filtered.append(c)
+    return {
+        "success": True,
+        **_page_info(result, page, page_size),
+        "cases": result["items"],
+    }
 
-    # 分页
-    total = len(filtered)
-    start = (page - 1) * page_size
-    end = start + page_size
-    cases = filtered[start:end]
 
+def _page_info(result: dict, page: int, page_size: int) -> dict:
+    """分页信息（不统计总数时 total / total_pages 为 None）"""
+    total = result["total"]
     return {
-        "success": True,
         "total": total,
+        "total_estimated": result["total_estimated"],
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size,
-        "cases": cases,
+        "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+        "next_cursor": result["next_cursor"],
     }
 
 
@@ -194,25 +162,11 @@ async def get_filter_options(
     获取可用的筛选选项（区域、用途等）
     """
     system = get_system()
-    all_cases = system.kb.list_cases()
-
-    districts = set()
-    usages = set()
-    report_types = set()
-
-    for c in all_cases:
-        if c.get('district'):
-            districts.add(c['district'])
-        if c.get('usage'):
-            usages.add(c['usage'])
-        if c.get('report_type'):
-            report_types.add(c['report_type'])
+    options = system.query.get_filter_options()
 
     return {
         "success": True,
-        "districts": sorted(list(districts)),
-        "usages": sorted(list(usages)),
-        "report_types": sorted(list(report_types)),
+        **options,
     }
 
 
@@ -227,7 +181,8 @@ async def upload_report(
     if ext not in settings.allowed_extensions:
         raise HTTPException(status_code=400, detail=f"不支持的文件格式: {ext}")
 
-    upload_path = os.path.join(settings.upload_dir, f"kb_{file.filename}")
+    upload_path = os.path.join(settings.upload_dir,
+                               f"kb_{uuid.uuid4().hex[:12]}_{os.path.basename(file.filename)}")
     try:
         with open(upload_path, "wb") as f:
             content = await file.read()
@@ -255,13 +210,15 @@ async def batch_upload_reports(
     report_type: str = None,
     user: UserContext = Depends(require_editor)
 ):
-    """批量上传报告到知识库"""
+    """批量上传报告到知识库（提取后单事务写入）"""
     results = []
     success_count = 0
     fail_count = 0
 
     system = get_system()
 
+    # 保存上传文件（每个文件加随机前缀，同名文件互不覆盖）
+    saved = {}  # 保存路径 -> 原文件名
     for file in files:
         ext = os.path.splitext(file.filename)[1].lower()
 
@@ -274,23 +231,13 @@ async def batch_upload_reports(
             fail_count += 1
             continue
 
-        upload_path = os.path.join(settings.upload_dir, f"batch_{file.filename}")
+        upload_path = os.path.join(settings.upload_dir,
+                                   f"batch_{uuid.uuid4().hex[:12]}_{os.path.basename(file.filename)}")
         try:
             with open(upload_path, "wb") as f:
                 content = await file.read()
                 f.write(content)
-
-            doc_id = system.add_report(upload_path, verbose=False)
-            detected_type = report_type or detect_report_type(upload_path)
-
-            results.append({
-                "filename": file.filename,
-                "success": True,
-                "doc_id": doc_id,
-                "report_type": detected_type,
-            })
-            success_count += 1
-
+            saved[upload_path] = file.filename
         except Exception as e:
             results.append({
                 "filename": file.filename,
@@ -298,7 +245,34 @@ async def batch_upload_reports(
                 "error": str(e),
             })
             fail_count += 1
-        finally:
+
+    try:
+        try:
+            outcomes = system.add_reports_bulk(list(saved), verbose=False)
+        except Exception as e:
+            outcomes = [{'path': path, 'error': str(e)} for path in saved]
+
+        # 按保存路径对应回上传文件，未返回结果的文件记为失败
+        by_path = {outcome['path']: outcome for outcome in outcomes}
+        for upload_path, filename in saved.items():
+            outcome = by_path.get(upload_path) or {'error': "未返回入库结果"}
+            if 'error' in outcome:
+                results.append({
+                    "filename": filename,
+                    "success": False,
+                    "error": outcome['error'],
+                })
+                fail_count += 1
+            else:
+                results.append({
+                    "filename": filename,
+                    "success": True,
+                    "doc_id": outcome['doc_id'],
+                    "report_type": report_type or outcome['report_type'],
+                })
+                success_count += 1
+    finally:
+        for upload_path in saved:
             if os.path.exists(upload_path):
                 os.remove(upload_path)
 
@@ -15,7 +15,7 @@ from ..dependencies import (
     RequirePermission,
 )
 from ..config import settings
-from .kb import get_system
+from ..system import get_system
 from ..iam_client import UserContext
 from ..task_manager import ReviewTaskManager, submit_review_task
 
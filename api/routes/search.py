@@ -2,7 +2,6 @@
 搜索接口
 """
 
-import os
 from typing import Optional, List
 from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
@@ -10,6 +9,7 @@ from pydantic import BaseModel
 from ..auth import get_current_user
 from ..iam_client import UserContext
 from ..config import settings
+from ..system import get_system
 
 
 router = APIRouter(prefix="/search", tags=["搜索"])
@@ -59,26 +59,6 @@ class SimilarSearchRequest(BaseModel):
     top_k: int = 10
 
 
-# ============================================================================
-# 获取系统实例
-# ============================================================================
-
-_system = None
-
-def get_system():
-    global _system
-    if _system is None:
-        import sys
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        from main import RealEstateKBSystem
-        _system = RealEstateKBSystem(
-            kb_path=settings.kb_path,
-            enable_llm=settings.enable_llm,
-            enable_vector=settings.enable_vector,
-        )
-    return _system
-
-
 # ============================================================================
 # 接口
 # ============================================================================
@@ -196,6 +176,8 @@ def hybrid_search(req: HybridSearchRequest, user: UserContext = Depends(get_curr
         report_type=req.report_type,
         top_k=req.top_k,
         vector_weight=req.vector_weight,
+        min_area=req.min_area or None,
+        max_area=req.max_area or None,
     )
 
     # 转换结果
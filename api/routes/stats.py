@@ -7,8 +7,9 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 from fastapi import APIRouter, Depends
 
-from knowledge_base.db_connection import pg_cursor
-from .kb import get_system
+from knowledge_base.db_connection import pg_cursor, get_pg_pool_stats
+from knowledge_base.embedding import get_embedding_stats
+from ..system import get_system
 from ..auth import get_current_user, require_roles
 from ..iam_client import UserContext
 from ..config import settings
@@ -30,16 +31,29 @@ async def get_overview_stats(user: UserContext = Depends(get_current_user)):
         "total_cases": kb_stats.get("total_cases", 0),
         "by_type": kb_stats.get("by_type", {}),
         "vector_index": kb_stats.get("vector_index", {}),
+        "db_pool": get_pg_pool_stats(),
+        "embedding": get_embedding_stats(),
+        "stats_cache": system.kb.stats_cache.stats(),
     }
 
 
 @router.get("/reports", summary="报告统计")
 async def get_report_stats(user: UserContext = Depends(get_current_user)):
     """
-    获取报告详细统计
+    获取报告详细统计（按知识库版本缓存）
     """
     system = get_system()
-    reports = system.kb.list_reports()
+    month = datetime.now().strftime("%Y-%m")
+    stats = system.kb.stats_cache.get(("report_stats", month), lambda: _report_stats(system.kb))
+
+    return {
+        "success": True,
+        **stats,
+    }
+
+
+def _report_stats(kb) -> Dict:
+    reports = kb.list_reports()
 
     # 按类型统计
     by_type = {}
@@ -65,7 +79,6 @@ async def get_report_stats(user: UserContext = Depends(get_current_user)):
     by_month_sorted = dict(sorted(by_month.items()))
 
     return {
-        "success": True,
         "total": len(reports),
         "by_type": by_type,
         "by_month": by_month_sorted,
@@ -75,10 +88,18 @@ async def get_report_stats(user: UserContext = Depends(get_current_user)):
 @router.get("/cases", summary="案例统计")
 async def get_case_stats(user: UserContext = Depends(get_current_user)):
     """
-    获取案例详细统计
+    获取案例详细统计（按知识库版本缓存）
     """
     system = get_system()
+    stats = system.kb.stats_cache.get("case_stats", _case_stats)
 
+    return {
+        "success": True,
+        **stats,
+    }
+
+
+def _case_stats() -> Dict:
     # 从数据库查询案例统计
     with pg_cursor(commit=False) as cursor:
         # 总数
@@ -124,7 +145,6 @@ async def get_case_stats(user: UserContext = Depends(get_current_user)):
         price_distribution = {row[0]: row[1] for row in cursor.fetchall()}
 
     return {
-        "success": True,
         "total": total,
         "by_type": by_type,
         "by_district": by_district,
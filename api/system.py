@@ -0,0 +1,49 @@
+"""
+系统实例
+========
+进程内共享的 RealEstateKBSystem：所有路由共用同一个知识库、向量存储和 embedding 模型
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from .config import settings
+
+
+_system = None
+_system_lock = threading.Lock()
+
+
+def get_system():
+    """获取系统实例（首次调用时创建）"""
+    global _system
+    if _system is None:
+        with _system_lock:
+            if _system is None:
+                from main import RealEstateKBSystem
+                _system = RealEstateKBSystem(
+                    kb_path=settings.kb_path,
+                    enable_llm=settings.enable_llm,
+                    enable_vector=settings.enable_vector,
+                )
+    return _system
+
+
+def init_system():
+    """
+    启动时初始化系统并预加载 embedding 模型（使用 embedding 服务时只检查连通性）
+
+    模型加载失败不影响服务启动，向量检索在首次使用时会再次尝试加载
+    """
+    system = get_system()
+    if settings.enable_vector:
+        try:
+            vector_store = system.kb.vector_store
+            if vector_store is not None:
+                vector_store.encoder.warmup()
+        except Exception as e:
+            print(f"⚠️ 预加载向量模型失败: {e}")
+    return system
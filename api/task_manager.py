@@ -267,6 +267,7 @@ def run_review_task(task_id: str, system, settings):
         else:
             # 完整审查（带原文）
             from extractors import (
+                load_document,
                 extract_document_content,
                 content_to_dict,
                 get_filtered_paragraphs_for_review,
@@ -275,12 +276,15 @@ def run_review_task(task_id: str, system, settings):
             from utils import detect_report_type
             from reviewer.llm_reviewer import LLMReviewer
 
+            # 解析一次，原文提取和规则校验共用
+            parsed = load_document(file_path)
+
             # 提取原文
-            doc_content = extract_document_content(file_path)
+            doc_content = extract_document_content(parsed)
             paragraphs = get_filtered_paragraphs_for_review(doc_content, max_count=100)
 
             # 规则校验
-            validation_result = system.validate(file_path, verbose=False)
+            validation_result = system.validate(file_path, verbose=False, parsed=parsed)
 
             # LLM 段落审查
             report_type = detect_report_type(file_path)
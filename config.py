@@ -43,4 +43,7 @@ VALIDATION_CONFIG = {
 KB_CONFIG = {
     'similarity_threshold': 0.8,          # 相似度阈值
     'max_similar_cases': 10,              # 最多返回相似案例数
+    'similar_candidates': int(os.getenv('KB_SIMILAR_CANDIDATES', '500')),   # 相似案例召回的候选数上限（向量 + SQL 各自）
+    'case_matrix': os.getenv('KB_CASE_MATRIX', 'true').lower() == 'true',   # 相似案例用内存列存快照全量打分（关闭时走召回+精排）
+    'case_matrix_ttl': float(os.getenv('KB_CASE_MATRIX_TTL', '300')),         # 快照整体重新加载的间隔（秒），感知其他进程的写入
 }
@@ -5,7 +5,9 @@
 """
 
 import os
+from typing import Union
 
+from .parsed_document import ParsedDocument, DocxDocument, StreamedDocument, load_document, BACKENDS
 from .shezhi_extractor import ShezhiExtractor, ShezhiExtractionResult
 from .zujin_extractor import ZujinExtractor, ZujinExtractionResult
 from .biaozhunfang_extractor import BiaozhunfangExtractor, BiaozhunfangExtractionResult
@@ -20,27 +22,30 @@ from .content_extractor import (
 )
 
 
-def extract_report(doc_path: str):
+def extract_report(doc: Union[str, ParsedDocument], backend: str = None):
     """
     根据文件名自动选择提取器并提取数据
 
     Args:
-        doc_path: 文档路径
+        doc: 文档路径或已解析文档（多个环节共用时传入 ParsedDocument，避免重复解析）
+        backend: 解析后端（传入路径时生效）'docx' / 'stream'
 
     Returns:
         提取结果（ShezhiExtractionResult / ZujinExtractionResult / BiaozhunfangExtractionResult）
     """
+    doc = load_document(doc, backend)
+    doc_path = doc.source_path
     filename = os.path.basename(doc_path).lower()
 
     if '涉执' in filename or 'shezhi' in filename:
-        return ShezhiExtractor().extract(doc_path)
+        return ShezhiExtractor().extract(doc)
     elif '租金' in filename or 'zujin' in filename:
-        return ZujinExtractor().extract(doc_path)
+        return ZujinExtractor().extract(doc)
     elif '标准房' in filename or 'biaozhunfang' in filename:
-        return BiaozhunfangExtractor().extract(doc_path)
+        return BiaozhunfangExtractor().extract(doc)
     else:
         # 默认用涉执
-        return ShezhiExtractor().extract(doc_path)
+        return ShezhiExtractor().extract(doc)
 
 
 __all__ = [
@@ -51,6 +56,12 @@ __all__ = [
     'ZujinExtractionResult',
     'BiaozhunfangExtractionResult',
     'extract_report',
+    # 已解析文档
+    'ParsedDocument',
+    'DocxDocument',
+    'StreamedDocument',
+    'load_document',
+    'BACKENDS',
     # 内容提取
     'extract_document_content',
     'content_to_dict',
@@ -10,10 +10,11 @@
 
 import os
 import re
-from typing import Dict, List
-from docx import Document
+from typing import Dict, List, Union
 from dataclasses import dataclass, field
 
+from .parsed_document import ParsedDocument, load_document
+
 
 @dataclass
 class Position:
@@ -97,12 +98,14 @@ class BiaozhunfangExtractor:
     
     def __init__(self):
         self.doc = None
-        self.tables = []
+        self.tables = []  # 表格文本网格（ParsedDocument.table_grids）
     
-    def extract(self, doc_path: str) -> BiaozhunfangExtractionResult:
+    def extract(self, doc: Union[str, ParsedDocument], backend: str = None) -> BiaozhunfangExtractionResult:
         """提取标准房报告"""
-        self.doc = Document(doc_path)
-        self.tables = self.doc.tables
+        parsed = load_document(doc, backend)
+        doc_path = parsed.path
+        self.doc = parsed.doc
+        self.tables = parsed.table_grids
         
         result = BiaozhunfangExtractionResult(source_file=os.path.basename(doc_path))
         
@@ -145,8 +148,7 @@ class BiaozhunfangExtractor:
         ROW_PHYSICAL_COMPOSITE = 10  # 实体状况系数综合
         ROW_LOCATION_CODE = 14   # 区位代码
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             
             if len(cells) < 5:
                 continue
@@ -270,8 +272,7 @@ class BiaozhunfangExtractor:
         ROW_ATTACHMENT = 9      # 单位面积附属物单价
         ROW_FINAL = 10          # 比准价格
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             
             if len(cells) < 4:
                 continue
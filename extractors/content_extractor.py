@@ -4,10 +4,11 @@
 提取Word文档的原文内容（段落和表格），用于前端展示
 """
 
-from typing import List, Dict, Any
-from docx import Document
+from typing import List, Dict, Any, Union
 from dataclasses import dataclass, field
 
+from .parsed_document import ParsedDocument, load_document
+
 
 @dataclass
 class ContentItem:
@@ -29,82 +30,57 @@ class DocumentContent:
     table_count: int = 0
 
 
-def extract_document_content(doc_path: str) -> DocumentContent:
+def extract_document_content(doc: Union[str, ParsedDocument], backend: str = None) -> DocumentContent:
     """
     提取文档原文内容
 
     Args:
-        doc_path: 文档路径
+        doc: 文档路径或已解析文档
+        backend: 解析后端（传入路径时生效）'docx' / 'stream'
 
     Returns:
         DocumentContent
     """
     import os
-    from utils import convert_doc_to_docx
-
-    # 处理doc文件
-    if doc_path.lower().endswith('.doc'):
-        doc_path = convert_doc_to_docx(doc_path)
-
-    doc = Document(doc_path)
-    result = DocumentContent(filename=os.path.basename(doc_path))
 
-    # 获取文档的body元素
-    body = doc.element.body
+    parsed = load_document(doc, backend)
+    result = DocumentContent(filename=os.path.basename(parsed.path))
 
     index = 0
     para_count = 0
     table_count = 0
 
-    # 按顺序遍历body的子元素
-    for element in body:
-        tag = element.tag.split('}')[-1]  # 去掉命名空间
-
-        if tag == 'p':
+    # 按正文顺序遍历段落和表格（单遍线性）
+    for kind, value in parsed.blocks:
+        if kind == 'p':
             # 段落
-            text = element.text or ''
-            # 获取段落的完整文本（包括runs）
-            for child in element.iter():
-                if child.tag.endswith('}t'):
-                    if child.text:
-                        text = (text or '')
-
-            # 从paragraph对象获取完整文本
-            if para_count < len(doc.paragraphs):
-                text = doc.paragraphs[para_count].text
-                para_count += 1
+            para_count += 1
 
             # 跳过空段落
-            if text.strip():
+            if value.strip():
                 result.contents.append(ContentItem(
                     index=index,
                     type='paragraph',
-                    text=text.strip(),
+                    text=value.strip(),
                     issue_ids=[]
                 ))
                 index += 1
 
-        elif tag == 'tbl':
-            # 表格
-            if table_count < len(doc.tables):
-                table = doc.tables[table_count]
-                rows = []
-
-                for row in table.rows:
-                    row_data = []
-                    for cell in row.cells:
-                        cell_text = cell.text.strip().replace('\n', ' ')
-                        row_data.append(cell_text)
-                    rows.append(row_data)
-
-                result.contents.append(ContentItem(
-                    index=index,
-                    type='table',
-                    rows=rows,
-                    issue_ids=[]
-                ))
-                index += 1
-                table_count += 1
+        else:
+            # 表格（复用文档的表格网格缓存）
+            rows = [
+                [cell.replace('\n', ' ') for cell in row]
+                for row in parsed.table_grids[table_count]
+            ]
+
+            result.contents.append(ContentItem(
+                index=index,
+                type='table',
+                rows=rows,
+                issue_ids=[]
+            ))
+            index += 1
+            table_count += 1
 
     result.paragraph_count = para_count
     result.table_count = table_count
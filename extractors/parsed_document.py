@@ -0,0 +1,258 @@
+"""
+已解析文档
+==========
+一次读取 docx（zip 解压 + XML 解析），供原文提取、结构化提取和校验共用
+"""
+
+import os
+import zipfile
+from typing import Dict, List, Tuple, Union
+
+from docx import Document
+
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_BODY = f'{_W}body'
+W_P = f'{_W}p'
+_R = f'{_W}r'
+W_TBL = f'{_W}tbl'
+_TR = f'{_W}tr'
+_TC = f'{_W}tc'
+_TC_PR = f'{_W}tcPr'
+_GRID_SPAN = f'{_W}gridSpan'
+_V_MERGE = f'{_W}vMerge'
+_VAL = f'{_W}val'
+_HYPERLINK = f'{_W}hyperlink'
+_T = f'{_W}t'
+_BR = f'{_W}br'
+_TYPE = f'{_W}type'
+# run 子元素 -> 文本（与 python-docx Run.text 一致；w:t 取元素文本，w:br 按类型处理）
+_RUN_TEXT = {
+    _T: None, _BR: None,
+    f'{_W}tab': '\t', f'{_W}ptab': '\t', f'{_W}cr': '\n', f'{_W}noBreakHyphen': '-',
+}
+
+
+def paragraph_text(p) -> str:
+    """段落文本（与 python-docx Paragraph.text 一致：拼接各 run 的文本）"""
+    parts = []
+    for child in p:
+        if child.tag == _R:
+            runs = (child,)
+        elif child.tag == _HYPERLINK:
+            runs = child.iterchildren(_R)
+        else:
+            continue
+        for run in runs:
+            for item in run:
+                if item.tag not in _RUN_TEXT:
+                    continue
+                if item.tag == _T:
+                    parts.append(item.text or '')
+                elif item.tag == _BR:
+                    # 只有换行符计为换行，分页符、分栏符为空
+                    parts.append('\n' if item.get(_TYPE, 'textWrapping') == 'textWrapping' else '')
+                else:
+                    parts.append(_RUN_TEXT[item.tag])
+    return ''.join(parts)
+
+
+def _cell_text(tc) -> str:
+    """单元格文本（各段落以换行连接）"""
+    return '\n'.join(paragraph_text(p) for p in tc.iterchildren(W_P))
+
+
+def table_grid(tbl) -> List[List[str]]:
+    """
+    表格文本网格（与 python-docx row.cells 一致）
+
+    横向合并（gridSpan）的单元格按跨列数重复，纵向合并（vMerge）的后续单元格取合并起始单元格的文本
+    """
+    rows = []
+    above: Dict[int, str] = {}  # 列号 -> 上一行该列文本
+    for tr in tbl.iterchildren(_TR):
+        row = []
+        for tc in tr.iterchildren(_TC):
+            span = 1
+            continued = False
+            tc_pr = tc.find(_TC_PR)
+            if tc_pr is not None:
+                grid_span = tc_pr.find(_GRID_SPAN)
+                if grid_span is not None:
+                    span = int(grid_span.get(_VAL, 1))
+                v_merge = tc_pr.find(_V_MERGE)
+                continued = v_merge is not None and v_merge.get(_VAL, 'continue') != 'restart'
+            col = len(row)
+            text = above.get(col, '') if continued else _cell_text(tc)
+            row.extend([text] * span)
+        for col, text in enumerate(row):
+            above[col] = text
+        rows.append(row)
+    return rows
+
+
+# 解析后端
+BACKEND_DOCX = 'docx'      # python-docx 对象模型（默认）
+BACKEND_STREAM = 'stream'  # lxml iterparse 流式读取，只保留文本
+BACKENDS = (BACKEND_DOCX, BACKEND_STREAM)
+
+
+class ParsedDocument:
+    """
+    已解析的Word文档（各解析后端共用的文本接口）
+
+    .doc 文件在加载时转换一次；内容块、表格网格和全文按需计算并缓存。
+    python-docx 对象（doc / paragraphs / tables / body）只有 DocxDocument 提供，
+    流式后端的 doc 为 None
+    """
+
+    backend = None
+
+    def __init__(self, doc_path: str):
+        self.source_path = doc_path
+        self.filename = os.path.basename(doc_path)
+        self.path = self._convert(doc_path)
+
+        self.doc = None
+        self._blocks = None
+        self._table_grids = None
+        self._full_text = None
+
+    @staticmethod
+    def _convert(doc_path: str) -> str:
+        """处理doc文件"""
+        from utils import convert_doc_to_docx
+
+        if doc_path.lower().endswith('.doc'):
+            return convert_doc_to_docx(doc_path)
+        return doc_path
+
+    @property
+    def blocks(self) -> List[Tuple[str, object]]:
+        """
+        按正文顺序排列的内容块
+
+        [('p', 段落文本), ('tbl', 表格文本网格), ...]，表格网格为原始单元格文本（未去空白）
+        """
+        if self._blocks is None:
+            # 由各后端实现 _read_blocks
+            self._blocks = self._read_blocks()
+        return self._blocks
+
+    @property
+    def table_grids(self) -> List[List[List[str]]]:
+        """
+        表格文本网格缓存（与正文表格一一对应）
+
+        单元格文本已去除首尾空白，合并单元格已展开，提取器各环节直接读取，
+        避免反复经由 python-docx 解析合并单元格和拼接文本
+        """
+        if self._table_grids is None:
+            self._table_grids = [
+                [[cell.strip() for cell in row] for row in grid]
+                for kind, grid in self.blocks if kind == 'tbl'
+            ]
+        return self._table_grids
+
+    @property
+    def full_text(self) -> str:
+        """全部段落文本"""
+        if self._full_text is None:
+            self._full_text = "\n".join(text for kind, text in self.blocks if kind == 'p')
+        return self._full_text
+
+
+class DocxDocument(ParsedDocument):
+    """python-docx 解析的Word文档（默认后端，额外提供段落、表格对象和 XML 树）"""
+
+    backend = BACKEND_DOCX
+
+    def __init__(self, doc_path: str):
+        super().__init__(doc_path)
+        self.doc = Document(self.path)
+        self._paragraphs = None
+        self._tables = None
+
+    @property
+    def paragraphs(self) -> List:
+        """段落列表（python-docx 每次访问都会重建对象，这里只建一次）"""
+        if self._paragraphs is None:
+            self._paragraphs = self.doc.paragraphs
+        return self._paragraphs
+
+    @property
+    def tables(self) -> List:
+        """表格列表"""
+        if self._tables is None:
+            self._tables = self.doc.tables
+        return self._tables
+
+    @property
+    def body(self):
+        """文档 body 元素"""
+        return self.doc.element.body
+
+    def _read_blocks(self) -> List[Tuple[str, object]]:
+        return [_read_block(element) for element in self.body if element.tag in (W_P, W_TBL)]
+
+
+class StreamedDocument(ParsedDocument):
+    """
+    流式读取的Word文档
+
+    直接从 zip 中流式解析 word/document.xml，每个正文段落/表格读取完即释放，
+    内存占用与文档大小无关；只提供文本（blocks / table_grids / full_text）
+    """
+
+    backend = BACKEND_STREAM
+
+    def __init__(self, doc_path: str):
+        super().__init__(doc_path)
+        self._blocks = self._read_blocks()
+
+    def _read_blocks(self) -> List[Tuple[str, object]]:
+        from lxml import etree
+
+        blocks = []
+        with zipfile.ZipFile(self.path) as zf:
+            with zf.open('word/document.xml') as f:
+                for _, element in etree.iterparse(f, events=('end',), tag=(W_P, W_TBL)):
+                    parent = element.getparent()
+                    if parent is None or parent.tag != _BODY:
+                        # 表格内的段落/嵌套表格，随外层表格一起读取
+                        continue
+                    blocks.append(_read_block(element))
+
+                    # 释放已处理的元素
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del parent[0]
+        return blocks
+
+
+def _read_block(element) -> Tuple[str, object]:
+    """读取正文段落/表格元素"""
+    if element.tag == W_TBL:
+        return 'tbl', table_grid(element)
+    return 'p', paragraph_text(element)
+
+
+def load_document(doc: Union[str, ParsedDocument], backend: str = None) -> ParsedDocument:
+    """
+    获取已解析文档（传入路径时解析，已解析时直接返回）
+
+    Args:
+        doc: 文档路径或 ParsedDocument
+        backend: 解析后端 'docx'（默认）/ 'stream'（流式，适合批量入库和超大报告）
+
+    Returns:
+        DocxDocument / StreamedDocument
+    """
+    if isinstance(doc, ParsedDocument):
+        return doc
+    backend = backend or BACKEND_DOCX
+    if backend == BACKEND_STREAM:
+        return StreamedDocument(doc)
+    if backend != BACKEND_DOCX:
+        raise ValueError(f"未知的解析后端: {backend}，可选: {', '.join(BACKENDS)}")
+    return DocxDocument(doc)
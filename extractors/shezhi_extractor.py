@@ -15,10 +15,11 @@
 
 import os
 import re
-from typing import Dict, List, Optional
-from docx import Document
+from typing import Dict, List, Optional, Union
 from dataclasses import dataclass, field
 
+from .parsed_document import ParsedDocument, load_document
+
 
 @dataclass
 class Position:
@@ -151,14 +152,16 @@ class ShezhiExtractor:
     
     def __init__(self):
         self.doc = None
-        self.tables = []
+        self.tables = []  # 表格文本网格（ParsedDocument.table_grids）
         self.full_text = ""
     
-    def extract(self, doc_path: str) -> ShezhiExtractionResult:
+    def extract(self, doc: Union[str, ParsedDocument], backend: str = None) -> ShezhiExtractionResult:
         """提取涉执报告"""
-        self.doc = Document(doc_path)
-        self.tables = self.doc.tables
-        self.full_text = "\n".join([p.text for p in self.doc.paragraphs])
+        parsed = load_document(doc, backend)
+        doc_path = parsed.path
+        self.doc = parsed.doc
+        self.tables = parsed.table_grids
+        self.full_text = parsed.full_text
         
         result = ShezhiExtractionResult(source_file=os.path.basename(doc_path))
         
@@ -208,11 +211,11 @@ class ShezhiExtractor:
         """获取单元格值（带位置）"""
         try:
             table = self.tables[table_idx]
-            cell = table.rows[row_idx].cells[col_idx]
+            cell = table[row_idx][col_idx]
             return LocatedValue(
-                value=cell.text.strip(),
+                value=cell,
                 position=Position(table_idx, row_idx, col_idx),
-                raw_text=cell.text.strip()
+                raw_text=cell
             )
         except:
             return LocatedValue()
@@ -222,9 +225,8 @@ class ShezhiExtractor:
         table = self.tables[self.TABLE_RESULT_SUMMARY]
         
         # 第二行是数据行
-        if len(table.rows) >= 2:
-            row = table.rows[1]
-            cells = [c.text.strip() for c in row.cells]
+        if len(table) >= 2:
+            cells = table[1]
             
             result.subject.address = LocatedValue(
                 value=cells[0] if cells else "",
@@ -269,8 +271,7 @@ class ShezhiExtractor:
         """提取权属表"""
         table = self.tables[self.TABLE_PROPERTY_RIGHTS]
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             row_text = ' '.join(cells)
             
             if '不动产权第' in row_text or '不动产权证' in row_text:
@@ -302,8 +303,7 @@ class ShezhiExtractor:
         COL_B = 4
         COL_C = 5
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             
             if len(cells) < 6:
                 continue
@@ -389,9 +389,9 @@ class ShezhiExtractor:
         
         current_category = ""
         
-        for row_idx, row in enumerate(table.rows[1:], 1):  # 跳过表头
+        for row_idx, row in enumerate(table[1:], 1):  # 跳过表头
             # 获取去重后的单元格
-            cells_raw = [c.text.strip().replace('\n', ' ') for c in row.cells]
+            cells_raw = [c.replace('\n', ' ') for c in row]
             cells = []
             for c in cells_raw:
                 if c not in cells:
@@ -470,8 +470,7 @@ class ShezhiExtractor:
         COL_A = 2
         current_category = ""
         
-        for row_idx, row in enumerate(table.rows[1:], 1):
-            cells_raw = [c.text.strip() for c in row.cells]
+        for row_idx, cells_raw in enumerate(table[1:], 1):
             cells = []
             for c in cells_raw:
                 if c not in cells:
@@ -532,8 +531,7 @@ class ShezhiExtractor:
         COL_A = 2
         current_category = ""
         
-        for row_idx, row in enumerate(table.rows[1:], 1):
-            cells_raw = [c.text.strip() for c in row.cells]
+        for row_idx, cells_raw in enumerate(table[1:], 1):
             cells = []
             for c in cells_raw:
                 if c not in cells:
@@ -607,8 +605,7 @@ class ShezhiExtractor:
             '修正后单价': 'adjusted_price',
         }
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             
             if len(cells) < 2:
                 continue
@@ -700,8 +697,7 @@ class ShezhiExtractor:
         # 4. 土地终止日期 - 从权属表中提取
         if len(self.tables) > self.TABLE_PROPERTY_RIGHTS:
             table = self.tables[self.TABLE_PROPERTY_RIGHTS]
-            for row in table.rows:
-                cells = [c.text.strip() for c in row.cells]
+            for cells in table:
                 for i, cell in enumerate(cells):
                     if '终止' in cell and i + 1 < len(cells):
                         # 找下一行同一列
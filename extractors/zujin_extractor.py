@@ -14,10 +14,11 @@
 
 import os
 import re
-from typing import Dict, List
-from docx import Document
+from typing import Dict, List, Union
 from dataclasses import dataclass, field
 
+from .parsed_document import ParsedDocument, load_document
+
 
 @dataclass
 class Position:
@@ -141,12 +142,14 @@ class ZujinExtractor:
     
     def __init__(self):
         self.doc = None
-        self.tables = []
+        self.tables = []  # 表格文本网格（ParsedDocument.table_grids）
     
-    def extract(self, doc_path: str) -> ZujinExtractionResult:
+    def extract(self, doc: Union[str, ParsedDocument], backend: str = None) -> ZujinExtractionResult:
         """提取租金报告"""
-        self.doc = Document(doc_path)
-        self.tables = self.doc.tables
+        parsed = load_document(doc, backend)
+        doc_path = parsed.path
+        self.doc = parsed.doc
+        self.tables = parsed.table_grids
         
         result = ZujinExtractionResult(source_file=os.path.basename(doc_path))
         
@@ -181,9 +184,8 @@ class ZujinExtractor:
         """提取结果汇总表"""
         table = self.tables[self.TABLE_RESULT_SUMMARY]
         
-        if len(table.rows) >= 2:
-            row = table.rows[1]
-            cells = [c.text.strip() for c in row.cells]
+        if len(table) >= 2:
+            cells = table[1]
             
             if len(cells) >= 1:
                 result.subject.address = LocatedValue(
@@ -236,8 +238,7 @@ class ZujinExtractor:
         COL_B = 4
         COL_C = 5
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             
             if len(cells) < 6:
                 continue
@@ -320,8 +321,8 @@ class ZujinExtractor:
         
         current_category = ""
         
-        for row_idx, row in enumerate(table.rows[1:], 1):
-            cells_raw = [c.text.strip().replace('\n', ' ') for c in row.cells]
+        for row_idx, row in enumerate(table[1:], 1):
+            cells_raw = [c.replace('\n', ' ') for c in row]
             cells = []
             for c in cells_raw:
                 if c not in cells:
@@ -368,8 +369,7 @@ class ZujinExtractor:
         COL_A = 2
         current_category = ""
         
-        for row_idx, row in enumerate(table.rows[1:], 1):
-            cells_raw = [c.text.strip() for c in row.cells]
+        for row_idx, cells_raw in enumerate(table[1:], 1):
             cells = []
             for c in cells_raw:
                 if c not in cells:
@@ -414,8 +414,7 @@ class ZujinExtractor:
         COL_A = 2
         current_category = ""
         
-        for row_idx, row in enumerate(table.rows[1:], 1):
-            cells_raw = [c.text.strip() for c in row.cells]
+        for row_idx, cells_raw in enumerate(table[1:], 1):
             cells = []
             for c in cells_raw:
                 if c not in cells:
@@ -473,8 +472,7 @@ class ZujinExtractor:
             '调整后单价': 'adjusted_price',
         }
         
-        for row_idx, row in enumerate(table.rows):
-            cells = [c.text.strip() for c in row.cells]
+        for row_idx, cells in enumerate(table):
             
             if len(cells) < 2:
                 continue
@@ -21,13 +21,14 @@ from knowledge_base import KnowledgeBaseManager, KnowledgeBaseQuery
 class ReportGenerator:
     """报告生成辅助器"""
     
-    def __init__(self, kb_manager: KnowledgeBaseManager):
+    def __init__(self, kb_manager: KnowledgeBaseManager, query: KnowledgeBaseQuery = None):
         """
         Args:
             kb_manager: 知识库管理器
+            query: 知识库查询器（可选，传入时与调用方共用）
         """
         self.kb = kb_manager
-        self.query = KnowledgeBaseQuery(kb_manager)
+        self.query = query or KnowledgeBaseQuery(kb_manager)
     
     def suggest_cases(self,
                       address: str,
@@ -24,10 +24,12 @@ else:
         VectorStoreConfig = None
 
 from .kb_query import KnowledgeBaseQuery
+from .build_manifest import BuildManifest
 
 __all__ = [
     'KnowledgeBaseManager',
     'KnowledgeBaseQuery',
+    'BuildManifest',
     'result_to_dict',
     'VectorStore',
     'VectorStoreConfig',
@@ -0,0 +1,112 @@
+"""
+构建检查点清单
+==============
+记录每个源文件的内容哈希和入库结果，用于断点续建和增量构建
+"""
+
+import os
+import sys
+import json
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import file_content_hash, get_timestamp
+
+
+class BuildManifest:
+    """
+    构建清单
+
+    文件格式：
+    {
+        "version": 1,
+        "updated_at": "...",
+        "files": {
+            "<绝对路径>": {
+                "content_hash": "...", "size": 123, "mtime": 1700000000.0,
+                "status": "done" / "failed", "doc_id": "...", "error": "...", "time": "..."
+            }
+        }
+    }
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        """加载清单（不存在或损坏时从空清单开始）"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.files = data.get('files', {})
+        except Exception as e:
+            print(f"⚠️ 构建清单加载失败，将重新记录: {e}")
+            self.files = {}
+
+    def save(self):
+        """原子写入清单"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.VERSION,
+                'updated_at': get_timestamp(),
+                'files': self.files,
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def content_hash(self, file_path: str) -> str:
+        """
+        获取文件内容哈希
+
+        文件大小和修改时间与清单记录一致时直接复用记录的哈希，避免重复读取大文件
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        entry = self.files.get(key)
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime \
+                and entry.get('content_hash'):
+            return entry['content_hash']
+        return file_content_hash(file_path)
+
+    def get(self, file_path: str) -> Optional[Dict]:
+        """获取文件记录"""
+        return self.files.get(os.path.abspath(file_path))
+
+    def is_done(self, file_path: str, content_hash: str) -> bool:
+        """文件是否已以相同内容入库"""
+        entry = self.get(file_path)
+        return bool(entry and entry.get('status') == 'done' and entry.get('content_hash') == content_hash)
+
+    def mark_done(self, file_path: str, content_hash: str, doc_id: str):
+        """记录入库成功"""
+        self._mark(file_path, content_hash, status='done', doc_id=doc_id)
+
+    def mark_failed(self, file_path: str, content_hash: str, error: str):
+        """记录入库失败（下次构建会重试）"""
+        previous = self.get(file_path) or {}
+        self._mark(file_path, content_hash, status='failed', error=error,
+                   doc_id=previous.get('doc_id'))
+
+    def _mark(self, file_path: str, content_hash: str, **fields):
+        key = os.path.abspath(file_path)
+        try:
+            stat = os.stat(file_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size, mtime = None, None
+        self.files[key] = {
+            'content_hash': content_hash,
+            'size': size,
+            'mtime': mtime,
+            'time': get_timestamp(),
+            **fields,
+        }
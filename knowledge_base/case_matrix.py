@@ -0,0 +1,204 @@
+"""
+案例列存快照
+============
+把案例表的结构化字段放在内存中的 NumPy 列里，规则相似度对全部案例一次向量化计算
+
+- 区域 / 用途 / 报告类型存为类别编码
+- 入库、删除时增量更新；超过 TTL 后由知识库管理器整体重新加载（感知其他进程的写入）
+"""
+
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class CaseMatrix:
+    """案例列存快照"""
+
+    # 加载所需的字段（数据库模式即 SELECT 列）
+    COLUMNS = ['case_id', 'report_type', 'district', 'usage',
+               'area', 'price', 'current_floor', 'build_year']
+
+    CATEGORICAL = ('report_type', 'district', 'usage')
+    NUMERIC = {'area': np.float64, 'price': np.float64, 'current_floor': np.int32, 'build_year': np.int32}
+
+    # 已删除行占比超过该值时压缩
+    COMPACT_RATIO = 0.2
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.loaded_at = time.monotonic()
+
+        self._case_ids = np.empty(0, dtype=object)
+        self._row_of: Dict[str, int] = {}
+        self._vocab: Dict[str, List[str]] = {name: [] for name in self.CATEGORICAL}
+        self._code_of: Dict[str, Dict[str, int]] = {name: {} for name in self.CATEGORICAL}
+        self._columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype=np.int32) for name in self.CATEGORICAL}
+        self._columns.update({name: np.empty(0, dtype=dtype) for name, dtype in self.NUMERIC.items()})
+        self._alive = np.empty(0, dtype=bool)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict], ttl: float = 300) -> 'CaseMatrix':
+        matrix = cls(ttl)
+        matrix.add(list(items))
+        return matrix
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], ttl: float = 300) -> 'CaseMatrix':
+        """按 COLUMNS 顺序的行构建"""
+        return cls.from_items((dict(zip(cls.COLUMNS, row)) for row in rows), ttl)
+
+    def expired(self) -> bool:
+        return self.ttl > 0 and time.monotonic() - self.loaded_at > self.ttl
+
+    def __len__(self):
+        return len(self._row_of)
+
+    # ------------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------------
+
+    def _encode(self, name: str, value) -> int:
+        value = value or ''
+        code = self._code_of[name].get(value)
+        if code is None:
+            code = len(self._vocab[name])
+            self._vocab[name].append(value)
+            self._code_of[name][value] = code
+        return code
+
+    def add(self, items: List[Dict]):
+        """添加案例（已存在的 case_id 先删除）"""
+        items = [item for item in items if item.get('case_id')]
+        if not items:
+            return
+
+        with self._lock:
+            self._remove([item['case_id'] for item in items])
+
+            new_columns = {
+                name: np.array([self._encode(name, item.get(name)) for item in items], dtype=np.int32)
+                for name in self.CATEGORICAL
+            }
+            new_columns.update({
+                name: np.array([item.get(name) or 0 for item in items], dtype=dtype)
+                for name, dtype in self.NUMERIC.items()
+            })
+
+            start = len(self._case_ids)
+            self._columns = {name: np.concatenate([column, new_columns[name]])
+                             for name, column in self._columns.items()}
+            self._case_ids = np.concatenate([self._case_ids, np.array([item['case_id'] for item in items],
+                                                                        dtype=object)])
+            self._alive = np.concatenate([self._alive, np.ones(len(items), dtype=bool)])
+            self._row_of.update((item['case_id'], start + i) for i, item in enumerate(items))
+
+    def remove(self, case_ids: List[str]):
+        """删除案例"""
+        with self._lock:
+            self._remove(case_ids)
+
+    def _remove(self, case_ids: List[str]):
+        rows = [self._row_of.pop(case_id) for case_id in set(case_ids) if case_id in self._row_of]
+        if not rows:
+            return
+
+        # 复制后再修改，正在计算的查询仍使用旧数组
+        alive = self._alive.copy()
+        alive[rows] = False
+        self._alive = alive
+
+        if len(self._alive) - len(self._row_of) > self.COMPACT_RATIO * len(self._alive):
+            self._columns = {name: column[alive] for name, column in self._columns.items()}
+            self._case_ids = self._case_ids[alive]
+            self._alive = np.ones(len(self._case_ids), dtype=bool)
+            self._row_of = {case_id: i for i, case_id in enumerate(self._case_ids)}
+
+    # ------------------------------------------------------------------
+    # 相似度
+    # ------------------------------------------------------------------
+
+    def _category_mask(self, name: str, codes: np.ndarray, match) -> np.ndarray:
+        """按类别值判断（每个类别只判断一次），展开为行掩码"""
+        vocab = self._vocab[name]
+        matched = np.fromiter((bool(v) and match(v) for v in vocab), dtype=bool, count=len(vocab))
+        if not len(matched):
+            return np.zeros(len(codes), dtype=bool)
+        return matched[codes]
+
+    def score(self, columns: Dict[str, np.ndarray], address: str = None, area: float = None,
+              price: float = None, district: str = None, usage: str = None,
+              floor: int = None, build_year: int = None) -> np.ndarray:
+        """规则相似度（与 KnowledgeBaseQuery._calculate_similarity 逐项一致）"""
+        size = len(columns['area'])
+        score = np.zeros(size, dtype=np.float64)
+
+        # 1. 区域匹配（权重0.25）
+        if district:
+            score += np.where(self._category_mask('district', columns['district'], lambda v: district in v), 0.25, 0)
+
+        # 2. 用途匹配（权重0.15）
+        if usage:
+            score += np.where(self._category_mask('usage', columns['usage'], lambda v: v == usage), 0.15, 0)
+
+        # 3. 面积 / 4. 价格相似度（权重0.20 / 0.15）
+        for value, name, weight in ((area, 'area', 0.20), (price, 'price', 0.15)):
+            if value and value > 0:
+                item = columns[name]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ratio = np.minimum(value, item) / np.maximum(value, item)
+                score += np.where((item > 0) & (ratio > 0.5), ratio * weight, 0)
+
+        # 5. 楼层相似度（权重0.10）
+        if floor and floor > 0:
+            item = columns['current_floor']
+            diff = np.abs(floor - item)
+            score += np.where((item > 0) & (diff <= 3), (1 - diff / 10) * 0.10, 0)
+
+        # 6. 建成年份相似度（权重0.10）
+        if build_year and build_year > 0:
+            item = columns['build_year']
+            diff = np.abs(build_year - item)
+            score += np.where((item > 0) & (diff <= 10), (1 - diff / 20) * 0.10, 0)
+
+        # 7. 地址关键词匹配：_calculate_similarity 逐字符比较且要求长度大于1，该项恒为0，这里不再计算
+
+        return score
+
+    def top_k(self, top_k: int, report_type: str = None, **criteria) -> List[Tuple[str, float]]:
+        """
+        相似度最高的 top_k 个案例
+
+        Returns:
+            [(case_id, score), ...]，只包含分数大于0的案例
+        """
+        if top_k <= 0:
+            return []
+
+        with self._lock:
+            columns, alive, case_ids = self._columns, self._alive, self._case_ids
+            report_code: Optional[int] = self._code_of['report_type'].get(report_type) if report_type else None
+        if report_type and report_code is None:
+            return []
+
+        scores = self.score(columns, **criteria)
+        mask = alive & (scores > 0)
+        if report_type:
+            mask &= columns['report_type'] == report_code
+
+        rows = np.flatnonzero(mask)
+        if len(rows) > top_k:
+            rows = rows[np.argpartition(-scores[rows], top_k - 1)[:top_k]]
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return [(case_ids[i], float(scores[i])) for i in rows]
+
+    def stats(self) -> Dict:
+        return {
+            'cases': len(self._row_of),
+            'rows': len(self._alive),
+            'districts': len(self._vocab['district']),
+            'age_seconds': round(time.monotonic() - self.loaded_at, 1),
+        }
@@ -5,6 +5,8 @@ PostgreSQL 和 Milvus 连接管理
 """
 
 import os
+import threading
+import time
 from typing import Optional
 from contextlib import contextmanager
 
@@ -21,9 +23,17 @@ PG_CONFIG = {
     'database': os.getenv('PG_DATABASE', 'real_estate_kb'),
 }
 
+# 连接池配置
+PG_POOL_CONFIG = {
+    'min_size': int(os.getenv('PG_POOL_MIN', '1')),
+    'max_size': int(os.getenv('PG_POOL_MAX', '20')),
+    'timeout': float(os.getenv('PG_POOL_TIMEOUT', '30')),              # 等待空闲连接的超时（秒）
+    'ping_interval': float(os.getenv('PG_POOL_PING_INTERVAL', '60')),  # 空闲超过该时长的连接在借出前探活（秒）
+}
+
 
 def get_pg_connection():
-    """获取 PostgreSQL 连接"""
+    """获取 PostgreSQL 连接（独立连接，不经过连接池）"""
     import psycopg2
     return psycopg2.connect(
         host=PG_CONFIG['host'],
@@ -34,21 +44,214 @@ def get_pg_connection():
     )
 
 
+class PGConnectionPool:
+    """
+    PostgreSQL 连接池（进程级）
+
+    - 最小/最大连接数可配置，连接耗尽时阻塞等待而不是直接报错
+    - 借出前检查连接状态，空闲较久的连接先执行 SELECT 1 探活
+    - 提供统计信息，便于监控
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 20,
+                 timeout: float = 30, ping_interval: float = 60):
+        from psycopg2 import pool
+
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._pool = pool.ThreadedConnectionPool(
+            self.min_size,
+            self.max_size,
+            host=PG_CONFIG['host'],
+            port=PG_CONFIG['port'],
+            user=PG_CONFIG['user'],
+            password=PG_CONFIG['password'],
+            database=PG_CONFIG['database'],
+        )
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._last_used = {}  # id(conn) -> 上次归还时间
+
+        # 统计
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def getconn(self):
+        """借出连接（带健康检查）"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise RuntimeError(f"PostgreSQL 连接池已耗尽（max={self.max_size}，等待 {self.timeout}s 超时）")
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        return conn
+
+    def _checkout_healthy(self):
+        """取出一个可用连接，失效连接直接丢弃"""
+        # 最多尝试 max_size + 1 次，保证池中全部失效时也能拿到新连接
+        for _ in range(self.max_size + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+        raise RuntimeError("无法获取可用的 PostgreSQL 连接")
+
+    def _is_healthy(self, conn) -> bool:
+        """检查连接是否可用"""
+        from psycopg2 import extensions
+
+        if conn.closed:
+            return False
+        status = conn.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            # 上一次使用遗留的事务
+            try:
+                conn.rollback()
+            except Exception:
+                return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used >= self.ping_interval:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _discard(self, conn):
+        """关闭并丢弃连接"""
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception:
+            pass
+        with self._lock:
+            self._discarded += 1
+
+    def putconn(self, conn, close: bool = False):
+        """归还连接"""
+        try:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        """关闭所有连接"""
+        self._pool.closeall()
+        self._last_used.clear()
+
+    def stats(self) -> dict:
+        """连接池统计"""
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._pool._pool),
+                'opened': len(self._pool._pool) + len(self._pool._used),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+            }
+
+
+_pg_pool: Optional[PGConnectionPool] = None
+_pg_pool_pid: Optional[int] = None
+_pg_pool_lock = threading.Lock()
+
+
+def get_pg_pool() -> PGConnectionPool:
+    """获取进程级连接池（fork 后的子进程会重新创建）"""
+    global _pg_pool, _pg_pool_pid
+
+    pid = os.getpid()
+    if _pg_pool is None or _pg_pool_pid != pid:
+        with _pg_pool_lock:
+            if _pg_pool is None or _pg_pool_pid != pid:
+                _pg_pool = PGConnectionPool(
+                    min_size=PG_POOL_CONFIG['min_size'],
+                    max_size=PG_POOL_CONFIG['max_size'],
+                    timeout=PG_POOL_CONFIG['timeout'],
+                    ping_interval=PG_POOL_CONFIG['ping_interval'],
+                )
+                _pg_pool_pid = pid
+    return _pg_pool
+
+
+def close_pg_pool():
+    """关闭连接池"""
+    global _pg_pool, _pg_pool_pid
+    with _pg_pool_lock:
+        if _pg_pool is not None and _pg_pool_pid == os.getpid():
+            _pg_pool.closeall()
+        _pg_pool = None
+        _pg_pool_pid = None
+
+
+def get_pg_pool_stats() -> dict:
+    """获取连接池统计（未初始化时返回空）"""
+    if _pg_pool is None or _pg_pool_pid != os.getpid():
+        return {}
+    return _pg_pool.stats()
+
+
 @contextmanager
 def pg_cursor(commit=True):
-    """PostgreSQL 游标上下文管理器"""
-    conn = get_pg_connection()
+    """PostgreSQL 游标上下文管理器（从连接池借出连接）"""
+    import psycopg2
+
+    pool = get_pg_pool()
+    conn = pool.getconn()
     cursor = conn.cursor()
+    broken = False
     try:
         yield cursor
         if commit:
             conn.commit()
+        else:
+            # 只读操作也要结束事务，避免连接以 idle in transaction 状态回池
+            conn.rollback()
     except Exception as e:
-        conn.rollback()
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
         raise e
     finally:
-        cursor.close()
-        conn.close()
+        try:
+            cursor.close()
+        except Exception:
+            broken = True
+        pool.putconn(conn, close=broken)
 
 
 # ============================================================================
@@ -58,7 +261,9 @@ def pg_cursor(commit=True):
 MILVUS_CONFIG = {
     'host': os.getenv('MILVUS_HOST', '127.0.0.1'),
     'port': int(os.getenv('MILVUS_PORT', '19540')),
-    'collection': os.getenv('MILVUS_COLLECTION', 'case_vectors'),
+    'collection': os.getenv('MILVUS_COLLECTION', 'case_vectors'),       # 别名，指向当前版本的集合
+    'keep_versions': int(os.getenv('MILVUS_KEEP_VERSIONS', '1')),       # 切换后保留的旧版本数
+    'alias_check_interval': float(os.getenv('MILVUS_ALIAS_CHECK_INTERVAL', '30')),  # 检查别名切换的间隔（秒）
 }
 
 
@@ -81,7 +286,7 @@ def connect_milvus():
 
 
 def get_milvus_collection():
-    """获取 Milvus Collection"""
+    """获取 Milvus Collection（通过别名解析到当前版本）"""
     connect_milvus()
     from pymilvus import Collection
     return Collection(MILVUS_CONFIG['collection'])
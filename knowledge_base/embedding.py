@@ -0,0 +1,405 @@
+"""
+Embedding 模型
+==============
+进程内共享的 embedding 模型与编码器
+
+- 本地编码：同一模型路径在进程内只加载一次，供 FAISS / Milvus 向量存储共用
+- 远程编码：配置 KB_EMBEDDING_SOCKET 后通过 Unix socket 调用 embedding 服务
+  （python -m knowledge_base.embedding_server），多个 uvicorn worker 共用一份模型
+"""
+
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+EMBEDDING_CONFIG = {
+    'socket_path': os.getenv('KB_EMBEDDING_SOCKET', ''),                # 为空时在本进程加载模型
+    'socket_timeout': float(os.getenv('KB_EMBEDDING_SOCKET_TIMEOUT', '300')),
+    'socket_retries': int(os.getenv('KB_EMBEDDING_SOCKET_RETRIES', '2')),             # 连接失败时的重试次数
+    'socket_cooldown': float(os.getenv('KB_EMBEDDING_SOCKET_COOLDOWN', '30')),        # 退化为本地编码后重新探测服务的间隔（秒）
+    'query_max_batch': int(os.getenv('KB_EMBEDDING_QUERY_MAX_BATCH', '32')),         # 查询合并编码的最大条数
+    'query_max_wait_ms': float(os.getenv('KB_EMBEDDING_QUERY_MAX_WAIT_MS', '5')),    # 查询合并等待时间（毫秒）
+}
+
+# BGE模型的查询前缀（对于检索任务，query加前缀，passage不加）
+QUERY_PREFIX = "为这个句子生成表示以用于检索相关文章："
+
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_path: str, device: str = "cpu"):
+    """
+    获取 embedding 模型（按模型路径在进程内共享）
+
+    Args:
+        model_path: 模型路径
+        device: 运行设备
+
+    Returns:
+        SentenceTransformer
+    """
+    model = _models.get(model_path)
+    if model is not None:
+        return model
+
+    with _models_lock:
+        model = _models.get(model_path)
+        if model is None:
+            print(f"📦 加载Embedding模型: {model_path}")
+            try:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_path, device=device)
+                print(f"   ✓ 模型加载完成")
+            except Exception as e:
+                print(f"   ✗ 模型加载失败: {e}")
+                raise
+            _models[model_path] = model
+    return model
+
+
+def loaded_embedding_models() -> list:
+    """已加载的模型路径"""
+    return list(_models.keys())
+
+
+# ============================================================================
+# 微批处理
+# ============================================================================
+
+class Histogram:
+    """固定分桶直方图"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+        labels = [f"<={bound:g}" for bound in self.buckets] + [f">{self.buckets[-1]:g}"]
+        return {
+            'count': count,
+            'avg': round(total / count, 3) if count else 0,
+            'buckets': dict(zip(labels, counts)),
+        }
+
+
+class MicroBatcher:
+    """
+    微批处理器
+
+    调用方提交一组文本后阻塞等待；后台线程把 max_wait_ms 内到达的请求
+    合并为一次编码（总条数不超过 max_batch），再把结果分发回各调用方
+    """
+
+    LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000]
+    BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch: int = 32, max_wait_ms: float = 5):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+
+        self.latency_ms = Histogram(self.LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram(self.BATCH_SIZE_BUCKETS)
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # fork 后子进程中没有后台线程，需要重新启动
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._loop, name='embedding-batcher', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """提交文本，返回结果为 (len(texts), dim) 向量的 Future"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((texts, future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """提交并等待结果"""
+        return self.submit(texts).result()
+
+    def _collect(self) -> List[Tuple]:
+        batch = [self._queue.get()]
+        total = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while total < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            total += len(item[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item_texts, _, _ in batch for text in item_texts]
+            self.batch_size.observe(len(texts))
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            now = time.perf_counter()
+            for item_texts, future, submitted in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+                self.latency_ms.observe((now - submitted) * 1000)
+
+    def stats(self) -> Dict:
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'pending': self._queue.qsize(),
+            'latency_ms': self.latency_ms.snapshot(),
+            'batch_size': self.batch_size.snapshot(),
+        }
+
+
+# ============================================================================
+# 编码器
+# ============================================================================
+
+class LocalEncoder:
+    """本进程内编码"""
+
+    mode = 'local'
+
+    def __init__(self, model_path: str, batch_size: int = 32):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.query_batcher = MicroBatcher(
+            self.encode,
+            max_batch=EMBEDDING_CONFIG['query_max_batch'],
+            max_wait_ms=EMBEDDING_CONFIG['query_max_wait_ms'],
+        )
+
+    @property
+    def model(self):
+        return get_embedding_model(self.model_path)
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """编码文本（归一化，内积等价于余弦相似度）"""
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=show_progress_bar,
+            normalize_embeddings=True
+        )
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """编码查询文本（添加BGE查询前缀，并发查询合并为一次编码），返回 (1, dim)"""
+        return self.query_batcher.encode([f"{QUERY_PREFIX}{query}"])
+
+    def warmup(self):
+        """预加载模型"""
+        self.model
+
+    def stats(self) -> Dict:
+        return {'mode': self.mode, 'model': self.model_path, 'query_batcher': self.query_batcher.stats()}
+
+
+class EmbeddingServiceError(RuntimeError):
+    """embedding 服务返回的错误（请求本身有误，不退化为本地编码）"""
+
+
+# 连接 / 传输层错误：重试，仍失败时暂时退化为本地编码
+_TRANSPORT_ERRORS = (OSError, struct.error, json.JSONDecodeError)
+
+
+class RemoteEncoder:
+    """
+    通过 embedding 服务编码
+
+    - 连接失败时重试，仍失败则暂时退化为本地编码，冷却期后重新探测服务
+    - 服务端返回的错误直接抛出 EmbeddingServiceError
+    - 查询的合并编码在服务端进行
+    """
+
+    mode = 'remote'
+
+    def __init__(self, socket_path: str, model_path: str, batch_size: int = 32):
+        self.socket_path = socket_path
+        self.model_path = model_path
+        self.timeout = EMBEDDING_CONFIG['socket_timeout']
+        self.retries = EMBEDDING_CONFIG['socket_retries']
+        self.cooldown = EMBEDDING_CONFIG['socket_cooldown']
+        self._local = LocalEncoder(model_path, batch_size)
+        self._fallback_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _fallback(self) -> bool:
+        return time.monotonic() < self._fallback_until
+
+    def _request_once(self, header: Dict, payload: bytes = b'') -> Tuple[Dict, bytes]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            send_message(sock, header, payload)
+            response, data = recv_message(sock)
+        if response.get('error'):
+            raise EmbeddingServiceError(response['error'])
+        return response, data
+
+    def _request(self, header: Dict, payload: bytes = b'') -> Tuple[Dict, bytes]:
+        """发送请求（传输错误时按 0.2s、0.4s ... 退避重试）"""
+        for attempt in range(self.retries + 1):
+            try:
+                return self._request_once(header, payload)
+            except _TRANSPORT_ERRORS:
+                if attempt >= self.retries:
+                    raise
+                time.sleep(0.2 * 2 ** attempt)
+
+    def _use_local(self, error: Exception):
+        with self._lock:
+            if not self._fallback:
+                print(f"⚠️ embedding 服务不可用（{self.socket_path}），{self.cooldown:g}s 内改为本地编码: {error}")
+            self._fallback_until = time.monotonic() + self.cooldown
+
+    def _recovered(self):
+        with self._lock:
+            if self._fallback_until:
+                print(f"🔌 embedding 服务已恢复: {self.socket_path}")
+                self._fallback_until = 0.0
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        if self._fallback:
+            return self._local.encode(texts, show_progress_bar)
+        try:
+            response, data = self._request({'op': 'encode', 'model': self.model_path, 'texts': texts})
+        except _TRANSPORT_ERRORS as e:
+            self._use_local(e)
+            return self._local.encode(texts, show_progress_bar)
+        self._recovered()
+        return np.frombuffer(data, dtype=response['dtype']).reshape(response['shape'])
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """编码查询文本（添加BGE查询前缀），返回 (1, dim)"""
+        if self._fallback:
+            return self._local.encode_query(query)
+        return self.encode([f"{QUERY_PREFIX}{query}"])
+
+    def warmup(self):
+        """检查服务是否可用（服务端报错，如模型不一致，直接抛出）"""
+        try:
+            self._request({'op': 'ping', 'model': self.model_path})
+            print(f"🔌 使用 embedding 服务: {self.socket_path}")
+        except _TRANSPORT_ERRORS as e:
+            self._use_local(e)
+            self._local.warmup()
+
+    def stats(self) -> Dict:
+        fallback = self._fallback
+        stats = {'mode': self.mode, 'model': self.model_path, 'socket': self.socket_path,
+                 'fallback': fallback}
+        if fallback:
+            stats['retry_in'] = round(self._fallback_until - time.monotonic(), 1)
+            stats['query_batcher'] = self._local.query_batcher.stats()
+        return stats
+
+
+_encoders: Dict[str, object] = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(model_path: str, batch_size: int = 32):
+    """
+    获取编码器（按模型路径在进程内共享）
+
+    配置了 KB_EMBEDDING_SOCKET 时使用 embedding 服务，否则本地加载模型
+    """
+    encoder = _encoders.get(model_path)
+    if encoder is None:
+        with _encoders_lock:
+            encoder = _encoders.get(model_path)
+            if encoder is None:
+                socket_path = EMBEDDING_CONFIG['socket_path']
+                if socket_path:
+                    encoder = RemoteEncoder(socket_path, model_path, batch_size)
+                else:
+                    encoder = LocalEncoder(model_path, batch_size)
+                _encoders[model_path] = encoder
+    return encoder
+
+
+def get_embedding_stats() -> List[Dict]:
+    """各编码器的统计（查询合并编码的延迟和批大小直方图）"""
+    return [encoder.stats() for encoder in list(_encoders.values())]
+
+
+# ============================================================================
+# 通信协议：[头部长度 4B][数据长度 4B][JSON 头部][二进制数据]
+# ============================================================================
+
+_FRAME = struct.Struct('>II')
+
+
+def send_message(sock: socket.socket, header: Dict, payload: bytes = b''):
+    head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_FRAME.pack(len(head), len(payload)) + head + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Tuple[Optional[Dict], bytes]:
+    head_size, payload_size = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, head_size).decode('utf-8'))
+    payload = _recv_exact(sock, payload_size) if payload_size else b''
+    return header, payload
@@ -0,0 +1,210 @@
+"""
+Embedding 缓存
+==============
+按 (模型, 案例文本) 哈希缓存向量，重建索引时只编码新增或变化的文本
+
+存储结构（每个模型一个目录）：
+    meta.json     {"model": ..., "dim": 1024, "dtype": "float16"}
+    vectors.bin   向量矩阵（按行追加，读取时内存映射）
+    keys.txt      每行一个文本哈希，行号即向量行号
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EMBEDDING_CACHE_CONFIG = {
+    'enabled': os.getenv('KB_EMBEDDING_CACHE', 'true').lower() == 'true',
+    'cache_dir': os.getenv('KB_EMBEDDING_CACHE_DIR', os.path.join(_BASE_DIR, 'data', 'embedding_cache')),
+    'dtype': os.getenv('KB_EMBEDDING_CACHE_DTYPE', 'float16'),   # float16 / float32
+}
+
+
+class EmbeddingCache:
+    """
+    向量缓存
+
+    只追加写入：先写向量再写哈希，中途中断时多出的向量行会被忽略
+    """
+
+    def __init__(self, model_id: str, cache_dir: str = None, dtype: str = None):
+        self.model_id = model_id
+        self.dtype = np.dtype(dtype or EMBEDDING_CACHE_CONFIG['dtype'])
+
+        model_key = hashlib.sha1(model_id.encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(cache_dir or EMBEDDING_CACHE_CONFIG['cache_dir'], model_key)
+        self.meta_file = os.path.join(self.path, 'meta.json')
+        self.vectors_file = os.path.join(self.path, 'vectors.bin')
+        self.keys_file = os.path.join(self.path, 'keys.txt')
+        self.lock_file = os.path.join(self.path, '.lock')
+        os.makedirs(self.path, exist_ok=True)
+
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._row_count = 0        # keys.txt 行数（即有效向量行数）
+        self._keys_offset = 0      # keys.txt 已读取到的位置
+        self._matrix = None
+        self._lock = threading.Lock()
+
+        self._stats = {'hits': 0, 'misses': 0}
+        self._load_meta()
+
+    def _load_meta(self):
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.dim = meta['dim']
+            self.dtype = np.dtype(meta['dtype'])
+
+    def _write_meta(self):
+        tmp_file = f"{self.meta_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model_id, 'dim': self.dim, 'dtype': self.dtype.name}, f)
+        os.replace(tmp_file, self.meta_file)
+
+    def key(self, text: str) -> str:
+        """文本哈希（包含模型标识，换模型后自动失效）"""
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode('utf-8')).hexdigest()
+
+    def _refresh(self):
+        """读取其他进程追加的哈希，并按需重新映射向量文件"""
+        if self.dim is None:
+            # 创建时 meta.json 尚不存在，其他进程写入后再读取
+            self._load_meta()
+        if not os.path.exists(self.keys_file) or self.dim is None:
+            return
+        with open(self.keys_file, 'r', encoding='utf-8') as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # 写入中的行
+                self._keys_offset += len(line.encode('utf-8'))
+                self._rows.setdefault(line.strip(), self._row_count)
+                self._row_count += 1
+
+        row_bytes = self.dim * self.dtype.itemsize
+        rows = os.path.getsize(self.vectors_file) // row_bytes if os.path.exists(self.vectors_file) else 0
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            self._matrix = np.memmap(self.vectors_file, dtype=self.dtype, mode='r', shape=(rows, self.dim)) \
+                if rows else None
+
+    def _append(self, keys: List[str], vectors: np.ndarray):
+        """追加向量（文件锁保证多进程写入顺序一致）"""
+        with open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self.dim is None:
+                    self.dim = int(vectors.shape[1])
+                    self._write_meta()
+                self._refresh()
+
+                new_keys, new_vectors = [], []
+                for key, vector in zip(keys, vectors):
+                    if key not in self._rows:
+                        new_keys.append(key)
+                        new_vectors.append(vector)
+                if not new_keys:
+                    return
+
+                # 以哈希行数对齐向量文件（截掉中断写入留下的多余行）
+                row_bytes = self.dim * self.dtype.itemsize
+                with open(self.vectors_file, 'ab') as f:
+                    f.truncate(self._row_count * row_bytes)
+                    f.write(np.asarray(new_vectors, dtype=self.dtype).tobytes())
+                with open(self.keys_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(f"{key}\n" for key in new_keys))
+                self._refresh()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        获取文本向量：命中缓存的直接读取，其余调用 encode_fn 编码后写入缓存
+
+        Args:
+            texts: 文本列表
+            encode_fn: 编码函数（texts -> (n, dim)）
+
+        Returns:
+            (len(texts), dim) float32 向量
+        """
+        if not texts:
+            return np.array([])
+
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            self._refresh()
+            missing: Dict[str, str] = {}
+            for key, text in zip(keys, texts):
+                if key not in self._rows:
+                    missing.setdefault(key, text)
+
+        # 编码期间不持有锁，其他线程的命中查询不被阻塞
+        encoded_rows = {}
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            if encoded.ndim != 2 or encoded.shape[0] != len(missing):
+                raise ValueError(f"编码结果形状异常: {encoded.shape}")
+            encoded_rows = dict(zip(missing.keys(), encoded))
+
+        with self._lock:
+            if missing:
+                # _append 刷新后跳过其他线程 / 进程期间已写入的键
+                self._append(list(missing.keys()), encoded)
+
+            self._stats['hits'] += len(texts) - len(missing)
+            self._stats['misses'] += len(missing)
+            if len(texts) > 10:
+                print(f"   向量缓存命中: {len(texts) - len(missing)}/{len(texts)}")
+
+            result = np.empty((len(texts), self.dim), dtype=np.float32)
+            for i, key in enumerate(keys):
+                vector = encoded_rows.get(key)
+                result[i] = vector if vector is not None else self._matrix[self._rows[key]]
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'entries': self._row_count,
+            'dtype': self.dtype.name,
+            **self._stats,
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_id: str) -> Optional[EmbeddingCache]:
+    """获取模型对应的向量缓存（未启用时返回 None）"""
+    if not EMBEDDING_CACHE_CONFIG['enabled']:
+        return None
+    cache = _caches.get(model_id)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(model_id)
+            if cache is None:
+                try:
+                    cache = EmbeddingCache(model_id)
+                except OSError as e:
+                    print(f"⚠️ 向量缓存不可用: {e}")
+                    return None
+                _caches[model_id] = cache
+    return cache
+
+
+def cached_encode(model_id: str, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+    """经向量缓存编码（缓存未启用时直接编码）"""
+    cache = get_embedding_cache(model_id)
+    if cache is None:
+        return encode_fn(texts)
+    return cache.encode(texts, encode_fn)
@@ -0,0 +1,126 @@
+"""
+Embedding 服务
+==============
+常驻进程加载一份 embedding 模型，通过 Unix socket 为多个 API worker 提供编码，
+并把同时到达的请求合并成一次 model.encode
+
+启动方式:
+    python -m knowledge_base.embedding_server --socket /tmp/kb_embedding.sock
+
+API worker 配置 KB_EMBEDDING_SOCKET=/tmp/kb_embedding.sock 后即通过本服务编码
+"""
+
+import os
+import sys
+import argparse
+import socketserver
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.embedding import get_embedding_model, MicroBatcher, send_message, recv_message
+
+
+DEFAULT_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "/data/models/bge-large-zh-v1.5")
+
+
+class EmbeddingServer:
+    """
+    embedding 服务
+
+    并发请求经 MicroBatcher 合并：等待不超过 max_wait_ms、总文本数不超过 max_batch 的一组请求一起编码
+    """
+
+    def __init__(self, socket_path: str, model_path: str = DEFAULT_MODEL_PATH,
+                 max_batch: int = 64, max_wait_ms: float = 5, batch_size: int = 32):
+        self.socket_path = socket_path
+        self.model_path = model_path
+        self.batch_size = batch_size
+
+        self._batcher = MicroBatcher(self._encode_batch, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self._server = None
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        model = get_embedding_model(self.model_path)
+        return model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        ).astype(np.float32)
+
+    def submit(self, texts: List[str]) -> Future:
+        return self._batcher.submit(texts)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    request, _ = recv_message(self.request)
+                except Exception:
+                    return
+
+                if request.get('model') and request['model'] != server.model_path:
+                    send_message(self.request, {'error': f"模型不一致: 服务端 {server.model_path}"})
+                    return
+
+                op = request.get('op')
+                if op == 'ping':
+                    send_message(self.request, {'ok': True, 'model': server.model_path})
+                elif op == 'stats':
+                    send_message(self.request, server._batcher.stats())
+                elif op == 'encode':
+                    texts = request.get('texts') or []
+                    try:
+                        vectors = server.submit(texts).result() if texts else np.zeros((0, 0), np.float32)
+                    except Exception as e:
+                        send_message(self.request, {'error': str(e)})
+                        return
+                    send_message(self.request, {'dtype': 'float32', 'shape': list(vectors.shape)},
+                                 vectors.tobytes())
+                else:
+                    send_message(self.request, {'error': f"未知操作: {op}"})
+
+        return Handler
+
+    def serve_forever(self):
+        # 启动前加载模型
+        get_embedding_model(self.model_path)
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self._server = Server(self.socket_path, self._make_handler())
+        os.chmod(self.socket_path, 0o660)
+        print(f"🚀 embedding 服务已启动: {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='embedding 服务')
+    parser.add_argument('--socket', default=os.getenv('KB_EMBEDDING_SOCKET') or '/tmp/kb_embedding.sock',
+                        help='Unix socket 路径')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='模型路径')
+    parser.add_argument('--max-batch', type=int, default=64, help='单次合并编码的最大文本数')
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='合并请求的最长等待时间（毫秒）')
+    args = parser.parse_args()
+
+    EmbeddingServer(args.socket, args.model, max_batch=args.max_batch,
+                    max_wait_ms=args.max_wait_ms).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
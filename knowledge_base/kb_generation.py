@@ -0,0 +1,178 @@
+"""
+知识库版本号与统计快照缓存
+==========================
+入库、删除时版本号加一，统计结果按版本号缓存：版本号不变时直接返回快照，写入后自动失效
+
+多进程：写入事务内发送 PostgreSQL NOTIFY，各进程的监听线程收到后递增本地版本号
+"""
+
+import os
+import socket
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+KB_GENERATION_CONFIG = {
+    'listen': os.getenv('KB_STATS_LISTEN', 'true').lower() == 'true',     # 数据库模式下监听其他进程的写入通知
+    'channel': os.getenv('KB_NOTIFY_CHANNEL', 'kb_changed'),              # NOTIFY 通道名
+    'cache_size': int(os.getenv('KB_STATS_CACHE_SIZE', '256')),           # 每个版本最多缓存的统计条目数
+}
+
+
+class KBGeneration:
+    """
+    知识库版本号（进程内）
+
+    - value: 本进程写入和收到的其他进程写入都会递增
+    - remote: 只统计其他进程的写入（本进程的增量快照据此判断是否需要重新加载）
+    """
+
+    def __init__(self, channel: str = None):
+        self.channel = channel or KB_GENERATION_CONFIG['channel']
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+
+        self._value = 0
+        self._remote = 0
+        self._lock = threading.Lock()
+
+        self._listener = None
+        self._stop = threading.Event()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    @property
+    def remote(self) -> int:
+        return self._remote
+
+    def bump(self) -> int:
+        """本进程写入后调用"""
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    def _bump_remote(self):
+        with self._lock:
+            self._value += 1
+            self._remote += 1
+
+    # ------------------------------------------------------------------
+    # 多进程失效（PostgreSQL LISTEN / NOTIFY）
+    # ------------------------------------------------------------------
+
+    def notify(self, cursor):
+        """
+        在写入事务内发送变更通知（事务提交后才会投递，回滚则不发送）
+
+        Args:
+            cursor: 执行写入的游标
+        """
+        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, self.origin))
+
+    def start_listener(self):
+        """启动监听线程（重复调用无效）"""
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen_loop, name='kb-generation-listener', daemon=True)
+        self._listener.start()
+
+    def stop_listener(self):
+        self._stop.set()
+
+    def _listen_loop(self):
+        import select
+        from .db_connection import get_pg_connection
+
+        backoff = 1
+        connected_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = get_pg_connection()
+                conn.set_session(autocommit=True)
+                with conn.cursor() as cursor:
+                    cursor.execute('LISTEN "%s"' % self.channel.replace('"', '""'))
+
+                # 断线期间可能错过通知，重连后统一失效一次
+                if connected_before:
+                    self._bump_remote()
+                connected_before = True
+                backoff = 1
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    changed = False
+                    while conn.notifies:
+                        if conn.notifies.pop(0).payload != self.origin:
+                            changed = True
+                    if changed:
+                        self._bump_remote()
+            except Exception as e:
+                print(f"⚠️ 知识库变更监听中断（{backoff}s 后重连）: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+class StatsCache:
+    """
+    统计快照缓存（按知识库版本号失效）
+
+    返回的是共享快照，调用方不要修改
+    """
+
+    def __init__(self, generation: KBGeneration, max_entries: int = None):
+        self.generation = generation
+        self.max_entries = max_entries or KB_GENERATION_CONFIG['cache_size']
+
+        self._generation = generation.value
+        self._entries: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        获取统计快照（当前版本未缓存时调用 compute 计算）
+
+        Args:
+            key: 缓存键（包含查询参数）
+            compute: 计算函数
+        """
+        generation = self.generation.value
+        with self._lock:
+            if self._generation != generation:
+                self._entries.clear()
+                self._generation = generation
+            if key in self._entries:
+                self._stats['hits'] += 1
+                return self._entries[key]
+            self._stats['misses'] += 1
+
+        value = compute()
+
+        with self._lock:
+            # 计算期间发生写入时不缓存（结果可能已过期）
+            if self._generation == generation == self.generation.value and len(self._entries) < self.max_entries:
+                self._entries[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'generation': self.generation.value,
+            'entries': len(self._entries),
+            **self._stats,
+        }
@@ -7,12 +7,15 @@
 import os
 import sys
 import json
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass, field, asdict
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils import generate_id, get_timestamp
+from .case_matrix import CaseMatrix
+from .kb_generation import KBGeneration, StatsCache
+from .pagination import page_items
 
 
 def result_to_dict(result) -> Dict:
@@ -121,6 +124,11 @@ class KnowledgeBaseManager:
 
         # 向量存储（延时初始化）
         self._vector_store = None
+        self._case_matrix = None   # 案例列存快照（延迟加载）
+
+        # 版本号与统计快照（写入后失效）
+        self.generation = KBGeneration()
+        self.stats_cache = StatsCache(self.generation)
     
     def _load_index(self) -> Dict:
         """加载索引"""
@@ -152,6 +160,13 @@ class KnowledgeBaseManager:
                 return None
         return self._vector_store
 
+    @property
+    def case_matrix(self) -> CaseMatrix:
+        """案例列存快照（首次使用时从内存索引构建，之后随增删增量更新）"""
+        if self._case_matrix is None:
+            self._case_matrix = CaseMatrix.from_items(self.index.get('cases', []), ttl=0)
+        return self._case_matrix
+    
     def rebuild_vector_index(self):
         """重建向量索引"""
         if not self.enable_vector or self.vector_store is None:
@@ -161,8 +176,7 @@ class KnowledgeBaseManager:
         # 加载所有案例完整数据
         cases = []
         for case_item in self.index.get('cases', []):
-            case_id = case_item.get('case_id')
-            case_data = self.get_case(case_id)
+            case_data = self._load_case_file(case_item.get('case_id'))
             if case_data:
                 cases.append(case_data)
 
@@ -176,18 +190,82 @@ class KnowledgeBaseManager:
 
         if self.vector_store.is_dirty:
             self.rebuild_vector_index()
+
+    def _update_vector_index(self, add_cases: List[Dict] = None, delete_ids: List[str] = None):
+        """增量更新向量索引（失败时标记重建，下次检索前全量重建）"""
+        vector_store = self.vector_store
+        if vector_store is None or vector_store.is_dirty:
+            return
+
+        try:
+            if delete_ids:
+                vector_store.delete(delete_ids)
+            if add_cases:
+                vector_store.add_cases(add_cases)
+        except Exception as e:
+            print(f"⚠️ 向量索引增量更新失败，标记重建: {e}")
+            vector_store.mark_dirty()
+
+    def _load_case_file(self, case_id: str) -> Optional[Dict]:
+        """读取案例完整数据"""
+        case_file = os.path.join(self.cases_path, f"{case_id}.json")
+        if os.path.exists(case_file):
+            with open(case_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return None
     
-    def add_report(self, result, report_type: str) -> str:
+    def add_report(self, result, report_type: str, content_hash: str = None, file_path: str = None) -> str:
         """
         添加报告到知识库
         
         Args:
             result: 提取结果
             report_type: 报告类型
+            content_hash: 源文件内容哈希（可选，用于增量构建去重）
+            file_path: 源文件路径（可选，重新构建时据此替换旧版本）
         
         Returns:
             doc_id
         """
+        return self.add_reports_bulk([(result, report_type, content_hash, file_path)])[0]
+    
+    def add_reports_bulk(self, results: List[Tuple]) -> List[str]:
+        """
+        批量添加报告（索引只保存一次）
+        
+        Args:
+            results: [(提取结果, 报告类型), ...] 或 [(提取结果, 报告类型, 内容哈希[, 源文件路径]), ...]
+        
+        Returns:
+            doc_id 列表（与输入顺序一致）
+        """
+        if not results:
+            return []
+        
+        new_cases = []
+        case_count = len(self.index['cases'])
+        doc_ids = [
+            self._add_report_entry(item[0], item[1], item[2] if len(item) > 2 else None, new_cases,
+                                   item[3] if len(item) > 3 else None)
+            for item in results
+        ]
+        
+        self._save_index()
+        self.generation.bump()
+
+        # 更新案例快照
+        if self._case_matrix is not None:
+            self._case_matrix.add(self.index['cases'][case_count:])
+
+        # 只编码并写入新案例的向量
+        if self.enable_vector and new_cases:
+            self._update_vector_index(add_cases=new_cases)
+
+        return doc_ids
+    
+    def _add_report_entry(self, result, report_type: str, content_hash: str = None,
+                          new_cases: List[Dict] = None, file_path: str = None) -> str:
+        """写入报告和案例文件并更新内存索引（不保存索引），案例数据追加到 new_cases"""
         doc_id = generate_id("doc")
         
         # 转为字典
@@ -211,6 +289,8 @@ class KnowledgeBaseManager:
             'area': subject.building_area.value or 0,
             'case_count': len(result.cases),
             'create_time': get_timestamp(),
+            'content_hash': content_hash,
+            'file_path': os.path.abspath(file_path) if file_path else None,
             # 扩展字段
             'district': getattr(subject, 'district', ''),
             'street': getattr(subject, 'street', ''),
@@ -224,9 +304,8 @@ class KnowledgeBaseManager:
         })
         
         # 保存案例并添加到索引
-        for case in result.cases:
+        for case, case_data in zip(result.cases, data['cases']):
             case_id = f"{doc_id}_case_{case.case_id}"
-            case_data = result_to_dict(result)['cases'][result.cases.index(case)]
             case_data['case_id_full'] = case_id
             case_data['from_doc'] = doc_id
             case_data['report_type'] = report_type
@@ -234,6 +313,8 @@ class KnowledgeBaseManager:
             case_file = os.path.join(self.cases_path, f"{case_id}.json")
             with open(case_file, 'w', encoding='utf-8') as f:
                 json.dump(case_data, f, ensure_ascii=False, indent=2)
+            if new_cases is not None:
+                new_cases.append(case_data)
             
             # 获取价格
             price = 0
@@ -271,14 +352,36 @@ class KnowledgeBaseManager:
                 'transaction_date': transaction_date,
             })
         
-        self._save_index()
-
-        # 标记向量索引需要重建
-        if self.enable_vector and self._vector_store is not None:
-            self._vector_store.mark_dirty()
-
         return doc_id
     
+    def find_ingested_hashes(self, content_hashes: List[str]) -> Dict[str, str]:
+        """
+        查询已入库的源文件哈希
+        
+        Returns:
+            {content_hash: doc_id}
+        """
+        wanted = set(content_hashes)
+        return {
+            r['content_hash']: r['doc_id']
+            for r in self.index.get('reports', [])
+            if r.get('content_hash') in wanted
+        }
+    
+    def find_reports_by_paths(self, file_paths: List[str]) -> Dict[str, List[str]]:
+        """
+        查询源文件已入库的报告
+        
+        Returns:
+            {源文件绝对路径: [doc_id, ...]}
+        """
+        wanted = {os.path.abspath(path) for path in file_paths}
+        found: Dict[str, List[str]] = {}
+        for r in self.index.get('reports', []):
+            if r.get('file_path') in wanted:
+                found.setdefault(r['file_path'], []).append(r['doc_id'])
+        return found
+    
     def get_report(self, doc_id: str) -> Optional[Dict]:
         """获取报告"""
         report_file = os.path.join(self.reports_path, f"{doc_id}.json")
@@ -289,16 +392,26 @@ class KnowledgeBaseManager:
 
     def get_case(self, case_id: str) -> Optional[Dict]:
         """获取单个案例详情"""
-        for doc_id, report in self.index.get("reports", {}).items():
-            for case in report.get("cases", []):
-                if case.get("case_id") == case_id:
-                    return {
-                        "case_id": case_id,
-                        "doc_id": doc_id,
-                        "report_type": report.get("report_type"),
-                        **case,
-                    }
-        return None
+        return self.get_cases([case_id]).get(case_id)
+    
+    def get_cases(self, case_ids: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取案例详情
+        
+        Returns:
+            {case_id: 案例详情}
+        """
+        cases = {}
+        for case_id in case_ids:
+            case_data = self._load_case_file(case_id)
+            if case_data:
+                cases[case_id] = {
+                    **case_data,
+                    "case_id": case_id,
+                    "doc_id": case_data.get("from_doc"),
+                    "report_type": case_data.get("report_type"),
+                }
+        return cases
     
     def list_reports(self, report_type: str = None) -> List[Dict]:
         """列出报告"""
@@ -314,6 +427,46 @@ class KnowledgeBaseManager:
             cases = [c for c in cases if c.get('report_type') == report_type]
         return cases
     
+    def page_reports(self, report_type: str = None, keyword: str = None, limit: int = 20,
+                     cursor: str = None, offset: int = 0, total_mode: str = 'exact') -> Dict:
+        """报告分页（按 create_time, doc_id 倒序，游标与数据库版一致）"""
+        reports = self.list_reports(report_type)
+        if keyword:
+            keyword = keyword.lower()
+            reports = [
+                r for r in reports
+                if keyword in (r.get('address', '') or '').lower()
+                or keyword in (r.get('source_file', '') or '').lower()
+            ]
+        return page_items(reports, limit, lambda r: (r.get('create_time') or '', r['doc_id']),
+                          cursor, offset, total_mode)
+
+    def page_cases(self, report_type: str = None, district: str = None, usage: str = None,
+                   keyword: str = None, min_area: float = None, max_area: float = None,
+                   min_price: float = None, max_price: float = None, limit: int = 20,
+                   cursor: str = None, offset: int = 0, total_mode: str = 'exact') -> Dict:
+        """案例分页（案例按所属报告的入库时间排序）"""
+        keyword = keyword.lower() if keyword else None
+        cases = []
+        for c in self.list_cases(report_type):
+            if district and c.get('district') != district:
+                continue
+            if usage and c.get('usage') != usage:
+                continue
+            area = c.get('area') or 0
+            if (min_area and area < min_area) or (max_area and area > max_area):
+                continue
+            price = c.get('price') or 0
+            if (min_price and price < min_price) or (max_price and price > max_price):
+                continue
+            if keyword and keyword not in (c.get('address') or '').lower():
+                continue
+            cases.append(c)
+
+        create_times = {r['doc_id']: r.get('create_time') or '' for r in self.index.get('reports', [])}
+        return page_items(cases, limit, lambda c: (create_times.get(c.get('from_doc'), ''), c['case_id']),
+                          cursor, offset, total_mode)
+
     def delete_report(self, doc_id: str) -> bool:
         """删除报告及其案例"""
         # 删除报告文件
@@ -322,8 +475,10 @@ class KnowledgeBaseManager:
             os.remove(report_file)
         
         # 删除案例文件
+        case_ids = []
         for case in self.index.get('cases', []):
             if case.get('from_doc') == doc_id:
+                case_ids.append(case['case_id'])
                 case_file = os.path.join(self.cases_path, f"{case['case_id']}.json")
                 if os.path.exists(case_file):
                     os.remove(case_file)
@@ -332,10 +487,14 @@ class KnowledgeBaseManager:
         self.index['reports'] = [r for r in self.index.get('reports', []) if r.get('doc_id') != doc_id]
         self.index['cases'] = [c for c in self.index.get('cases', []) if c.get('from_doc') != doc_id]
         self._save_index()
+        self.generation.bump()
 
-        # 标记向量索引需要重建
-        if self.enable_vector and self._vector_store is not None:
-            self._vector_store.mark_dirty()
+        if self._case_matrix is not None:
+            self._case_matrix.remove(case_ids)
+
+        # 只删除该报告案例的向量
+        if self.enable_vector and case_ids:
+            self._update_vector_index(delete_ids=case_ids)
         
         return True
     
@@ -370,6 +529,8 @@ class KnowledgeBaseManager:
                 os.makedirs(path)
         self.index = {'reports': [], 'cases': []}
         self._save_index()
+        self.generation.bump()
+        self._case_matrix = None
 
         # 清空向量索引
         if self.enable_vector and self._vector_store is not None:
@@ -7,13 +7,75 @@
 import os
 import sys
 import json
-from typing import List, Dict, Optional, Any
+import threading
+from typing import List, Dict, Optional, Any, Set, Tuple
 from dataclasses import dataclass, field, asdict
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils import generate_id, get_timestamp
+from config import KB_CONFIG
 from .db_connection import pg_cursor, test_pg_connection
+from .case_matrix import CaseMatrix
+from .kb_generation import KBGeneration, StatsCache, KB_GENERATION_CONFIG
+from .quantile_sketch import SKETCH_METRICS, build_sketches, apply_sketch_delta
+from .pagination import decode_cursor, escape_like, page_result
+
+# 批量写入时每条 INSERT 语句包含的行数
+BULK_PAGE_SIZE = 500
+
+# 修正系数（从 case_data 提取为数值列，供 SQL 聚合统计）
+CORRECTION_FIELDS = [
+    'transaction_correction', 'market_correction', 'location_correction',
+    'physical_correction', 'rights_correction',
+]
+
+# cases 表写入列（_build_rows 生成的行与此顺序一致）
+CASE_COLUMNS = [
+    'case_id', 'case_id_full', 'doc_id', 'report_type', 'address',
+    'district', 'street', 'area', 'price', 'usage', 'build_year',
+    'total_floor', 'current_floor', 'orientation', 'decoration',
+    'structure', *CORRECTION_FIELDS, 'case_data',
+]
+
+
+def _numeric_value(field) -> Optional[float]:
+    """LocatedValue 的数值（非数值返回 None）"""
+    value = getattr(field, 'value', None)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+# 案例详情列（get_case / get_cases 返回的字段）
+CASE_DETAIL_COLUMNS = [
+    'case_id', 'doc_id', 'report_type', 'address', 'district', 'street',
+    'area', 'price', 'usage', 'build_year', 'total_floor', 'current_floor',
+    'orientation', 'decoration', 'structure', 'case_data', 'create_time',
+]
+
+
+def case_row_to_vector_input(row: tuple) -> Dict:
+    """cases 表行 -> 向量化输入（案例完整数据，叠加表中的结构化字段）"""
+    columns = dict(zip(CASE_COLUMNS, row))
+    case_data = columns.pop('case_data') or {}
+    if isinstance(case_data, str):
+        case_data = json.loads(case_data)
+
+    case = dict(case_data)
+    case.update({k: v for k, v in columns.items() if v and k not in CORRECTION_FIELDS})
+    case['from_doc'] = columns['doc_id']
+    return case
+
+
+def _sketch_items(case_rows: List[tuple]) -> List[Dict]:
+    """cases 表写入行 -> 分布草图输入（结构化字段 + 交易日期）"""
+    items = []
+    for row in case_rows:
+        item = dict(zip(CASE_COLUMNS, row))
+        item['transaction_date'] = json.loads(item.pop('case_data')).get('transaction_date')
+        items.append(item)
+    return items
 
 
 def result_to_dict(result) -> Dict:
@@ -113,10 +175,21 @@ class KnowledgeBaseManager:
         # 向量存储（延迟初始化）
         self._vector_store = None
 
+        # 案例列存快照（延迟加载）
+        self._case_matrix = None
+        self._case_matrix_remote = 0
+        self._case_matrix_lock = threading.Lock()
+
         # 测试数据库连接
         if not test_pg_connection():
             raise RuntimeError("PostgreSQL 连接失败，请检查数据库配置")
 
+        # 版本号与统计快照（写入后失效，其他进程的写入经 NOTIFY 通知）
+        self.generation = KBGeneration()
+        self.stats_cache = StatsCache(self.generation)
+        if KB_GENERATION_CONFIG['listen']:
+            self.generation.start_listener()
+
     @property
     def vector_store(self):
         """获取向量存储（延迟加载）"""
@@ -137,22 +210,77 @@ class KnowledgeBaseManager:
                 return None
         return self._vector_store
 
+    @property
+    def case_matrix(self) -> CaseMatrix:
+        """案例列存快照（首次使用时加载，超过 TTL 或收到其他进程的写入通知后重新加载）"""
+        matrix = self._case_matrix
+        if matrix is None or matrix.expired() or self._case_matrix_remote != self.generation.remote:
+            with self._case_matrix_lock:
+                remote = self.generation.remote
+                if self._case_matrix is None or self._case_matrix.expired() or self._case_matrix_remote != remote:
+                    with pg_cursor(commit=False) as cursor:
+                        cursor.execute(f"SELECT {', '.join(CaseMatrix.COLUMNS)} FROM cases")
+                        self._case_matrix = CaseMatrix.from_rows(cursor.fetchall(), KB_CONFIG['case_matrix_ttl'])
+                    self._case_matrix_remote = remote
+                matrix = self._case_matrix
+        return matrix
+
+    def rebuild_sketches(self):
+        """从 cases 表全量重建分布草图"""
+        sketch_columns = ['report_type', 'district', 'usage', *SKETCH_METRICS]
+        with pg_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join(sketch_columns)}, case_data->>'transaction_date' FROM cases
+            """)
+            items = [{**dict(zip(sketch_columns, row[:-1])), 'transaction_date': row[-1]}
+                     for row in cursor.fetchall()]
+
+            cursor.execute("DELETE FROM case_sketches")
+            sketches = build_sketches(items)
+            apply_sketch_delta(cursor, sketches)
+            self.generation.notify(cursor)
+        self.generation.bump()
+        return len(sketches)
+
     def rebuild_vector_index(self):
         """重建向量索引"""
         if not self.enable_vector or self.vector_store is None:
             print("⚠️ 向量存储未启用")
             return
 
-        # 加载所有案例
-        cases = []
-        for case_item in self.list_cases():
-            case_data = self.get_case(case_item['case_id'])
-            if case_data:
-                cases.append(case_data)
+        # 一次查询加载所有案例
+        with pg_cursor(commit=False) as cursor:
+            cursor.execute(f"SELECT {', '.join(CASE_COLUMNS)} FROM cases ORDER BY create_time")
+            cases = [case_row_to_vector_input(row) for row in cursor.fetchall()]
 
         # 重建索引
         self.vector_store.rebuild(cases)
 
+        # 其他进程在重建期间的增量写入只进了旧集合，切换后按快照补齐
+        self._replay_vector_writes({case['case_id_full'] for case in cases if case.get('case_id_full')})
+
+    def _replay_vector_writes(self, snapshot_ids: Set[str]):
+        """
+        重建后补齐快照之后的变更：新增的案例写入向量，已删除的案例删除向量
+
+        Args:
+            snapshot_ids: 重建所用快照中的案例 id
+        """
+        with pg_cursor(commit=False) as cursor:
+            cursor.execute("SELECT case_id_full FROM cases")
+            current_ids = {row[0] for row in cursor.fetchall()}
+
+            added = sorted(current_ids - snapshot_ids)
+            add_cases = []
+            if added:
+                cursor.execute(f"SELECT {', '.join(CASE_COLUMNS)} FROM cases WHERE case_id_full = ANY(%s)", (added,))
+                add_cases = [case_row_to_vector_input(row) for row in cursor.fetchall()]
+
+        deleted = sorted(snapshot_ids - current_ids)
+        if add_cases or deleted:
+            print(f"   补齐重建期间的变更: 新增 {len(add_cases)} 条，删除 {len(deleted)} 条")
+            self._update_vector_index(add_cases=add_cases, delete_ids=deleted)
+
     def ensure_vector_index(self):
         """确保向量索引是最新的"""
         if not self.enable_vector or self.vector_store is None:
@@ -161,43 +289,116 @@ class KnowledgeBaseManager:
         if self.vector_store.is_dirty:
             self.rebuild_vector_index()
 
-    def add_report(self, result, report_type: str) -> str:
+    def _update_vector_index(self, add_cases: List[Dict] = None, delete_ids: List[str] = None):
+        """增量更新向量索引（失败时标记重建，下次检索前全量重建）"""
+        vector_store = self.vector_store
+        if vector_store is None or vector_store.is_dirty:
+            return
+
+        try:
+            if delete_ids:
+                vector_store.delete(delete_ids)
+            if add_cases:
+                vector_store.add_cases(add_cases)
+        except Exception as e:
+            print(f"⚠️ 向量索引增量更新失败，标记重建: {e}")
+            vector_store.mark_dirty()
+
+    def add_report(self, result, report_type: str, content_hash: str = None, file_path: str = None) -> str:
         """
         添加报告到知识库
 
         Args:
             result: 提取结果
             report_type: 报告类型
+            content_hash: 源文件内容哈希（可选，用于增量构建去重）
+            file_path: 源文件路径（可选，重新构建时据此替换旧版本）
 
         Returns:
             doc_id
         """
-        doc_id = generate_id("doc")
-        data = result_to_dict(result)
-        subject = result.subject
+        return self.add_reports_bulk([(result, report_type, content_hash, file_path)])[0]
+
+    def add_reports_bulk(self, results: List[Tuple]) -> List[str]:
+        """
+        批量添加报告（单事务，多行插入）
+
+        Args:
+            results: [(提取结果, 报告类型), ...] 或 [(提取结果, 报告类型, 内容哈希[, 源文件路径]), ...]
+
+        Returns:
+            doc_id 列表（与输入顺序一致）
+        """
+        if not results:
+            return []
+
+        doc_ids = []
+        doc_rows = []
+        case_rows = []
+
+        for item in results:
+            result, report_type = item[0], item[1]
+            content_hash = item[2] if len(item) > 2 else None
+            file_path = item[3] if len(item) > 3 else None
+            doc_id = generate_id("doc")
+            doc_row, rows = self._build_rows(result, report_type, doc_id, content_hash, file_path)
+            doc_ids.append(doc_id)
+            doc_rows.append(doc_row)
+            case_rows.extend(rows)
+
+        from psycopg2.extras import execute_values
 
-        # 插入文档
         with pg_cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO documents (doc_id, filename, file_path, file_type, report_type, 
-                                       address, area, case_count, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                doc_id,
-                result.source_file,
-                None,
-                'word',
-                report_type,
-                subject.address.value or '',
-                subject.building_area.value or 0,
-                len(result.cases),
-                json.dumps(data, ensure_ascii=False),
-            ))
+            execute_values(cursor, """
+                INSERT INTO documents (doc_id, filename, file_path, file_type, report_type,
+                                       address, area, case_count, metadata, content_hash)
+                VALUES %s
+            """, doc_rows, page_size=BULK_PAGE_SIZE)
+
+            if case_rows:
+                execute_values(cursor, f"""
+                    INSERT INTO cases ({', '.join(CASE_COLUMNS)})
+                    VALUES %s
+                """, case_rows, page_size=BULK_PAGE_SIZE)
+
+                # 同一事务内更新分布草图
+                apply_sketch_delta(cursor, build_sketches(_sketch_items(case_rows)))
+
+            self.generation.notify(cursor)
+        self.generation.bump()
+
+        # 更新案例快照
+        if self._case_matrix is not None:
+            self._case_matrix.add([dict(zip(CASE_COLUMNS, row)) for row in case_rows])
 
-        # 插入案例
-        for case in result.cases:
+        # 只编码并写入新案例的向量
+        if self.enable_vector and case_rows:
+            self._update_vector_index(add_cases=[case_row_to_vector_input(row) for row in case_rows])
+
+        return doc_ids
+
+    def _build_rows(self, result, report_type: str, doc_id: str,
+                    content_hash: str = None, file_path: str = None) -> Tuple[tuple, List[tuple]]:
+        """将提取结果转换为 documents / cases 表的行（只转换一次字典）"""
+        data = result_to_dict(result)
+        subject = result.subject
+
+        doc_row = (
+            doc_id,
+            result.source_file,
+            os.path.abspath(file_path) if file_path else None,
+            'word',
+            report_type,
+            subject.address.value or '',
+            subject.building_area.value or 0,
+            len(result.cases),
+            json.dumps(data, ensure_ascii=False),
+            content_hash,
+        )
+
+        case_rows = []
+        for case, case_data in zip(result.cases, data['cases']):
             case_id = f"{doc_id}_case_{case.case_id}"
-            case_data = result_to_dict(result)['cases'][result.cases.index(case)]
             case_data['case_id_full'] = case_id
             case_data['from_doc'] = doc_id
             case_data['report_type'] = report_type
@@ -214,38 +415,69 @@ class KnowledgeBaseManager:
             # 获取面积
             area = case.building_area.value if case.building_area.value else 0
 
-            with pg_cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO cases (case_id, case_id_full, doc_id, report_type, address,
-                                       district, street, area, price, usage, build_year,
-                                       total_floor, current_floor, orientation, decoration,
-                                       structure, case_data)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    case_id,
-                    case_id,
-                    doc_id,
-                    report_type,
-                    case.address.value or '',
-                    getattr(case, 'district', ''),
-                    getattr(case, 'street', ''),
-                    area,
-                    price,
-                    getattr(case, 'usage', ''),
-                    getattr(case, 'build_year', 0),
-                    getattr(case, 'total_floor', 0),
-                    getattr(case, 'current_floor', 0),
-                    getattr(case, 'orientation', ''),
-                    getattr(case, 'decoration', ''),
-                    getattr(case, 'structure', ''),
-                    json.dumps(case_data, ensure_ascii=False),
-                ))
-
-        # 添加到向量索引
-        if self.enable_vector and self._vector_store is not None:
-            self._vector_store.mark_dirty()
+            case_rows.append((
+                case_id,
+                case_id,
+                doc_id,
+                report_type,
+                case.address.value or '',
+                getattr(case, 'district', ''),
+                getattr(case, 'street', ''),
+                area,
+                price,
+                getattr(case, 'usage', ''),
+                getattr(case, 'build_year', 0),
+                getattr(case, 'total_floor', 0),
+                getattr(case, 'current_floor', 0),
+                getattr(case, 'orientation', ''),
+                getattr(case, 'decoration', ''),
+                getattr(case, 'structure', ''),
+                *[_numeric_value(getattr(case, field, None)) for field in CORRECTION_FIELDS],
+                json.dumps(case_data, ensure_ascii=False),
+            ))
+
+        return doc_row, case_rows
 
-        return doc_id
+    def find_ingested_hashes(self, content_hashes: List[str]) -> Dict[str, str]:
+        """
+        查询已入库的源文件哈希
+
+        Args:
+            content_hashes: 内容哈希列表
+
+        Returns:
+            {content_hash: doc_id}
+        """
+        if not content_hashes:
+            return {}
+
+        with pg_cursor(commit=False) as cursor:
+            cursor.execute("""
+                SELECT content_hash, doc_id FROM documents
+                WHERE content_hash = ANY(%s)
+            """, (list(content_hashes),))
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
+    def find_reports_by_paths(self, file_paths: List[str]) -> Dict[str, List[str]]:
+        """
+        查询源文件已入库的报告
+
+        Returns:
+            {源文件绝对路径: [doc_id, ...]}
+        """
+        paths = [os.path.abspath(path) for path in file_paths]
+        if not paths:
+            return {}
+
+        with pg_cursor(commit=False) as cursor:
+            cursor.execute("""
+                SELECT file_path, doc_id FROM documents
+                WHERE file_path = ANY(%s)
+            """, (paths,))
+            found: Dict[str, List[str]] = {}
+            for file_path, doc_id in cursor.fetchall():
+                found.setdefault(file_path, []).append(doc_id)
+            return found
 
     def get_report(self, doc_id: str) -> Optional[Dict]:
         """获取报告"""
@@ -263,43 +495,31 @@ class KnowledgeBaseManager:
 
     def get_case(self, case_id: str) -> Optional[Dict]:
         """获取单个案例详情"""
-        with pg_cursor(commit=False) as cursor:
-            cursor.execute("""
-                           SELECT case_id,
-                                  doc_id,
-                                  report_type,
-                                  address,
-                                  district,
-                                  street,
-                                  area,
-                                  price, usage, build_year, total_floor, current_floor, orientation, decoration, structure, case_data, create_time
-                           FROM cases
-                           WHERE case_id = %s
-                           """, (case_id,))
+        return self.get_cases([case_id]).get(case_id)
 
-            row = cursor.fetchone()
-            if not row:
-                return None
+    def get_cases(self, case_ids: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取案例详情（一次查询）
 
-            return {
-                "case_id": row[0],
-                "doc_id": row[1],
-                "report_type": row[2],
-                "address": row[3],
-                "district": row[4],
-                "street": row[5],
-                "area": row[6],
-                "price": row[7],
-                "usage": row[8],
-                "build_year": row[9],
-                "total_floor": row[10],
-                "current_floor": row[11],
-                "orientation": row[12],
-                "decoration": row[13],
-                "structure": row[14],
-                "case_data": row[15],
-                "create_time": row[16].isoformat() if row[16] else None,
-            }
+        Returns:
+            {case_id: 案例详情}
+        """
+        if not case_ids:
+            return {}
+
+        with pg_cursor(commit=False) as cursor:
+            cursor.execute(f"""
+                SELECT {', '.join(CASE_DETAIL_COLUMNS)}
+                FROM cases
+                WHERE case_id = ANY(%s)
+            """, (list(case_ids),))
+
+            cases = {}
+            for row in cursor.fetchall():
+                case = dict(zip(CASE_DETAIL_COLUMNS, row))
+                case['create_time'] = case['create_time'].isoformat() if case['create_time'] else None
+                cases[case['case_id']] = case
+            return cases
 
     def list_reports(self, report_type: str = None) -> List[Dict]:
         """列出报告"""
@@ -337,20 +557,149 @@ class KnowledgeBaseManager:
             columns = ['case_id', 'from_doc', 'report_type', 'address', 'area', 'price', 'district', 'usage']
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    def page_reports(self, report_type: str = None, keyword: str = None, limit: int = 20,
+                     cursor: str = None, offset: int = 0, total_mode: str = 'exact') -> Dict:
+        """
+        报告分页（按 create_time, id 倒序，筛选在 SQL 中完成）
+
+        Args:
+            report_type: 报告类型
+            keyword: 地址 / 文件名关键词
+            limit: 每页数量
+            cursor: 上一页的 next_cursor（传入时忽略 offset）
+            offset: 偏移量（未传游标时使用）
+            total_mode: exact / estimate / none
+
+        Returns:
+            {'items', 'next_cursor', 'total', 'total_estimated'}
+        """
+        conditions, params = [], []
+        if report_type:
+            conditions.append("report_type = %s")
+            params.append(report_type)
+        if keyword:
+            conditions.append("(address ILIKE %s OR filename ILIKE %s)")
+            params.extend([f"%{escape_like(keyword)}%"] * 2)
+
+        columns = ['doc_id', 'source_file', 'report_type', 'address', 'area', 'case_count', 'create_time']
+        select = "doc_id, filename, report_type, address, area, case_count, create_time"
+        return self._page('documents', select, columns, conditions, params, limit, cursor, offset, total_mode)
+
+    def page_cases(self, report_type: str = None, district: str = None, usage: str = None,
+                   keyword: str = None, min_area: float = None, max_area: float = None,
+                   min_price: float = None, max_price: float = None, limit: int = 20,
+                   cursor: str = None, offset: int = 0, total_mode: str = 'exact') -> Dict:
+        """
+        案例分页（按 create_time, id 倒序，筛选在 SQL 中完成）
+
+        面积 / 价格为空的案例按 0 处理，与原列表筛选一致
+
+        Returns:
+            {'items', 'next_cursor', 'total', 'total_estimated'}
+        """
+        conditions, params = [], []
+        for column, value in (('report_type', report_type), ('district', district), ('usage', usage)):
+            if value:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+        for column, min_value, max_value in (('area', min_area, max_area), ('price', min_price, max_price)):
+            if min_value:
+                conditions.append(f"{column} >= %s")
+                params.append(min_value)
+            if max_value:
+                conditions.append(f"({column} <= %s OR {column} IS NULL)")
+                params.append(max_value)
+        if keyword:
+            conditions.append("address ILIKE %s")
+            params.append(f"%{escape_like(keyword)}%")
+
+        columns = ['case_id', 'from_doc', 'report_type', 'address', 'area', 'price', 'district', 'usage', 'create_time']
+        select = "case_id, doc_id, report_type, address, area, price, district, usage, create_time"
+        return self._page('cases', select, columns, conditions, params, limit, cursor, offset, total_mode)
+
+    def _page(self, table: str, select: str, columns: List[str], conditions: List[str], params: List,
+              limit: int, cursor: str, offset: int, total_mode: str) -> Dict:
+        """keyset 分页查询（多取一条判断是否有下一页）"""
+        where = ' AND '.join(conditions) or 'TRUE'
+        page_conditions, page_params = list(conditions), list(params)
+        if cursor:
+            create_time, row_id = decode_cursor(cursor)
+            page_conditions.append("(create_time, id) < (%s::timestamp, %s)")
+            page_params.extend([create_time, row_id])
+            offset = 0
+
+        with pg_cursor(commit=False) as cur:
+            cur.execute(f"""
+                SELECT {select}, id FROM {table}
+                WHERE {' AND '.join(page_conditions) or 'TRUE'}
+                ORDER BY create_time DESC, id DESC
+                LIMIT %s OFFSET %s
+            """, page_params + [limit + 1, offset])
+            rows = cur.fetchall()
+
+            total, estimated = None, False
+            if total_mode == 'exact':
+                cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+                total = cur.fetchone()[0]
+            elif total_mode == 'estimate':
+                # 执行计划的行数估算，不扫描表
+                cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE {where}", params)
+                total, estimated = int(cur.fetchone()[0][0]['Plan']['Plan Rows']), True
+
+        result = page_result(rows, limit, lambda row: (row[-2], row[-1]), total, estimated)
+        result['items'] = [dict(zip(columns, row[:-1])) for row in result['items']]
+        return result
+
     def delete_report(self, doc_id: str) -> bool:
         """删除报告及其案例"""
+        sketch_columns = ['report_type', 'district', 'usage', *SKETCH_METRICS]
         with pg_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT case_id, {', '.join(sketch_columns)}, case_data->>'transaction_date'
+                FROM cases WHERE doc_id = %s
+            """, (doc_id,))
+            rows = cursor.fetchall()
+            case_ids = [row[0] for row in rows]
+
             # 级联删除会自动删除关联的案例
             cursor.execute("DELETE FROM documents WHERE doc_id = %s", (doc_id,))
 
-        # 标记向量索引需要重建
-        if self.enable_vector and self._vector_store is not None:
-            self._vector_store.mark_dirty()
+            # 从分布草图中减去
+            items = [{**dict(zip(sketch_columns, row[1:-1])), 'transaction_date': row[-1]} for row in rows]
+            apply_sketch_delta(cursor, build_sketches(items), sign=-1)
+            self.generation.notify(cursor)
+        self.generation.bump()
+
+        if self._case_matrix is not None:
+            self._case_matrix.remove(case_ids)
+
+        # 只删除该报告案例的向量
+        if self.enable_vector and case_ids:
+            self._update_vector_index(delete_ids=case_ids)
 
         return True
 
     def stats(self) -> Dict:
-        """统计信息"""
+        """统计信息（计数按版本号缓存，向量索引状态实时获取）"""
+        counts = self.stats_cache.get('kb_counts', self._count_stats)
+
+        # 向量索引状态
+        vector_stats = {}
+        if self.enable_vector:
+            try:
+                from .vector_store_milvus import MilvusVectorStore
+                if self._vector_store is None:
+                    self._vector_store = MilvusVectorStore()
+                vector_stats = self._vector_store.get_stats()
+            except Exception as e:
+                vector_stats = {'error': str(e)}
+
+        return {
+            **counts,
+            'vector_index': vector_stats,
+        }
+
+    def _count_stats(self) -> Dict:
         with pg_cursor(commit=False) as cursor:
             # 报告总数
             cursor.execute("SELECT COUNT(*) FROM documents")
@@ -367,22 +716,10 @@ class KnowledgeBaseManager:
             """)
             by_type = {row[0]: row[1] for row in cursor.fetchall()}
 
-        # 向量索引状态
-        vector_stats = {}
-        if self.enable_vector:
-            try:
-                from .vector_store_milvus import MilvusVectorStore
-                if self._vector_store is None:
-                    self._vector_store = MilvusVectorStore()
-                vector_stats = self._vector_store.get_stats()
-            except Exception as e:
-                vector_stats = {'error': str(e)}
-
         return {
             'total_reports': total_reports,
             'total_cases': total_cases,
             'by_type': by_type,
-            'vector_index': vector_stats,
         }
 
     def clear(self):
@@ -390,6 +727,10 @@ class KnowledgeBaseManager:
         with pg_cursor() as cursor:
             cursor.execute("DELETE FROM cases")
             cursor.execute("DELETE FROM documents")
+            cursor.execute("DELETE FROM case_sketches")
+            self.generation.notify(cursor)
+        self.generation.bump()
+        self._case_matrix = None
 
         # 清空向量索引
         if self.enable_vector and self._vector_store is not None:
@@ -16,10 +16,52 @@ from typing import List, Dict, Optional, Tuple
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import KB_CONFIG
+from knowledge_base.quantile_sketch import SKETCH_CONFIG, build_sketches, merge_sketches, select_sketches
 
 # 检测是否使用数据库模式
 USE_DATABASE = os.getenv('KB_USE_DATABASE', 'false').lower() == 'true'
 
+# 案例结构化字段（SQL 列 / 返回字典的键）
+CASE_SELECT_COLUMNS = [
+    'case_id', 'doc_id', 'report_type', 'address', 'district', 'street',
+    'area', 'price', 'usage', 'build_year', 'total_floor', 'current_floor',
+    'orientation', 'decoration', 'structure',
+]
+CASE_COLUMNS = ['from_doc' if c == 'doc_id' else c for c in CASE_SELECT_COLUMNS]
+
+# 修正系数统计: 返回键 -> 字段
+CORRECTION_KEYS = [
+    ('transaction', 'transaction_correction'),
+    ('market', 'market_correction'),
+    ('location', 'location_correction'),
+    ('physical', 'physical_correction'),
+    ('rights', 'rights_correction'),
+]
+
+# 统计返回的分位数
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def summarize(values: List) -> Dict:
+    """数值统计（忽略空值和0），分位数与 SQL percentile_cont 一致（线性插值）"""
+    values = sorted(v for v in values if isinstance(v, (int, float)) and v)
+    if not values:
+        return {'min': 0, 'max': 0, 'avg': 0, 'count': 0, **{f"p{p}": 0 for p in PERCENTILES}}
+
+    def percentile(p: float) -> float:
+        pos = (len(values) - 1) * p / 100
+        low = int(pos)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (pos - low)
+
+    return {
+        'min': values[0],
+        'max': values[-1],
+        'avg': sum(values) / len(values),
+        'count': len(values),
+        **{f"p{p}": percentile(p) for p in PERCENTILES},
+    }
+
 
 class KnowledgeBaseQuery:
     """知识库查询器"""
@@ -55,33 +97,33 @@ class KnowledgeBaseQuery:
     def _get_cases_from_db(self, report_type: str = None) -> List[Dict]:
         """从数据库获取案例"""
         try:
-            from knowledge_base.db_connection import pg_cursor
-
-            with pg_cursor(commit=False) as cursor:
-                if report_type:
-                    cursor.execute("""
-                        SELECT case_id, doc_id, report_type, address, district, street,
-                               area, price, usage, build_year, total_floor, current_floor,
-                               orientation, decoration, structure
-                        FROM cases 
-                        WHERE report_type = %s
-                    """, (report_type,))
-                else:
-                    cursor.execute("""
-                        SELECT case_id, doc_id, report_type, address, district, street,
-                               area, price, usage, build_year, total_floor, current_floor,
-                               orientation, decoration, structure
-                        FROM cases
-                    """)
-
-                columns = ['case_id', 'from_doc', 'report_type', 'address', 'district',
-                          'street', 'area', 'price', 'usage', 'build_year', 'total_floor',
-                          'current_floor', 'orientation', 'decoration', 'structure']
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if report_type:
+                return self._select_cases("report_type = %s", [report_type])
+            return self._select_cases()
         except Exception as e:
             print(f"⚠️ 从数据库获取案例失败: {e}")
             return []
 
+    def _select_cases(self, where: str = None, params: list = None,
+                      order_by: str = None, limit: int = None, order_params: list = None) -> List[Dict]:
+        """查询案例的结构化字段（不含 case_data）"""
+        from knowledge_base.db_connection import pg_cursor
+
+        sql = f"SELECT {', '.join(CASE_SELECT_COLUMNS)} FROM cases"
+        params = list(params or [])
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+            params.extend(order_params or [])
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+
+        with pg_cursor(commit=False) as cursor:
+            cursor.execute(sql, params)
+            return [dict(zip(CASE_COLUMNS, row)) for row in cursor.fetchall()]
+
     # ========================================================================
     # 基础检索
     # ========================================================================
@@ -368,6 +410,11 @@ class KnowledgeBaseQuery:
         """
         查找相似案例
 
+        默认用案例列存快照对全部案例向量化打分；关闭快照（KB_CASE_MATRIX=false）时分两阶段：
+        1. 召回：向量检索 + SQL 范围预过滤得到有限候选（文件模式直接用内存索引）
+        2. 精排：对候选计算相似度
+        最后取 top_k 一次批量加载完整数据
+
         Args:
             address: 地址
             area: 面积
@@ -382,24 +429,131 @@ class KnowledgeBaseQuery:
         Returns:
             [(案例, 相似度分数), ...]
         """
-        # 获取所有案例
-        all_cases = self._get_all_cases(report_type)
+        criteria = dict(address=address, area=area, price=price, district=district,
+                        usage=usage, floor=floor, build_year=build_year)
 
-        # 计算相似度
+        # 内存列存快照：对全部案例向量化打分
+        if self.config['case_matrix'] and hasattr(self.kb, 'case_matrix'):
+            ranked = self.kb.case_matrix.top_k(top_k, report_type=report_type, **criteria)
+            cases = self.kb.get_cases([case_id for case_id, _ in ranked])
+            return [(cases[case_id], score) for case_id, score in ranked if case_id in cases]
+
+        # 召回
+        if self._use_db:
+            candidates = self._similar_candidates_db(report_type=report_type, **criteria)
+        else:
+            candidates = self._get_cases_from_index(report_type)
+
+        # 精排
         scored = []
-        for item in all_cases:
-            score = self._calculate_similarity(
-                item, address, area, price, district, usage, floor, build_year
-            )
+        for item in candidates:
+            score = self._calculate_similarity(item, **criteria)
             if score > 0:
-                # 获取完整案例数据
-                case_data = self.kb.get_case(item['case_id'])
-                if case_data:
-                    scored.append((case_data, score))
-
-        # 排序返回
+                scored.append((item, score))
         scored.sort(key=lambda x: x[1], reverse=True)
-        return scored[:top_k]
+        scored = scored[:top_k]
+
+        # 批量加载完整案例数据
+        cases = self.kb.get_cases([item['case_id'] for item, _ in scored])
+        return [(cases[item['case_id']], score) for item, score in scored if item['case_id'] in cases]
+
+    def _similar_candidates_db(self, address: str = None, area: float = None, price: float = None,
+                               district: str = None, usage: str = None, floor: int = None,
+                               build_year: int = None, report_type: str = None,
+                               with_vector: bool = True) -> List[Dict]:
+        """数据库模式的相似案例召回：SQL 预过滤（按近似分数取前 N）并入向量检索结果"""
+        limit = self.config['similar_candidates']
+        candidates = {}
+
+        # SQL：只取能得分的案例（与 _calculate_similarity 的各项条件对应），按主要权重项的近似分数排序
+        where, params = [], []
+        score_sql, score_params = [], []
+        if district:
+            where.append("district LIKE %s")
+            params.append(f"%{district}%")
+            score_sql.append("CASE WHEN district LIKE %s THEN 0.25 ELSE 0 END")
+            score_params.append(f"%{district}%")
+        if usage:
+            where.append("usage = %s")
+            params.append(usage)
+            score_sql.append("CASE WHEN usage = %s THEN 0.15 ELSE 0 END")
+            score_params.append(usage)
+        if area and area > 0:
+            where.append("area BETWEEN %s AND %s")
+            params.extend([area * 0.5, area * 2])
+            score_sql.append("CASE WHEN area > 0 THEN LEAST(area, %s) / GREATEST(area, %s) * 0.20 ELSE 0 END")
+            score_params.extend([area, area])
+        if price and price > 0:
+            where.append("price BETWEEN %s AND %s")
+            params.extend([price * 0.5, price * 2])
+            score_sql.append("CASE WHEN price > 0 THEN LEAST(price, %s) / GREATEST(price, %s) * 0.15 ELSE 0 END")
+            score_params.extend([price, price])
+        if floor and floor > 0:
+            where.append("current_floor BETWEEN %s AND %s")
+            params.extend([floor - 3, floor + 3])
+        if build_year and build_year > 0:
+            where.append("build_year BETWEEN %s AND %s")
+            params.extend([build_year - 10, build_year + 10])
+
+        if where:
+            conditions = f"({' OR '.join(where)})"
+            if report_type:
+                conditions += " AND report_type = %s"
+                params.append(report_type)
+            order_by = f"{' + '.join(score_sql)} DESC" if score_sql else None
+            try:
+                rows = self._select_cases(conditions, params, order_by=order_by,
+                                          order_params=score_params, limit=limit)
+                candidates.update((row['case_id'], row) for row in rows)
+            except Exception as e:
+                print(f"⚠️ 相似案例SQL召回失败: {e}")
+
+        # 向量：按描述文本召回语义相近的案例（覆盖地址等无法用范围表达的相似性）
+        vector_ids = [case_id for case_id, _ in self._similar_vector_ids(
+            address=address, area=area, district=district, usage=usage,
+            floor=floor, build_year=build_year, report_type=report_type, limit=limit
+        ) if case_id not in candidates] if with_vector else []
+        if vector_ids:
+            try:
+                rows = self._select_cases("case_id = ANY(%s)", [vector_ids])
+                candidates.update((row['case_id'], row) for row in rows)
+            except Exception as e:
+                print(f"⚠️ 加载向量召回案例失败: {e}")
+
+        # 两路都没有候选（只有地址且向量不可用）：取同类型最新的案例
+        if not candidates:
+            try:
+                rows = self._select_cases("report_type = %s" if report_type else None,
+                                          [report_type] if report_type else None,
+                                          order_by="create_time DESC", limit=limit)
+                candidates.update((row['case_id'], row) for row in rows)
+            except Exception as e:
+                print(f"⚠️ 相似案例召回失败: {e}")
+
+        return list(candidates.values())
+
+    def _similar_vector_ids(self, address: str = None, area: float = None, district: str = None,
+                            usage: str = None, floor: int = None, build_year: int = None,
+                            report_type: str = None, limit: int = 100) -> List[Tuple[str, float]]:
+        """用估价对象信息构建描述文本做向量召回（向量库不可用时返回空）"""
+        if not getattr(self.kb, 'enable_vector', False) or self.kb.vector_store is None:
+            return []
+
+        vector_store = self.kb.vector_store
+        text = vector_store.build_case_text({
+            'address': address or '',
+            'district': district or '',
+            'usage': usage or '',
+            'building_area': area or 0,
+            'current_floor': floor or 0,
+            'build_year': build_year or 0,
+        })
+        try:
+            self.kb.ensure_vector_index()
+            return vector_store.search(text, limit, filters={'report_type': report_type})
+        except Exception as e:
+            print(f"⚠️ 相似案例向量召回失败: {e}")
+            return []
 
     def _calculate_similarity(self, item: Dict, address: str, area: float,
                               price: float, district: str, usage: str,
@@ -467,102 +621,166 @@ class KnowledgeBaseQuery:
     # ========================================================================
 
     def get_price_range(self, report_type: str = None) -> Dict:
-        """获取价格范围统计"""
-        cases = self._get_all_cases(report_type)
+        """获取价格范围统计（min/max/avg/count 及分位数 p5~p95，按知识库版本缓存）"""
+        return self.kb.stats_cache.get(('price_range', report_type), lambda: self._price_range(report_type))
 
-        prices = []
-        for item in cases:
-            price = item.get('price', 0)
-            if price > 0:
-                prices.append(price)
+    def get_area_range(self, report_type: str = None) -> Dict:
+        """获取面积范围统计（min/max/avg/count 及分位数 p5~p95，按知识库版本缓存）"""
+        return self.kb.stats_cache.get(('area_range', report_type), lambda: self._area_range(report_type))
 
-        if not prices:
-            return {'min': 0, 'max': 0, 'avg': 0, 'count': 0}
+    def get_correction_stats(self, report_type: str = None) -> Dict:
+        """获取修正系数统计（各系数的 min/max/avg/count 及分位数，按知识库版本缓存）"""
+        return self.kb.stats_cache.get(('correction_stats', report_type), lambda: self._correction_stats(report_type))
 
-        return {
-            'min': min(prices),
-            'max': max(prices),
-            'avg': sum(prices) / len(prices),
-            'count': len(prices),
-        }
+    def _price_range(self, report_type: str = None) -> Dict:
+        if self._use_db:
+            return self._aggregate_db(['price'], report_type)['price']
+        return summarize([item.get('price') for item in self._get_cases_from_index(report_type)])
 
-    def get_area_range(self, report_type: str = None) -> Dict:
-        """获取面积范围统计"""
-        cases = self._get_all_cases(report_type)
+    def _area_range(self, report_type: str = None) -> Dict:
+        if self._use_db:
+            return self._aggregate_db(['area'], report_type)['area']
+        return summarize([item.get('area') for item in self._get_cases_from_index(report_type)])
 
-        areas = []
-        for item in cases:
-            area = item.get('area', 0)
-            if area > 0:
-                areas.append(area)
+    def _correction_stats(self, report_type: str = None) -> Dict:
+        if self._use_db:
+            stats = self._aggregate_db([field for _, field in CORRECTION_KEYS], report_type)
+            return {key: stats[field] for key, field in CORRECTION_KEYS}
 
-        if not areas:
-            return {'min': 0, 'max': 0, 'avg': 0, 'count': 0}
+        # 文件模式：修正系数只在案例文件中，批量读取
+        case_ids = [item['case_id'] for item in self._get_cases_from_index(report_type)]
+        cases = list(self.kb.get_cases(case_ids).values())
 
-        return {
-            'min': min(areas),
-            'max': max(areas),
-            'avg': sum(areas) / len(areas),
-            'count': len(areas),
-        }
+        result = {}
+        for key, field in CORRECTION_KEYS:
+            values = []
+            for case_data in cases:
+                val = case_data.get(field)
+                if isinstance(val, dict):
+                    val = val.get('value')
+                values.append(val)
+            result[key] = summarize(values)
+        return result
 
-    def get_correction_stats(self, report_type: str = None) -> Dict:
-        """获取修正系数统计"""
-        cases = self._get_all_cases(report_type)
-
-        stats = {
-            'transaction': [],
-            'market': [],
-            'location': [],
-            'physical': [],
-            'rights': [],
-        }
-
-        for item in cases:
-            case_data = self.kb.get_case(item['case_id'])
-            if not case_data:
-                continue
+    def get_quantiles(self, metric: str, report_type: str, district: str = None,
+                      usage: str = None, since_month: str = None) -> Dict:
+        """
+        按分布草图查询分位数（按知识库版本缓存）
 
-            for key, field in [
-                ('transaction', 'transaction_correction'),
-                ('market', 'market_correction'),
-                ('location', 'location_correction'),
-                ('physical', 'physical_correction'),
-                ('rights', 'rights_correction'),
-            ]:
-                if field in case_data:
-                    val = case_data[field]
-                    if isinstance(val, dict):
-                        val = val.get('value')
-                    if val:
-                        stats[key].append(val)
-
-        # 计算统计值
-        result = {}
-        for key, values in stats.items():
-            if values:
-                result[key] = {
-                    'min': min(values),
-                    'max': max(values),
-                    'avg': sum(values) / len(values),
-                    'count': len(values),
-                }
-            else:
-                result[key] = {'min': 0, 'max': 0, 'avg': 0, 'count': 0}
+        样本不足 SKETCH_CONFIG['min_count'] 时逐级放宽：区域+用途 -> 区域 -> 报告类型
+
+        Args:
+            metric: price 或修正系数字段（如 location_correction）
+            report_type: 报告类型
+            district: 区域
+            usage: 用途
+            since_month: 只统计该月份（YYYY-MM）之后的交易
+
+        Returns:
+            {'count', 'p5', 'p50', 'p95', 'scope'}，scope 为实际使用的范围
+        """
+        key = ('quantiles', metric, report_type, district, usage, since_month)
+        return self.kb.stats_cache.get(key, lambda: self._quantiles(metric, report_type, district, usage, since_month))
+
+    def _quantiles(self, metric: str, report_type: str, district: str = None,
+                   usage: str = None, since_month: str = None) -> Dict:
+        sketches = self.kb.stats_cache.get(('sketches', report_type), lambda: self._load_sketches(report_type))
+
+        scopes = []
+        if district and usage:
+            scopes.append(('district_usage', district, usage))
+        if district:
+            scopes.append(('district', district, None))
+        scopes.append(('report_type', None, None))
+
+        for scope, scope_district, scope_usage in scopes:
+            merged = merge_sketches(select_sketches(sketches, metric, scope_district, scope_usage, since_month))
+            if merged.count >= SKETCH_CONFIG['min_count'] or scope == 'report_type':
+                return {**merged.quantiles((5, 50, 95)), 'scope': scope}
+
+    def _load_sketches(self, report_type: str) -> Dict:
+        """读取报告类型的分布草图（数据库模式读 case_sketches 表，文件模式由案例现算）"""
+        if self._use_db:
+            from knowledge_base.db_connection import pg_cursor
+            from knowledge_base.quantile_sketch import load_sketches
+
+            try:
+                with pg_cursor(commit=False) as cursor:
+                    return load_sketches(cursor, report_type)
+            except Exception as e:
+                print(f"⚠️ 分布草图读取失败: {e}")
+                return {}
+
+        # 文件模式：修正系数和交易日期在案例文件中，结构化字段在索引中
+        items = self._get_cases_from_index(report_type)
+        cases = self.kb.get_cases([item['case_id'] for item in items])
+        return build_sketches({**cases.get(item['case_id'], {}), **item} for item in items)
+
+    def _aggregate_db(self, columns: List[str], report_type: str = None, district: str = None) -> Dict[str, Dict]:
+        """
+        在数据库中聚合数值列（一次查询，忽略空值和0）
+
+        Returns:
+            {列名: {'min', 'max', 'avg', 'count', 'p5', 'p25', 'p50', 'p75', 'p95'}}
+        """
+        from knowledge_base.db_connection import pg_cursor
+
+        fractions = ', '.join(str(p / 100) for p in PERCENTILES)
+        selects = []
+        for column in columns:
+            valid = f"FILTER (WHERE {column} IS NOT NULL AND {column} <> 0)"
+            selects.append(
+                f"COUNT({column}) {valid}, MIN({column}) {valid}, MAX({column}) {valid}, AVG({column}) {valid}, "
+                f"percentile_cont(ARRAY[{fractions}]) WITHIN GROUP (ORDER BY {column}) {valid}"
+            )
+
+        conditions, params = [], []
+        if report_type:
+            conditions.append("report_type = %s")
+            params.append(report_type)
+        if district:
+            conditions.append("district = %s")
+            params.append(district)
+        sql = f"SELECT {', '.join(selects)} FROM cases"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
 
+        try:
+            with pg_cursor(commit=False) as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+        except Exception as e:
+            print(f"⚠️ 统计查询失败: {e}")
+            return {column: summarize([]) for column in columns}
+
+        result = {}
+        for i, column in enumerate(columns):
+            count, min_val, max_val, avg_val, quantiles = row[i * 5:(i + 1) * 5]
+            if not count:
+                result[column] = summarize([])
+                continue
+            result[column] = {
+                'min': min_val,
+                'max': max_val,
+                'avg': float(avg_val),
+                'count': count,
+                **{f"p{p}": q for p, q in zip(PERCENTILES, quantiles)},
+            }
         return result
 
     # ========================================================================
     # 向量检索（如果启用）
     # ========================================================================
 
-    def vector_search(self, query_text: str, top_k: int = 10) -> List[Tuple[Dict, float]]:
+    def vector_search(self, query_text: str, top_k: int = 10, filters: Dict = None) -> List[Tuple[Dict, float]]:
         """
         向量相似搜索
 
         Args:
             query_text: 查询文本
             top_k: 返回数量
+            filters: 标量过滤条件（在向量库内预过滤），如
+                     {'district': ..., 'usage': ..., 'report_type': ..., 'min_area': ..., 'max_price': ...}
 
         Returns:
             [(案例, 相似度), ...]
@@ -571,16 +789,12 @@ class KnowledgeBaseQuery:
             return []
 
         try:
-            results = self.kb.vector_store.search(query_text, top_k)
-
-            # 加载完整案例数据
-            enriched = []
-            for case_id, score in results:
-                case_data = self.kb.get_case(case_id)
-                if case_data:
-                    enriched.append((case_data, score))
+            self.kb.ensure_vector_index()
+            results = self.kb.vector_store.search(query_text, top_k, filters=filters)
 
-            return enriched
+            # 批量加载完整案例数据
+            cases = self.kb.get_cases([case_id for case_id, _ in results])
+            return [(cases[case_id], score) for case_id, score in results if case_id in cases]
         except Exception as e:
             print(f"⚠️ 向量检索失败: {e}")
             return []
@@ -604,18 +818,17 @@ class KnowledgeBaseQuery:
         Returns:
             案例列表
         """
-        # 先用向量检索
+        # 向量检索：过滤条件下推到向量库
         if query_text and hasattr(self.kb, 'vector_store') and self.kb.vector_store:
-            vector_results = self.vector_search(query_text, top_k * 2)
-            candidates = [case for case, _ in vector_results]
-        else:
-            # 没有向量检索，用普通搜索
-            candidates = self._get_all_cases(report_type)[:top_k * 2]
+            filters = {'district': district, 'usage': usage, 'report_type': report_type}
+            vector_results = self.vector_search(query_text, top_k, filters=filters)
+            return [case for case, _ in vector_results]
 
-        # 再用条件过滤
+        # 没有向量检索，用普通搜索再条件过滤
+        candidates = self._get_all_cases(report_type)
         filtered = []
         for case in candidates:
-            if district and district not in case.get('district', ''):
+            if district and district not in (case.get('district') or ''):
                 continue
             if usage and case.get('usage') != usage:
                 continue
@@ -623,4 +836,226 @@ class KnowledgeBaseQuery:
                 continue
             filtered.append(case)
 
-        return filtered[:top_k]
\ No newline at end of file
+        return filtered[:top_k]
+
+    # ========================================================================
+    # 检索接口（search / generate 路由与 main 使用，返回展开的案例数据）
+    # ========================================================================
+
+    def get_case_by_id(self, case_id: str) -> Optional[Dict]:
+        """获取案例（展开的完整数据）"""
+        return self._hydrate([case_id]).get(case_id)
+
+    def search_cases_by_fields(self, filters: Dict = None, page: int = 1,
+                               page_size: int = 20) -> Tuple[List[Dict], int]:
+        """
+        按字段条件分页搜索（筛选和分页在数据库中完成，当前页一次批量加载）
+
+        Args:
+            filters: report_type / district / usage / min_area / max_area /
+                     min_price / max_price / address_keyword
+            page: 页码（从1开始）
+            page_size: 每页数量
+
+        Returns:
+            (案例列表, 总数)
+        """
+        filters = filters or {}
+        result = self.kb.page_cases(
+            report_type=filters.get('report_type'),
+            district=filters.get('district'),
+            usage=filters.get('usage'),
+            keyword=filters.get('address_keyword'),
+            min_area=filters.get('min_area'),
+            max_area=filters.get('max_area'),
+            min_price=filters.get('min_price'),
+            max_price=filters.get('max_price'),
+            limit=page_size,
+            offset=(max(page, 1) - 1) * page_size,
+        )
+        case_ids = [item['case_id'] for item in result['items']]
+        cases = self._hydrate(case_ids)
+        return [cases[case_id] for case_id in case_ids if case_id in cases], result['total']
+
+    def search_cases_by_vector(self, query: str, report_type: str = None,
+                               top_k: int = 10, filters: Dict = None) -> List[Tuple[Dict, float]]:
+        """
+        向量搜索（过滤条件在向量库内预过滤）
+
+        Returns:
+            [(案例, 相似度), ...]
+        """
+        hits = self._vector_hits(query, top_k, {**(filters or {}), 'report_type': report_type or None})
+        cases = self._hydrate([case_id for case_id, _ in hits])
+        return [(cases[case_id], score) for case_id, score in hits if case_id in cases]
+
+    def find_similar_cases_by_vector(self, query: str, report_type: str = None,
+                                     top_k: int = 10) -> List[Tuple[Dict, float]]:
+        """语义相似案例（向量检索）"""
+        return self.search_cases_by_vector(query, report_type=report_type, top_k=top_k)
+
+    def find_similar_cases_hybrid(self,
+                                  query: str = None,
+                                  area: float = None,
+                                  district: str = None,
+                                  usage: str = None,
+                                  report_type: str = None,
+                                  top_k: int = 10,
+                                  vector_weight: float = 0.6,
+                                  min_area: float = None,
+                                  max_area: float = None) -> List[Tuple[Dict, float]]:
+        """
+        混合检索（向量 + 规则）
+
+        1. 召回：向量检索（报告类型、面积范围在向量库内预过滤）+ 规则召回（SQL 预过滤 / 内存索引）
+        2. 精排：综合分 = vector_weight * 向量分 + (1 - vector_weight) * 规则分（按给出条件的满分归一化）
+        3. top_k 一次批量加载完整数据
+
+        Args:
+            query: 查询文本（为空时只按规则打分）
+            area: 面积（面积相似度）
+            district: 区域
+            usage: 用途
+            report_type: 报告类型（硬过滤）
+            top_k: 返回数量
+            vector_weight: 向量分权重（0~1）
+            min_area/max_area: 面积范围（硬过滤）
+
+        Returns:
+            [(案例, 综合分), ...]
+        """
+        limit = self.config['similar_candidates']
+        report_type = report_type or None
+        criteria = dict(address=None, area=area, price=None, district=district or None,
+                        usage=usage or None, floor=None, build_year=None)
+        rule_max = (0.25 if district else 0) + (0.15 if usage else 0) + (0.20 if area and area > 0 else 0)
+        vector_weight = min(max(vector_weight, 0.0), 1.0) if query else 0.0
+        if not rule_max:
+            vector_weight = 1.0 if query else 0.0
+
+        # 召回
+        filters = {'report_type': report_type, 'min_area': min_area, 'max_area': max_area}
+        vector_scores = dict(self._vector_hits(query, limit, filters)) if query else {}
+
+        candidates: Dict[str, Dict] = {}
+        if rule_max:
+            if self._use_db:
+                rows = self._similar_candidates_db(area=area, district=district, usage=usage,
+                                                   report_type=report_type, with_vector=False)
+            else:
+                rows = self._get_cases_from_index(report_type)
+            candidates.update((row['case_id'], row) for row in rows)
+
+        missing = [case_id for case_id in vector_scores if case_id not in candidates]
+        if missing:
+            candidates.update((row['case_id'], row) for row in self._structured_rows(missing))
+
+        # 精排
+        scored = []
+        for case_id, item in candidates.items():
+            if report_type and item.get('report_type') != report_type:
+                continue
+            item_area = item.get('area') or 0
+            if (min_area and item_area < min_area) or (max_area and item_area > max_area):
+                continue
+            rule_score = self._calculate_similarity(item, **criteria) / rule_max if rule_max else 0.0
+            score = vector_weight * vector_scores.get(case_id, 0.0) + (1 - vector_weight) * rule_score
+            if score > 0:
+                scored.append((case_id, score))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        scored = scored[:top_k]
+
+        cases = self._hydrate([case_id for case_id, _ in scored])
+        return [(cases[case_id], score) for case_id, score in scored if case_id in cases]
+
+    def get_price_stats(self, report_type: str = None, district: str = None) -> Dict:
+        """价格统计（SQL 聚合，按知识库版本缓存）"""
+        report_type, district = report_type or None, district or None
+        if not district:
+            return self.get_price_range(report_type)
+        return self.kb.stats_cache.get(('price_stats', report_type, district),
+                                       lambda: self._price_stats(report_type, district))
+
+    def _price_stats(self, report_type: str, district: str) -> Dict:
+        if self._use_db:
+            return self._aggregate_db(['price'], report_type, district)['price']
+        return summarize([item.get('price') for item in self._get_cases_from_index(report_type)
+                          if item.get('district') == district])
+
+    def get_area_stats(self, report_type: str = None) -> Dict:
+        """面积统计（SQL 聚合，按知识库版本缓存）"""
+        return self.get_area_range(report_type or None)
+
+    def get_filter_options(self) -> Dict[str, List[str]]:
+        """筛选选项（报告类型 / 区域 / 用途的去重值，按知识库版本缓存）"""
+        return self.kb.stats_cache.get('filter_options', self._filter_options)
+
+    def _filter_options(self) -> Dict[str, List[str]]:
+        fields = ['report_types', 'districts', 'usages']
+        columns = ['report_type', 'district', 'usage']
+
+        if self._use_db:
+            from knowledge_base.db_connection import pg_cursor
+
+            selects = ', '.join(
+                f"ARRAY(SELECT DISTINCT {column} FROM cases WHERE {column} <> '' ORDER BY 1)"
+                for column in columns
+            )
+            with pg_cursor(commit=False) as cursor:
+                cursor.execute(f"SELECT {selects}")
+                return dict(zip(fields, (list(values or []) for values in cursor.fetchone())))
+
+        cases = self._get_cases_from_index()
+        return {field: sorted({c.get(column) for c in cases if c.get(column)})
+                for field, column in zip(fields, columns)}
+
+    def _vector_hits(self, query: str, top_k: int, filters: Dict = None) -> List[Tuple[str, float]]:
+        """向量检索 case_id（向量库不可用时返回空）"""
+        if not query or not getattr(self.kb, 'enable_vector', False) or self.kb.vector_store is None:
+            return []
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        try:
+            self.kb.ensure_vector_index()
+            return self.kb.vector_store.search(query, top_k, filters=filters)
+        except Exception as e:
+            print(f"⚠️ 向量检索失败: {e}")
+            return []
+
+    def _structured_rows(self, case_ids: List[str]) -> List[Dict]:
+        """案例结构化字段（一次查询 / 内存索引）"""
+        if self._use_db:
+            try:
+                return self._select_cases("case_id = ANY(%s)", [list(case_ids)])
+            except Exception as e:
+                print(f"⚠️ 加载案例失败: {e}")
+                return []
+        wanted = set(case_ids)
+        return [item for item in self._get_cases_from_index() if item['case_id'] in wanted]
+
+    def _hydrate(self, case_ids: List[str]) -> Dict[str, Dict]:
+        """
+        批量加载案例并展开为完整案例数据（case_data 字段 + 表中的结构化字段）
+
+        Returns:
+            {case_id: 案例}
+        """
+        if not case_ids:
+            return {}
+
+        cases = {}
+        for case_id, case in self.kb.get_cases(list(case_ids)).items():
+            case_data = case.get('case_data', case)
+            if isinstance(case_data, str):
+                case_data = json.loads(case_data)
+            data = {k: v for k, v in (case_data or {}).items() if k != 'case_data'}
+
+            # case_data 中的 address / building_area 等为定位值字典，只补充字符串和数值字段
+            for key in ('report_type', 'district', 'street', 'usage', 'area', 'price',
+                        'build_year', 'total_floor', 'current_floor', 'create_time'):
+                if case.get(key) not in (None, '') and not isinstance(data.get(key), dict):
+                    data[key] = case[key]
+            data['case_id'] = case_id
+            data.setdefault('case_id_full', case_id)
+            data['from_doc'] = case.get('doc_id') or data.get('from_doc')
+            cases[case_id] = data
+        return cases
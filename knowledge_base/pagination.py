@@ -0,0 +1,95 @@
+"""
+列表分页
+========
+按 (create_time, id) 倒序的游标分页（keyset）：翻页只按索引定位到游标之后，代价与页码无关
+
+游标为 base64 编码的 [create_time, id]，由上一页结果的 next_cursor 给出
+"""
+
+import json
+import base64
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# 总数统计方式：精确 COUNT / 执行计划估算 / 不统计
+TOTAL_MODES = ('exact', 'estimate', 'none')
+
+
+def encode_cursor(create_time, row_id) -> str:
+    if hasattr(create_time, 'isoformat'):
+        create_time = create_time.isoformat()
+    raw = json.dumps([create_time, row_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, id_type: type = int) -> Tuple[str, Any]:
+    """
+    解析游标（格式或取值不合法时抛出 ValueError）
+
+    Args:
+        id_type: id 类型，数据库模式为 int（自增主键），文件模式为 str（doc_id / case_id）
+
+    Returns:
+        (create_time ISO 字符串, id)；文件模式下缺少创建时间的记录 create_time 为空字符串
+    """
+    try:
+        create_time, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        if not isinstance(create_time, str) or isinstance(row_id, (bool, float, list, dict)) or row_id is None:
+            raise ValueError
+        if create_time or id_type is int:
+            datetime.fromisoformat(create_time)
+        row_id = id_type(row_id)
+        if id_type is int and not 0 <= row_id < 2 ** 63:
+            raise ValueError
+    except Exception:
+        raise ValueError("无效的分页游标")
+    return create_time, row_id
+
+
+def escape_like(keyword: str) -> str:
+    """LIKE 模式转义（关键词中的 % _ \\ 按字面匹配）"""
+    return keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def page_result(rows: List, limit: int, cursor_key: Callable[[Any], Tuple],
+                total: Optional[int] = None, estimated: bool = False) -> Dict:
+    """
+    组装分页结果
+
+    Args:
+        rows: 多取一条的查询结果（用于判断是否还有下一页）
+        limit: 每页数量
+        cursor_key: 行 -> (create_time, id)
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'items': rows,
+        'next_cursor': encode_cursor(*cursor_key(rows[-1])) if has_more and rows else None,
+        'total': total,
+        'total_estimated': estimated,
+    }
+
+
+def page_items(items: List[Dict], limit: int, cursor_key: Callable[[Dict], Tuple],
+               cursor: str = None, offset: int = 0, total_mode: str = 'exact') -> Dict:
+    """
+    内存列表分页（文件模式，与数据库模式的排序和游标一致）
+
+    cursor_key 返回 (create_time, id)，统一按字符串比较
+    """
+    def str_key(item: Dict) -> Tuple[str, str]:
+        create_time, row_id = cursor_key(item)
+        return str(create_time or ''), str(row_id)
+
+    keyed = sorted(((str_key(item), item) for item in items), key=lambda x: x[0], reverse=True)
+    total = len(keyed) if total_mode != 'none' else None
+
+    if cursor:
+        after = decode_cursor(cursor, id_type=str)
+        keyed = [(key, item) for key, item in keyed if key < after]
+        offset = 0
+
+    rows = [item for _, item in keyed[offset:offset + limit + 1]]
+    return page_result(rows, limit, str_key, total)
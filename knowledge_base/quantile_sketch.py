@@ -0,0 +1,249 @@
+"""
+分位数草图
+==========
+按 (报告类型, 区域, 用途, 交易月份, 指标) 维护单价和修正系数的分布草图，审查时直接查询 p5/p50/p95
+
+草图采用对数分桶（DDSketch）：
+- 分位数的相对误差不超过 SKETCH_CONFIG['relative_accuracy']
+- 合并即桶计数相加，删除即桶计数相减（t-digest / KLL 不支持删除）
+- 序列化为 {"a": 精度, "p": {桶: 计数}, "n": {桶: 计数}}，存入 case_sketches 表
+"""
+
+import os
+import re
+import math
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+SKETCH_CONFIG = {
+    'relative_accuracy': float(os.getenv('KB_SKETCH_ACCURACY', '0.01')),   # 分位数相对误差
+    'min_count': int(os.getenv('KB_SKETCH_MIN_COUNT', '20')),             # 样本数不足时逐级放宽到更大范围
+    'outlier_margin': float(os.getenv('KB_OUTLIER_MARGIN', '0.2')),       # 低于 p5*(1-margin) 或高于 p95*(1+margin) 视为异常
+}
+
+# 维护草图的指标（cases 表列）
+SKETCH_METRICS = [
+    'price', 'transaction_correction', 'market_correction', 'location_correction',
+    'physical_correction', 'rights_correction',
+]
+
+# 草图键: (report_type, district, usage, month, metric)
+SketchKey = Tuple[str, str, str, str, str]
+
+
+class QuantileSketch:
+    """对数分桶分位数草图（可合并、可删除）"""
+
+    def __init__(self, relative_accuracy: float = None):
+        self.relative_accuracy = relative_accuracy or SKETCH_CONFIG['relative_accuracy']
+        self._gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self.count = 0
+
+    def _bucket(self, value: float) -> int:
+        return math.ceil(math.log(abs(value)) / self._log_gamma)
+
+    def _bucket_value(self, bucket: int) -> float:
+        return 2 * self._gamma ** bucket / (self._gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        """添加数值（count 为负数即删除；0 和非数值忽略）"""
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not value or math.isnan(value):
+            return
+        store = self._positive if value > 0 else self._negative
+        bucket = self._bucket(value)
+        remaining = store.get(bucket, 0) + count
+        if remaining > 0:
+            store[bucket] = remaining
+        else:
+            store.pop(bucket, None)
+        self.count = sum(self._positive.values()) + sum(self._negative.values())
+
+    def remove(self, value: float):
+        self.add(value, -1)
+
+    def merge(self, other: 'QuantileSketch', sign: int = 1):
+        """合并另一个草图（sign=-1 时减去）"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("草图精度不一致，无法合并")
+        for store, other_store in ((self._positive, other._positive), (self._negative, other._negative)):
+            for bucket, count in other_store.items():
+                remaining = store.get(bucket, 0) + sign * count
+                if remaining > 0:
+                    store[bucket] = remaining
+                else:
+                    store.pop(bucket, None)
+        self.count = sum(self._positive.values()) + sum(self._negative.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """分位数（q 取 0~1），空草图返回 None"""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self._negative, reverse=True):
+            seen += self._negative[bucket]
+            if seen > rank:
+                return -self._bucket_value(bucket)
+        for bucket in sorted(self._positive):
+            seen += self._positive[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(self._positive)) if self._positive else -self._bucket_value(min(self._negative))
+
+    def quantiles(self, percentiles: Iterable[int] = (5, 50, 95)) -> Dict:
+        """{'count': n, 'p5': ..., 'p50': ..., 'p95': ...}"""
+        return {'count': self.count, **{f"p{p}": self.quantile(p / 100) for p in percentiles}}
+
+    def to_dict(self) -> Dict:
+        return {
+            'a': self.relative_accuracy,
+            'p': {str(k): v for k, v in self._positive.items()},
+            'n': {str(k): v for k, v in self._negative.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> 'QuantileSketch':
+        if isinstance(data, str):
+            data = json.loads(data)
+        sketch = cls(data.get('a'))
+        sketch._positive = {int(k): v for k, v in data.get('p', {}).items()}
+        sketch._negative = {int(k): v for k, v in data.get('n', {}).items()}
+        sketch.count = sum(sketch._positive.values()) + sum(sketch._negative.values())
+        return sketch
+
+
+# ============================================================================
+# 案例 -> 草图
+# ============================================================================
+
+_MONTH_PATTERN = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})')
+
+
+def sketch_month(date_text) -> str:
+    """交易日期 -> YYYY-MM（无法识别时为空）"""
+    match = _MONTH_PATTERN.search(str(date_text or ''))
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return ''
+    return f"{match.group(1)}-{int(match.group(2)):02d}"
+
+
+def build_sketches(items: Iterable[Dict]) -> Dict[SketchKey, QuantileSketch]:
+    """
+    按草图键汇总案例
+
+    Args:
+        items: 案例字典（report_type / district / usage / transaction_date 及 SKETCH_METRICS 数值）
+    """
+    sketches: Dict[SketchKey, QuantileSketch] = {}
+    for item in items:
+        prefix = (item.get('report_type') or '', item.get('district') or '',
+                  item.get('usage') or '', sketch_month(item.get('transaction_date')))
+        for metric in SKETCH_METRICS:
+            value = item.get(metric)
+            if isinstance(value, dict):
+                value = value.get('value')
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not value:
+                continue
+            key = prefix + (metric,)
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = QuantileSketch()
+            sketch.add(value)
+    return sketches
+
+
+def merge_sketches(sketches: Iterable[QuantileSketch]) -> QuantileSketch:
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+# ============================================================================
+# PostgreSQL 持久化（case_sketches 表）
+# ============================================================================
+
+CASE_SKETCHES_DDL = """
+    CREATE TABLE IF NOT EXISTS case_sketches (
+        report_type VARCHAR(50) NOT NULL,
+        district VARCHAR(100) NOT NULL DEFAULT '',
+        usage VARCHAR(50) NOT NULL DEFAULT '',
+        month VARCHAR(7) NOT NULL DEFAULT '',
+        metric VARCHAR(32) NOT NULL,
+        count INT NOT NULL DEFAULT 0,
+        sketch JSONB NOT NULL,
+        update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (report_type, district, usage, month, metric)
+    )
+"""
+
+
+def apply_sketch_delta(cursor, delta: Dict[SketchKey, QuantileSketch], sign: int = 1):
+    """
+    在写入事务内更新草图（入库 sign=1，删除 sign=-1）
+
+    先插入占位行再 SELECT ... FOR UPDATE，保证并发写入同一个键时依次合并
+    """
+    if not delta:
+        return
+    from psycopg2.extras import execute_values
+
+    keys = sorted(delta)
+    execute_values(cursor, """
+        INSERT INTO case_sketches (report_type, district, usage, month, metric, count, sketch)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, [key + (0, json.dumps(QuantileSketch().to_dict())) for key in keys])
+
+    cursor.execute("""
+        SELECT report_type, district, usage, month, metric, sketch
+        FROM case_sketches
+        WHERE (report_type, district, usage, month, metric) IN %s
+        ORDER BY report_type, district, usage, month, metric
+        FOR UPDATE
+    """, (tuple(keys),))
+
+    updates = []
+    for row in cursor.fetchall():
+        key, sketch = tuple(row[:5]), QuantileSketch.from_dict(row[5])
+        sketch.merge(delta[key], sign)
+        updates.append(key + (sketch.count, json.dumps(sketch.to_dict())))
+
+    execute_values(cursor, """
+        UPDATE case_sketches AS s
+        SET count = v.count, sketch = v.sketch::jsonb, update_time = CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS v (report_type, district, usage, month, metric, count, sketch)
+        WHERE s.report_type = v.report_type AND s.district = v.district AND s.usage = v.usage
+          AND s.month = v.month AND s.metric = v.metric
+    """, updates)
+    cursor.execute("""
+        DELETE FROM case_sketches
+        WHERE count <= 0 AND (report_type, district, usage, month, metric) IN %s
+    """, (tuple(keys),))
+
+
+def load_sketches(cursor, report_type: str) -> Dict[SketchKey, QuantileSketch]:
+    """读取一个报告类型的全部草图"""
+    cursor.execute("""
+        SELECT report_type, district, usage, month, metric, sketch
+        FROM case_sketches
+        WHERE report_type = %s AND count > 0
+    """, (report_type or '',))
+    return {tuple(row[:5]): QuantileSketch.from_dict(row[5]) for row in cursor.fetchall()}
+
+
+def select_sketches(sketches: Dict[SketchKey, QuantileSketch], metric: str,
+                    district: str = None, usage: str = None,
+                    since_month: str = None) -> List[QuantileSketch]:
+    """按条件筛选草图（空条件不过滤）"""
+    return [
+        sketch for (_, d, u, month, m), sketch in sketches.items()
+        if m == metric
+        and (not district or d == district)
+        and (not usage or u == usage)
+        and (not since_month or month >= since_month)
+    ]
@@ -6,18 +6,118 @@ FAISS向量存储
 
 import os
 import json
+import fcntl
 import numpy as np
+from contextlib import contextmanager
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 
+from .embedding import get_embedding_model, get_encoder
+from .embedding_cache import cached_encode
+
+
+# 支持的索引类型（均为内积，配合归一化等价于余弦相似度）
+#   FlatIP   精确检索，适合十万级以内
+#   IVFFlat  倒排 + 原始向量，需训练
+#   IVFSQ8   倒排 + 8bit 标量量化，内存约为原始向量的 1/4
+#   IVFPQ    倒排 + 乘积量化，内存最小，适合百万级以上
+#   HNSW     图索引，查询快、内存大，不支持物理删除（删除记为墓碑，过多时重建）
+INDEX_TYPES = ('FlatIP', 'IVFFlat', 'IVFSQ8', 'IVFPQ', 'HNSW')
+
+# PQ 每个子空间训练 256 个中心，向量数不足时暂用 FlatIP
+PQ_MIN_TRAIN = 256
+
 
 @dataclass
 class VectorStoreConfig:
     """向量存储配置"""
     model_path: str = "/data/models/bge-large-zh-v1.5"
-    index_type: str = "FlatIP"  # 内积，配合归一化等价于余弦相似度
+    index_type: str = os.getenv("KB_FAISS_INDEX_TYPE", "FlatIP")        # 见 INDEX_TYPES
     dimension: int = 1024       # BGE-large维度
     batch_size: int = 32        # 编码批次大小
+    nlist: int = int(os.getenv("KB_FAISS_NLIST", "1024"))               # IVF 聚类数（按数据量自动缩小）
+    nprobe: int = int(os.getenv("KB_FAISS_NPROBE", "16"))               # IVF 检索的聚类数
+    pq_m: int = int(os.getenv("KB_FAISS_PQ_M", "64"))                   # PQ 子空间数（需整除维度）
+    hnsw_m: int = int(os.getenv("KB_FAISS_HNSW_M", "32"))               # HNSW 每个节点的邻居数
+    ef_search: int = int(os.getenv("KB_FAISS_EF_SEARCH", "64"))         # HNSW 检索的候选数
+    train_size: int = int(os.getenv("KB_FAISS_TRAIN_SIZE", "100000"))   # 训练采样的向量数
+    mmap: bool = os.getenv("KB_FAISS_MMAP", "false").lower() == "true"  # 只读内存映射加载（首次写入时载入内存）
+    max_tombstone_ratio: float = 0.2   # 已删除向量占比超过该值时标记重建
+
+
+# ============================================================================
+# 标量过滤（FAISS 用 IDSelector 预过滤，Milvus 下推为 expr）
+# ============================================================================
+
+# 向量库中随向量保存的标量字段
+SCALAR_FIELDS = ['report_type', 'district', 'usage', 'area', 'price', 'build_year']
+
+# 范围过滤: 字段 -> (下限参数, 上限参数)
+RANGE_FILTERS = {
+    'area': ('min_area', 'max_area'),
+    'price': ('min_price', 'max_price'),
+    'build_year': ('min_build_year', 'max_build_year'),
+}
+
+
+def _number(value) -> float:
+    if isinstance(value, dict):
+        value = value.get('value')
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def case_scalars(case: Dict) -> Dict:
+    """提取案例的标量字段"""
+    price = case.get('price') or case.get('transaction_price') \
+        or case.get('rental_price') or case.get('final_price')
+    return {
+        'report_type': case.get('report_type') or '',
+        'district': case.get('district') or '',
+        'usage': case.get('usage') or '',
+        'area': _number(case.get('area') or case.get('building_area')),
+        'price': _number(price),
+        'build_year': int(_number(case.get('build_year'))),
+    }
+
+
+def filter_mask(columns: Dict[str, np.ndarray], filters: Dict) -> np.ndarray:
+    """
+    标量列 -> 满足过滤条件的布尔掩码
+
+    filters 支持: report_type, usage（精确匹配）, district（包含匹配）,
+    min_/max_area, min_/max_price, min_/max_build_year（闭区间）
+    """
+    size = len(columns['area'])
+    mask = np.ones(size, dtype=bool)
+    if not filters:
+        return mask
+    if filters.get('report_type'):
+        mask &= columns['report_type'] == filters['report_type']
+    if filters.get('district'):
+        mask &= np.char.find(columns['district'], filters['district']) >= 0
+    if filters.get('usage'):
+        mask &= columns['usage'] == filters['usage']
+    for field, (low_key, high_key) in RANGE_FILTERS.items():
+        if filters.get(low_key) is not None:
+            mask &= columns[field] >= filters[low_key]
+        if filters.get(high_key) is not None:
+            mask &= columns[field] <= filters[high_key]
+    return mask
+
+
+def _scalar_columns(metas: List[Dict]) -> Dict[str, np.ndarray]:
+    """标量字段列表 -> 列存储"""
+    return {
+        'report_type': np.array([m['report_type'] for m in metas], dtype=str),
+        'district': np.array([m['district'] for m in metas], dtype=str),
+        'usage': np.array([m['usage'] for m in metas], dtype=str),
+        'area': np.array([m['area'] for m in metas], dtype=np.float32),
+        'price': np.array([m['price'] for m in metas], dtype=np.float32),
+        'build_year': np.array([m['build_year'] for m in metas], dtype=np.int32),
+    }
 
 
 class VectorStore:
@@ -44,7 +144,10 @@ class VectorStore:
         # 路径
         self.vectors_path = os.path.join(storage_path, "vectors")
         self.index_file = os.path.join(self.vectors_path, "cases.index")
-        self.ids_file = os.path.join(self.vectors_path, "cases_ids.json")
+        self.ids_file = os.path.join(self.vectors_path, "cases_ids.npy")
+        self.meta_file = os.path.join(self.vectors_path, "cases_meta.npz")
+        self.info_file = os.path.join(self.vectors_path, "cases_index.json")
+        self.lock_file = os.path.join(self.vectors_path, "cases_index.lock")
         
         # 确保目录存在
         os.makedirs(self.vectors_path, exist_ok=True)
@@ -52,7 +155,13 @@ class VectorStore:
         # 延迟加载
         self._model = None
         self._index = None
-        self._case_ids = []  # FAISS索引位置 -> case_id映射
+        self._mmapped = False   # 索引是否为只读内存映射
+        self._case_ids = np.array([], dtype=str)    # FAISS id -> case_id（''为已删除）
+        self._id_of: Dict[str, int] = {}            # case_id -> FAISS id
+        self._columns = _scalar_columns([])         # FAISS id -> 标量字段（用于过滤）
+        self._tombstones = 0    # 已删除但仍占位的 id 数
+        self._version = 0       # 已加载的索引文件版本（每次保存加一）
+        self._built_type = None # 实际构建的索引类型（数据不足时可能与配置不同）
         self._dirty = True   # 是否需要重建
         
         # 尝试加载已有索引
@@ -60,21 +169,16 @@ class VectorStore:
     
     @property
     def model(self):
-        """延迟加载embedding模型"""
+        """embedding模型（进程内共享，首次使用时加载）"""
         if self._model is None:
-            print(f"📦 加载Embedding模型: {self.config.model_path}")
-            try:
-                from sentence_transformers import SentenceTransformer
-                self._model = SentenceTransformer(
-                    self.config.model_path,
-                    device="cpu"
-                )
-                print(f"   ✓ 模型加载完成")
-            except Exception as e:
-                print(f"   ✗ 模型加载失败: {e}")
-                raise
+            self._model = get_embedding_model(self.config.model_path)
         return self._model
     
+    @property
+    def encoder(self):
+        """编码器（本进程模型，或配置了 KB_EMBEDDING_SOCKET 时的 embedding 服务）"""
+        return get_encoder(self.config.model_path, self.config.batch_size)
+    
     @property
     def index(self):
         """获取FAISS索引"""
@@ -89,29 +193,113 @@ class VectorStore:
         """标记索引需要重建"""
         self._dirty = True
     
+    def _has_files(self) -> bool:
+        return all(os.path.exists(f) for f in (self.index_file, self.ids_file, self.meta_file, self.info_file))
+    
+    def _read_info(self) -> Dict:
+        with open(self.info_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
     def _load_index(self):
-        """加载已有索引"""
-        if os.path.exists(self.index_file) and os.path.exists(self.ids_file):
+        """加载已有索引（索引类型与配置不一致或旧格式时标记重建）"""
+        if not self._has_files():
+            return
+        try:
+            with self._file_lock():
+                info = self._read_files(self.config.mmap)
+            print(f"📂 加载向量索引: {len(self._id_of)}条 ({info.get('index_type')}{'，mmap' if self._mmapped else ''})")
+        except Exception as e:
+            print(f"⚠️ 加载向量索引失败: {e}")
+            self._reset()
+            self._dirty = True
+    
+    def _read_files(self, mmap: bool) -> Dict:
+        """读取索引、id、标量字段和信息文件（调用方持有文件锁，四个文件保持一致）"""
+        import faiss
+        
+        info = self._read_info()
+        index = None
+        mmapped = False
+        if mmap:
             try:
-                import faiss
-                self._index = faiss.read_index(self.index_file)
-                with open(self.ids_file, 'r', encoding='utf-8') as f:
-                    self._case_ids = json.load(f)
-                self._dirty = False
-                print(f"📂 加载向量索引: {len(self._case_ids)}条")
-            except Exception as e:
-                print(f"⚠️ 加载向量索引失败: {e}")
-                self._index = None
-                self._case_ids = []
-                self._dirty = True
+                index = faiss.read_index(self.index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                mmapped = True
+            except RuntimeError as e:
+                print(f"⚠️ 该索引类型不支持内存映射，完整加载: {e}")
+        if index is None:
+            index = faiss.read_index(self.index_file)
+        case_ids = np.load(self.ids_file)
+        with np.load(self.meta_file) as meta:
+            columns = {name: meta[name] for name in meta.files}
+        
+        self._index = index
+        self._mmapped = mmapped
+        self._case_ids = case_ids
+        self._columns = columns
+        self._id_of = {case_id: i for i, case_id in enumerate(case_ids.tolist()) if case_id}
+        self._tombstones = len(case_ids) - len(self._id_of)
+        self._version = info.get('version', 0)
+        self._built_type = info.get('index_type')
+        # 配置改变，或之前因数据不足退化而现在已可训练时重建
+        configured = info.get('config_index_type', self._built_type)
+        self._dirty = configured != self.config.index_type or self._needs_trained_build()
+        return info
+    
+    def _needs_trained_build(self) -> bool:
+        """退化构建的索引在向量数足够后需要按配置类型全量重建"""
+        return self._built_type != self.config.index_type and len(self._id_of) >= PQ_MIN_TRAIN
+    
+    @contextmanager
+    def _file_lock(self):
+        """索引文件锁（多进程读写四个文件时互斥）"""
+        with open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _reset(self):
+        self._index = None
+        self._mmapped = False
+        self._case_ids = np.array([], dtype=str)
+        self._id_of = {}
+        self._columns = _scalar_columns([])
+        self._tombstones = 0
+        self._built_type = None
     
     def _save_index(self):
-        """保存索引"""
-        if self._index is not None:
-            import faiss
-            faiss.write_index(self._index, self.index_file)
-            with open(self.ids_file, 'w', encoding='utf-8') as f:
-                json.dump(self._case_ids, f, ensure_ascii=False)
+        """
+        保存索引（先写临时文件再替换，不影响其他进程已映射的旧文件）
+        
+        调用方持有文件锁；版本号加一，其他进程写入前据此重新加载
+        """
+        if self._index is None:
+            return
+        import faiss
+        
+        try:
+            disk_version = self._read_info().get('version', 0) if os.path.exists(self.info_file) else 0
+        except (OSError, ValueError):
+            disk_version = 0
+        self._version = max(self._version, disk_version) + 1
+        
+        faiss.write_index(self._index, f"{self.index_file}.tmp")
+        with open(f"{self.ids_file}.tmp", 'wb') as f:
+            np.save(f, self._case_ids)
+        with open(f"{self.meta_file}.tmp", 'wb') as f:
+            np.savez(f, **self._columns)
+        with open(f"{self.info_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                'index_type': self._built_type or self.config.index_type,
+                'config_index_type': self.config.index_type,
+                'dimension': self._index.d,
+                'count': len(self._id_of),
+                'version': self._version,
+            }, f)
+        
+        for path in (self.index_file, self.ids_file, self.meta_file, self.info_file):
+            os.replace(f"{path}.tmp", path)
     
     def build_case_text(self, case_data: Dict) -> str:
         """
@@ -207,11 +395,10 @@ class VectorStore:
         
         # BGE模型建议添加指令前缀
         # 对于检索任务，query加前缀，passage不加
-        vectors = self.model.encode(
-            texts,
-            batch_size=self.config.batch_size,
-            show_progress_bar=len(texts) > 10,
-            normalize_embeddings=True  # 归一化，使内积等价于余弦相似度
+        # 已编码过的文本直接读取缓存，只编码新增或变化的文本
+        vectors = cached_encode(
+            self.config.model_path, texts,
+            lambda missing: self.encoder.encode(missing, show_progress_bar=len(missing) > 10)
         )
         return vectors
     
@@ -225,12 +412,8 @@ class VectorStore:
         Returns:
             查询向量 (1, dim)
         """
-        # BGE模型的查询前缀
-        query_with_prefix = f"为这个句子生成表示以用于检索相关文章：{query}"
-        vector = self.model.encode(
-            [query_with_prefix],
-            normalize_embeddings=True
-        )
+        # 并发查询由编码器合并为一次编码
+        vector = self.encoder.encode_query(query)
         return vector
     
     def rebuild(self, cases: List[Dict]):
@@ -240,20 +423,83 @@ class VectorStore:
         Args:
             cases: 案例列表，每个案例需包含case_id和完整数据
         """
-        import faiss
-        
         if not cases:
             print("⚠️ 没有案例数据，跳过向量索引构建")
-            self._index = None
-            self._case_ids = []
+            self._reset()
             self._dirty = False
             return
         
         print(f"🔨 重建向量索引: {len(cases)}个案例")
         
         # 构建文本
-        texts = []
+        case_ids, texts, metas = self._case_texts(cases)
+        
+        if not texts:
+            print("⚠️ 没有有效文本，跳过向量索引构建")
+            self._reset()
+            self._dirty = False
+            return
+        
+        # 编码
+        print(f"   编码 {len(texts)} 条文本...")
+        vectors = np.ascontiguousarray(self.encode(texts), dtype=np.float32)
+        
+        # 创建索引
+        print(f"   构建FAISS索引 ({self.config.index_type})...")
+        self._reset()
+        self._index = self._create_index(vectors)
+        self._index.add_with_ids(vectors, np.arange(len(case_ids), dtype=np.int64))
+        
+        self._case_ids = np.array(case_ids, dtype=str)
+        self._id_of = {case_id: i for i, case_id in enumerate(case_ids)}
+        self._columns = _scalar_columns(metas)
+        self._dirty = False
+        
+        # 保存
+        with self._file_lock():
+            self._save_index()
+        print(f"   ✓ 向量索引构建完成: {self._index.ntotal}条向量")
+    
+    def _create_index(self, vectors: np.ndarray):
+        """按配置创建索引（需要训练的类型用采样向量训练），外层包 IDMap2 使 id 稳定"""
+        import faiss
+        
+        count, dimension = vectors.shape
+        index_type = self.config.index_type
+        nlist = max(1, min(self.config.nlist, count // 39))  # 每个聚类至少约 39 个训练点
+        
+        if index_type == 'IVFPQ' and count < PQ_MIN_TRAIN:
+            # 数据太少时退化为精确检索，向量数足够后标记重建
+            print(f"   ⚠️ 向量数不足以训练 PQ，暂用 FlatIP")
+            index_type = 'FlatIP'
+        
+        factories = {
+            'FlatIP': "Flat",
+            'IVFFlat': f"IVF{nlist},Flat",
+            'IVFSQ8': f"IVF{nlist},SQ8",
+            'IVFPQ': f"IVF{nlist},PQ{self.config.pq_m}",
+            'HNSW': f"HNSW{self.config.hnsw_m}",
+        }
+        if index_type not in factories:
+            raise ValueError(f"不支持的FAISS索引类型: {index_type}，可选: {', '.join(INDEX_TYPES)}")
+        
+        index = faiss.index_factory(dimension, factories[index_type], faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            sample = vectors
+            if count > self.config.train_size:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(count, self.config.train_size, replace=False)]
+            print(f"   训练索引: {len(sample)}条采样向量")
+            index.train(sample)
+        
+        self._built_type = index_type
+        return faiss.IndexIDMap2(index)
+    
+    def _case_texts(self, cases: List[Dict]) -> Tuple[List[str], List[str], List[Dict]]:
+        """构建案例文本，返回 (case_ids, texts, 标量字段)"""
         case_ids = []
+        texts = []
+        metas = []
         for case in cases:
             case_id = case.get('case_id_full') or case.get('case_id')
             if not case_id:
@@ -263,35 +509,111 @@ class VectorStore:
             if text.strip():
                 texts.append(text)
                 case_ids.append(case_id)
+                metas.append(case_scalars(case))
+        return case_ids, texts, metas
+    
+    @contextmanager
+    def _writing(self):
+        """
+        增量写入（持有文件锁）
         
+        其他进程在本进程加载后保存过索引，或索引为只读映射时，先从磁盘重新加载
+        索引、id、标量字段（完整载入内存），保证新分配的 id 不与已有 id 重复
+        """
+        with self._file_lock():
+            if self._has_files():
+                if self._mmapped or self._read_info().get('version', 0) != self._version:
+                    self._read_files(mmap=False)
+            yield
+    
+    def add_cases(self, cases: List[Dict]):
+        """
+        增量添加案例向量（已存在的 case_id 先删除再添加）
+        
+        索引尚未构建时跳过，由 ensure_vector_index 全量构建；索引为空时标记重建，
+        不用单个批次训练 IVF / PQ
+        
+        Args:
+            cases: 案例列表，每个案例需包含case_id和完整数据
+        """
+        if self._dirty:
+            return
+        
+        case_ids, texts, metas = self._case_texts(cases)
         if not texts:
-            print("⚠️ 没有有效文本，跳过向量索引构建")
-            self._index = None
-            self._case_ids = []
-            self._dirty = False
             return
         
-        # 编码
-        print(f"   编码 {len(texts)} 条文本...")
-        vectors = self.encode(texts)
+        vectors = np.ascontiguousarray(self.encode(texts), dtype=np.float32)
         
-        # 创建索引
-        print(f"   构建FAISS索引...")
-        dimension = vectors.shape[1]
-        self._index = faiss.IndexFlatIP(dimension)  # 内积索引
-        self._index.add(vectors.astype(np.float32))
+        with self._writing():
+            if self._dirty:
+                return
+            if self._index is None:
+                self._dirty = True
+                return
+            self._remove(case_ids)
+            
+            start = len(self._case_ids)
+            self._index.add_with_ids(vectors, np.arange(start, start + len(case_ids), dtype=np.int64))
+            self._case_ids = np.concatenate([self._case_ids, np.array(case_ids, dtype=str)])
+            self._id_of.update((case_id, start + i) for i, case_id in enumerate(case_ids))
+            new_columns = _scalar_columns(metas)
+            self._columns = {name: np.concatenate([column, new_columns[name]])
+                             for name, column in self._columns.items()}
+            if self._needs_trained_build():
+                self._dirty = True
+            
+            self._save_index()
+    
+    def delete(self, case_ids: List[str]):
+        """删除案例向量"""
+        if self._dirty or not case_ids:
+            return
         
-        self._case_ids = case_ids
-        self._dirty = False
+        with self._writing():
+            if not self._dirty and self._remove(case_ids):
+                self._save_index()
+    
+    def _remove(self, case_ids: List[str]) -> int:
+        """
+        移除案例：id 置为墓碑并从索引删除（HNSW 不支持删除，只靠墓碑在检索时排除）
         
-        # 保存
-        self._save_index()
-        print(f"   ✓ 向量索引构建完成: {self._index.ntotal}条向量")
+        墓碑占比过高时标记重建
+        """
+        ids = [self._id_of.pop(case_id) for case_id in set(case_ids) if case_id in self._id_of]
+        if not ids or self._index is None:
+            return 0
+        
+        ids = np.array(ids, dtype=np.int64)
+        self._case_ids[ids] = ''
+        self._tombstones += len(ids)
+        try:
+            self._index.remove_ids(ids)
+        except RuntimeError:
+            pass
+        
+        if self._tombstones > self.config.max_tombstone_ratio * max(1, len(self._case_ids)):
+            self._dirty = True
+        return len(ids)
+    
+    def _search_params(self, selector=None):
+        """检索参数（IVF 的 nprobe、HNSW 的 efSearch，以及过滤选择器）"""
+        import faiss
+        
+        inner = faiss.downcast_index(self._index.index)
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.config.nprobe)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.config.ef_search, 1))
+        if selector is not None:
+            return faiss.SearchParameters(sel=selector)
+        return None
     
     def search(self, 
                query: str, 
                top_k: int = 20,
-               filter_ids: List[str] = None) -> List[Tuple[str, float]]:
+               filter_ids: List[str] = None,
+               filters: Dict = None) -> List[Tuple[str, float]]:
         """
         向量检索
         
@@ -299,50 +621,63 @@ class VectorStore:
             query: 查询文本
             top_k: 返回数量
             filter_ids: 限定在这些ID中搜索（可选）
+            filters: 标量过滤条件（可选，见 filter_mask）
         
         Returns:
             [(case_id, score), ...]
         """
+        import faiss
+        
         if self._index is None or self._index.ntotal == 0:
             return []
         
+        # 预过滤：只在满足条件（且未删除）的 id 中检索，结果数量准确
+        selector = None
+        candidates = len(self._id_of)
+        if filter_ids or filters or self._tombstones:
+            mask = self._filter_mask(filter_ids, filters)
+            candidates = int(mask.sum())
+            if not candidates:
+                return []
+            bitmap = np.packbits(mask, bitorder='little')
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        
         # 编码查询
         query_vector = self.encode_query(query)
         
-        # 搜索
-        # 如果有filter_ids，搜更多然后过滤
-        search_k = top_k * 3 if filter_ids else top_k
-        search_k = min(search_k, self._index.ntotal)
-        
+        # 搜索（bitmap 需在检索期间保持引用）
         scores, indices = self._index.search(
-            query_vector.astype(np.float32), 
-            search_k
+            np.ascontiguousarray(query_vector, dtype=np.float32), 
+            min(top_k, candidates),
+            params=self._search_params(selector)
         )
         
         # 组装结果
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < 0 or idx >= len(self._case_ids):
+        for score, idx in zip(scores[0], indices[0]):
+            if idx < 0 or idx >= len(self._case_ids) or not self._case_ids[idx]:
                 continue
-            
-            case_id = self._case_ids[idx]
-            score = float(scores[0][i])
-            
-            # 过滤
-            if filter_ids and case_id not in filter_ids:
-                continue
-            
-            results.append((case_id, score))
-            
-            if len(results) >= top_k:
-                break
+            results.append((str(self._case_ids[idx]), float(score)))
         
         return results
     
+    def _filter_mask(self, filter_ids: List[str] = None, filters: Dict = None) -> np.ndarray:
+        """满足过滤条件且未删除的 id 掩码"""
+        if filter_ids:
+            mask = np.zeros(len(self._case_ids), dtype=bool)
+            ids = [self._id_of[case_id] for case_id in set(filter_ids) if case_id in self._id_of]
+            mask[ids] = True
+        else:
+            mask = self._case_ids != ''
+        if filters:
+            mask &= filter_mask(self._columns, filters)
+        return mask
+    
     def search_by_case(self,
                        case_data: Dict,
                        top_k: int = 10,
-                       exclude_self: bool = True) -> List[Tuple[str, float]]:
+                       exclude_self: bool = True,
+                       filters: Dict = None) -> List[Tuple[str, float]]:
         """
         根据案例查找相似案例
         
@@ -350,6 +685,7 @@ class VectorStore:
             case_data: 案例数据
             top_k: 返回数量
             exclude_self: 是否排除自己
+            filters: 标量过滤条件（可选）
         
         Returns:
             [(case_id, score), ...]
@@ -359,7 +695,7 @@ class VectorStore:
             return []
         
         # 搜索更多以便排除自己
-        results = self.search(text, top_k=top_k + 5)
+        results = self.search(text, top_k=top_k + 5, filters=filters)
         
         # 排除自己
         if exclude_self:
@@ -371,8 +707,12 @@ class VectorStore:
     def get_stats(self) -> Dict:
         """获取统计信息"""
         return {
-            'total_vectors': self._index.ntotal if self._index else 0,
+            'total_vectors': len(self._id_of),
             'dimension': self.config.dimension,
+            'index_type': self.config.index_type,
+            'built_index_type': self._built_type,
+            'tombstones': self._tombstones,
+            'mmap': self._mmapped,
             'is_dirty': self._dirty,
             'index_file': self.index_file,
         }
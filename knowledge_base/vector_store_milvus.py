@@ -5,11 +5,53 @@ Milvus 向量存储
 """
 
 import os
+import json
+import time
+import threading
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 
 from .db_connection import connect_milvus, get_milvus_collection, MILVUS_CONFIG
+from .embedding import get_embedding_model, get_encoder
+from .embedding_cache import cached_encode
+from .vector_store import SCALAR_FIELDS, RANGE_FILTERS, case_scalars
+
+
+# 字符串标量字段写入时截断的长度
+STRING_FIELD_CHARS = 64
+
+
+def _quote(value: str) -> str:
+    """Milvus 表达式字符串字面量"""
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def build_filter_expr(filters: Dict = None) -> Optional[str]:
+    """
+    过滤条件 -> Milvus 布尔表达式（与 FAISS 的 filter_mask 语义一致）
+
+    Returns:
+        表达式，无条件时返回 None
+    """
+    if not filters:
+        return None
+
+    clauses = []
+    if filters.get('report_type'):
+        clauses.append(f"report_type == {_quote(filters['report_type'])}")
+    if filters.get('district'):
+        clauses.append(f"district like {_quote('%' + filters['district'] + '%')}")
+    if filters.get('usage'):
+        clauses.append(f"usage == {_quote(filters['usage'])}")
+    for field, (low_key, high_key) in RANGE_FILTERS.items():
+        cast = int if field == 'build_year' else float
+        if filters.get(low_key) is not None:
+            clauses.append(f"{field} >= {cast(filters[low_key])}")
+        if filters.get(high_key) is not None:
+            clauses.append(f"{field} <= {cast(filters[high_key])}")
+
+    return " and ".join(clauses) or None
 
 
 @dataclass
@@ -40,28 +82,67 @@ class MilvusVectorStore:
         # 延迟加载
         self._model = None
         self._dirty = False
+        self._building = None   # 正在重建的版本集合
+
+        # Collection 句柄
+        self._collection = None
+        self._version = None    # 句柄对应的版本集合
+        self._loaded = False
+        self._checked_at = 0.0
+        self._handle_lock = threading.Lock()
+
+        self.ensure_collection()
 
     @property
     def model(self):
-        """延迟加载embedding模型"""
+        """embedding模型（进程内共享，首次使用时加载）"""
         if self._model is None:
-            print(f"📦 加载Embedding模型: {self.config.model_path}")
-            try:
-                from sentence_transformers import SentenceTransformer
-                self._model = SentenceTransformer(
-                    self.config.model_path,
-                    device="cpu"
-                )
-                print(f"   ✓ 模型加载完成")
-            except Exception as e:
-                print(f"   ✗ 模型加载失败: {e}")
-                raise
+            self._model = get_embedding_model(self.config.model_path)
         return self._model
 
+    @property
+    def encoder(self):
+        """编码器（本进程模型，或配置了 KB_EMBEDDING_SOCKET 时的 embedding 服务）"""
+        return get_encoder(self.config.model_path, self.config.batch_size)
+
     @property
     def collection(self):
-        """获取 Milvus Collection"""
-        return get_milvus_collection()
+        """
+        获取 Milvus Collection（经别名访问，句柄复用）
+
+        每隔 alias_check_interval 秒检查一次别名指向的版本，版本变化（其他进程重建）时重新获取并加载
+        """
+        now = time.monotonic()
+        if self._collection is not None and now - self._checked_at < MILVUS_CONFIG['alias_check_interval']:
+            return self._collection
+
+        with self._handle_lock:
+            if self._collection is None or now - self._checked_at >= MILVUS_CONFIG['alias_check_interval']:
+                version = self.current_collection_name()
+                if self._collection is None or version != self._version:
+                    self._collection = get_milvus_collection()
+                    self._version = version
+                    self._loaded = False
+                self._checked_at = now
+        return self._collection
+
+    def _loaded_collection(self):
+        """已加载到内存的 Collection（每个版本只 load 一次）"""
+        collection = self.collection
+        if not self._loaded:
+            with self._handle_lock:
+                if not self._loaded:
+                    collection.load()
+                    self._loaded = True
+        return collection
+
+    def _reset_collection(self):
+        """别名切换后丢弃旧句柄"""
+        with self._handle_lock:
+            self._collection = None
+            self._version = None
+            self._loaded = False
+            self._checked_at = 0.0
 
     @property
     def is_dirty(self):
@@ -148,25 +229,25 @@ class MilvusVectorStore:
         if not texts:
             return np.array([])
 
-        vectors = self.model.encode(
-            texts,
-            batch_size=self.config.batch_size,
-            show_progress_bar=len(texts) > 10,
-            normalize_embeddings=True
+        # 已编码过的文本直接读取缓存，只编码新增或变化的文本
+        vectors = cached_encode(
+            self.config.model_path, texts,
+            lambda missing: self.encoder.encode(missing, show_progress_bar=len(missing) > 10)
         )
         return vectors
 
     def encode_query(self, query: str) -> np.ndarray:
         """编码查询文本（添加BGE查询前缀）"""
-        query_with_prefix = f"为这个句子生成表示以用于检索相关文章：{query}"
-        vector = self.model.encode(
-            [query_with_prefix],
-            normalize_embeddings=True
-        )
+        vector = self.encoder.encode_query(query)
         return vector
 
     def rebuild(self, cases: List[Dict]):
-        """重建向量索引"""
+        """
+        重建向量索引（不停机）
+
+        写入新的版本集合，建好索引并加载后再把别名切换过去，
+        重建期间检索仍走旧集合；最后清理多余的旧版本
+        """
         if not cases:
             print("⚠️ 没有案例数据，跳过向量索引构建")
             self._dirty = False
@@ -174,26 +255,8 @@ class MilvusVectorStore:
 
         print(f"🔨 重建向量索引: {len(cases)}个案例")
 
-        # 清空现有数据
-        self.clear()
-
         # 构建数据
-        case_ids = []
-        doc_ids = []
-        report_types = []
-        texts = []
-
-        for case in cases:
-            case_id = case.get('case_id_full') or case.get('case_id')
-            if not case_id:
-                continue
-
-            text = self.build_case_text(case)
-            if text.strip():
-                case_ids.append(case_id)
-                doc_ids.append(case.get('from_doc', ''))
-                report_types.append(case.get('report_type', ''))
-                texts.append(text)
+        rows, texts = self._case_rows(cases)
 
         if not texts:
             print("⚠️ 没有有效文本，跳过向量索引构建")
@@ -204,67 +267,116 @@ class MilvusVectorStore:
         print(f"   编码 {len(texts)} 条文本...")
         vectors = self.encode(texts)
 
-        # 插入到 Milvus
-        print(f"   插入到 Milvus...")
-        collection = self.collection
+        # 插入到新版本集合
+        collection_name = self._new_collection_name()
+        print(f"   插入到 Milvus: {collection_name}...")
+        collection = self._create_collection(collection_name)
+        self._building = collection_name
 
-        # 分批插入
-        batch_size = 1000
-        for i in range(0, len(case_ids), batch_size):
-            end = min(i + batch_size, len(case_ids))
-            collection.insert([
-                case_ids[i:end],
-                doc_ids[i:end],
-                report_types[i:end],
-                vectors[i:end].tolist(),
-            ])
+        try:
+            self._write_rows(collection, rows, vectors)
+
+            # 刷新并等待索引构建、加载完成
+            collection.flush()
+            self._prepare_collection(collection)
 
-        # 刷新
-        collection.flush()
+            # 切换别名
+            self._switch_alias(collection_name)
+        except Exception:
+            self._building = None
+            self._drop_collection(collection_name)
+            raise
+        self._building = None
 
         self._dirty = False
-        print(f"   ✓ 向量索引构建完成: {len(case_ids)}条向量")
+        print(f"   ✓ 向量索引构建完成: {len(rows)}条向量")
+
+        self.gc_collections()
+
+    def _case_rows(self, cases: List[Dict]) -> Tuple[List[Dict], List[str]]:
+        """构建插入行（不含向量），返回 (rows, texts)"""
+        rows = []
+        texts = []
+
+        for case in cases:
+            case_id = case.get('case_id_full') or case.get('case_id')
+            if not case_id:
+                continue
+
+            text = self.build_case_text(case)
+            if text.strip():
+                scalars = case_scalars(case)
+                for field in ('report_type', 'district', 'usage'):
+                    scalars[field] = scalars[field][:STRING_FIELD_CHARS]
+                rows.append({'case_id': case_id, 'doc_id': case.get('from_doc', ''), **scalars})
+                texts.append(text)
+
+        return rows, texts
+
+    def _write_rows(self, collection, rows: List[Dict], vectors: np.ndarray, upsert: bool = False):
+        """分批写入（行 + 向量）"""
+        write = collection.upsert if upsert else collection.insert
+        batch_size = 1000
+        for i in range(0, len(rows), batch_size):
+            write([
+                {**row, 'embedding': vector.tolist()}
+                for row, vector in zip(rows[i:i + batch_size], vectors[i:i + batch_size])
+            ])
 
     def add(self, case_data: Dict):
         """添加单个案例到向量索引"""
-        case_id = case_data.get('case_id_full') or case_data.get('case_id')
-        if not case_id:
-            return
+        self.add_cases([case_data])
 
-        text = self.build_case_text(case_data)
-        if not text.strip():
+    def add_cases(self, cases: List[Dict]):
+        """
+        增量添加案例向量（按 case_id upsert，只编码这些案例）
+
+        不调用 flush：检索可见增长段中的数据，逐批 flush 只会产生大量小的封存段
+        """
+        rows, texts = self._case_rows(cases)
+        if not texts:
             return
 
-        vector = self.encode([text])
+        vectors = self.encode(texts)
 
-        collection = self.collection
-        collection.insert([
-            [case_id],
-            [case_data.get('from_doc', '')],
-            [case_data.get('report_type', '')],
-            vector.tolist(),
-        ])
-        collection.flush()
+        for collection in self._write_targets():
+            self._write_rows(collection, rows, vectors, upsert=True)
 
     def delete(self, case_ids: List[str]):
         """删除案例向量"""
         if not case_ids:
             return
 
-        collection = self.collection
         expr = f"case_id in {case_ids}"
-        collection.delete(expr)
-        collection.flush()
+        for collection in self._write_targets():
+            collection.delete(expr)
+
+    def _write_targets(self) -> list:
+        """
+        增量写入的目标：当前集合，以及本进程正在重建的新版本集合
+
+        写入前重新检查别名，不沿用检索句柄的缓存，其他进程切换别名后的写入立即进入新集合；
+        切换前写入旧集合的变更由重建进程切换后补齐（见 KnowledgeBaseManager._replay_vector_writes）
+        """
+        with self._handle_lock:
+            self._checked_at = 0.0
+        targets = [self.collection]
+        if self._building:
+            from pymilvus import Collection
+            targets.append(Collection(self._building))
+        return targets
 
     def search(self,
                query: str,
                top_k: int = 20,
-               report_type: str = None) -> List[Tuple[str, float]]:
-        """向量检索"""
-        collection = self.collection
+               report_type: str = None,
+               filters: Dict = None) -> List[Tuple[str, float]]:
+        """
+        向量检索
 
-        # 确保 collection 已加载
-        collection.load()
+        过滤条件下推到 Milvus（expr + 标量索引），在满足条件的案例中检索
+        """
+        collection = self._loaded_collection()
 
         # 编码查询
         query_vector = self.encode_query(query)
@@ -276,9 +388,9 @@ class MilvusVectorStore:
         }
 
         # 过滤条件
-        expr = None
         if report_type:
-            expr = f'report_type == "{report_type}"'
+            filters = {**(filters or {}), 'report_type': report_type}
+        expr = build_filter_expr(filters)
 
         # 搜索
         results = collection.search(
@@ -301,14 +413,15 @@ class MilvusVectorStore:
     def search_by_case(self,
                        case_data: Dict,
                        top_k: int = 10,
-                       exclude_self: bool = True) -> List[Tuple[str, float]]:
+                       exclude_self: bool = True,
+                       filters: Dict = None) -> List[Tuple[str, float]]:
         """根据案例查找相似案例"""
         text = self.build_case_text(case_data)
         if not text.strip():
             return []
 
         # 搜索更多以便排除自己
-        results = self.search(text, top_k=top_k + 5)
+        results = self.search(text, top_k=top_k + 5, filters=filters)
 
         # 排除自己
         if exclude_self:
@@ -318,26 +431,116 @@ class MilvusVectorStore:
         return results[:top_k]
 
     def clear(self):
-        """清空向量索引"""
+        """清空向量索引（切换到一个空的新版本集合）"""
+        collection_name = self._new_collection_name()
+        collection = self._create_collection(collection_name)
+        self._prepare_collection(collection)
+        self._switch_alias(collection_name)
+        self.gc_collections()
+
+    def ensure_collection(self):
+        """确保别名存在（首次使用时创建第一个版本集合）"""
+        from pymilvus import Collection, utility
+
+        alias = MILVUS_CONFIG['collection']
+        if self.current_collection_name() is not None or utility.has_collection(alias):
+            # 旧集合没有标量字段：保持可用，标记重建（重建时迁移到别名）
+            fields = {field.name for field in Collection(alias).schema.fields}
+            if not set(SCALAR_FIELDS) <= fields:
+                print(f"⚠️ 向量集合缺少过滤字段，将重建: {alias}")
+                self._dirty = True
+            return
+
+        collection_name = self._new_collection_name()
+        collection = self._create_collection(collection_name)
+        self._prepare_collection(collection)
+        self._switch_alias(collection_name)
+
+    def _new_collection_name(self) -> str:
+        """新版本集合名：<别名>_v<毫秒时间戳>"""
+        return f"{MILVUS_CONFIG['collection']}_v{int(time.time() * 1000)}"
+
+    def _versioned_collections(self) -> List[str]:
+        """所有版本集合（按版本从旧到新）"""
         from pymilvus import utility
 
-        collection_name = MILVUS_CONFIG['collection']
-        if utility.has_collection(collection_name):
-            utility.drop_collection(collection_name)
+        prefix = f"{MILVUS_CONFIG['collection']}_v"
+        names = [name for name in utility.list_collections()
+                 if name.startswith(prefix) and name[len(prefix):].isdigit()]
+        return sorted(names, key=lambda name: int(name[len(prefix):]))
 
-        # 重新创建
-        self._create_collection()
+    def current_collection_name(self) -> Optional[str]:
+        """别名当前指向的集合"""
+        from pymilvus import utility
 
-    def _create_collection(self):
-        """创建 Collection"""
-        from pymilvus import Collection, FieldSchema, CollectionSchema, DataType
+        alias = MILVUS_CONFIG['collection']
+        for name in reversed(self._versioned_collections()):
+            if alias in utility.list_aliases(name):
+                return name
+        return None
+
+    def _switch_alias(self, collection_name: str):
+        """把别名原子切换到指定集合"""
+        from pymilvus import utility
+
+        alias = MILVUS_CONFIG['collection']
+        if self.current_collection_name() is not None:
+            utility.alter_alias(collection_name, alias)
+        else:
+            if utility.has_collection(alias):
+                # 别名不能与集合同名：旧的同名集合在新版本就绪后删除
+                print(f"   迁移旧集合 {alias} 到版本集合")
+                utility.drop_collection(alias)
+            utility.create_alias(collection_name, alias)
+        self._reset_collection()
+        print(f"   别名 {alias} -> {collection_name}")
+
+    def gc_collections(self, keep: int = None):
+        """删除多余的旧版本集合（保留当前版本和最近 keep 个旧版本）"""
+        keep = MILVUS_CONFIG['keep_versions'] if keep is None else keep
+        current = self.current_collection_name()
+        if current is None:
+            return
+
+        versions = self._versioned_collections()
+        old_versions = [name for name in versions[:versions.index(current)] if name != self._building]
+        stale = old_versions[:max(0, len(old_versions) - keep)]
+        for name in stale:
+            self._drop_collection(name)
+        if stale:
+            print(f"   清理旧版本集合: {len(stale)}个")
+
+    def _drop_collection(self, collection_name: str):
+        from pymilvus import utility
+
+        try:
+            if utility.has_collection(collection_name):
+                utility.drop_collection(collection_name)
+        except Exception as e:
+            print(f"⚠️ 删除集合失败 {collection_name}: {e}")
+
+    def _prepare_collection(self, collection):
+        """等待索引构建完成并加载到内存，之后才能切换别名"""
+        from pymilvus import utility
+
+        for index in collection.indexes:
+            utility.wait_for_index_building_complete(collection.name, index_name=index.index_name)
+        collection.load()
+        utility.wait_for_loading_complete(collection.name)
 
-        collection_name = MILVUS_CONFIG['collection']
+    def _create_collection(self, collection_name: str):
+        """创建 Collection（向量 + 过滤用标量字段）"""
+        from pymilvus import Collection, FieldSchema, CollectionSchema, DataType
 
         fields = [
             FieldSchema(name="case_id", dtype=DataType.VARCHAR, max_length=64, is_primary=True),
             FieldSchema(name="doc_id", dtype=DataType.VARCHAR, max_length=64),
-            FieldSchema(name="report_type", dtype=DataType.VARCHAR, max_length=50),
+            FieldSchema(name="report_type", dtype=DataType.VARCHAR, max_length=256),
+            FieldSchema(name="district", dtype=DataType.VARCHAR, max_length=256),
+            FieldSchema(name="usage", dtype=DataType.VARCHAR, max_length=256),
+            FieldSchema(name="area", dtype=DataType.FLOAT),
+            FieldSchema(name="price", dtype=DataType.FLOAT),
+            FieldSchema(name="build_year", dtype=DataType.INT32),
             FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.config.dimension),
         ]
 
@@ -350,20 +553,32 @@ class MilvusVectorStore:
             "metric_type": "IP",
             "params": {"nlist": 1024}
         }
-        collection.create_index(field_name="embedding", index_params=index_params)
+        collection.create_index(field_name="embedding", index_params=index_params, index_name="idx_embedding")
+
+        # 标量索引（过滤下推）
+        for field in SCALAR_FIELDS:
+            collection.create_index(field_name=field, index_params={"index_type": "INVERTED"},
+                                    index_name=f"idx_{field}")
 
         return collection
 
     def get_stats(self) -> Dict:
-        """获取统计信息"""
-        collection = self.collection
-        collection.flush()
+        """获取统计信息（不触发 flush）"""
+        collection = self._loaded_collection()
+
+        # count(*) 包含未刷盘的数据；失败时退回已刷盘的实体数
+        try:
+            result = collection.query(expr="", output_fields=["count(*)"])
+            total = result[0]["count(*)"] if result else 0
+        except Exception:
+            total = collection.num_entities
 
         return {
-            'total_vectors': collection.num_entities,
+            'total_vectors': total,
             'dimension': self.config.dimension,
             'is_dirty': self._dirty,
             'collection': MILVUS_CONFIG['collection'],
+            'version': self._version,
         }
 
 
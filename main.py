@@ -5,6 +5,9 @@
 使用方式：
     # 构建知识库
     python main.py build -d ./data/docs
+
+    # 多进程并行构建
+    python main.py build -d ./data/docs --workers 8
     
     # 审查新报告
     python main.py review -f 新报告.docx
@@ -18,20 +21,54 @@
 
 import os
 import sys
+import time
 import argparse
+from typing import List, Dict, Optional
 
 # 添加路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from extractors import extract_report
+from extractors import extract_report, ParsedDocument, load_document, BACKENDS
 from validators import validate_report
-from knowledge_base import KnowledgeBaseManager, KnowledgeBaseQuery
+from knowledge_base import KnowledgeBaseManager, KnowledgeBaseQuery, BuildManifest
 from reviewer import ReportReviewer, review_report
 from generator import ReportGenerator
-from utils import convert_doc_to_docx, detect_report_type
+from utils import convert_doc_to_docx, detect_report_type, get_doc_converter, init_converter_worker
 from config import KB_DIR
 
 
+def extract_for_build(doc_path: str, backend: str = None) -> Dict:
+    """
+    转换并提取单个报告（可在进程池中运行）
+
+    Args:
+        doc_path: 文档路径
+        backend: 解析后端 'docx' / 'stream'
+
+    Returns:
+        {'file', 'path', 'result', 'report_type', 'timings'}，失败时包含 'error'
+    """
+    filename = os.path.basename(doc_path)
+    source_path = doc_path
+    timings = {'convert': 0.0, 'extract': 0.0}
+
+    try:
+        start = time.perf_counter()
+        if doc_path.lower().endswith('.doc'):
+            doc_path = convert_doc_to_docx(doc_path)
+        timings['convert'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report_type = detect_report_type(doc_path)
+        result = extract_report(doc_path, backend=backend)
+        timings['extract'] = time.perf_counter() - start
+    except Exception as e:
+        return {'file': filename, 'path': source_path, 'error': str(e), 'timings': timings}
+
+    return {'file': filename, 'path': source_path, 'result': result,
+            'report_type': report_type, 'timings': timings}
+
+
 class RealEstateKBSystem:
     """房地产估价知识库系统"""
     
@@ -47,8 +84,8 @@ class RealEstateKBSystem:
         self.kb_path = kb_path or KB_DIR
         self.kb = KnowledgeBaseManager(self.kb_path, enable_vector=enable_vector)
         self.query = KnowledgeBaseQuery(self.kb)
-        self.reviewer = ReportReviewer(self.kb, enable_llm=enable_llm)
-        self.generator = ReportGenerator(self.kb)
+        self.reviewer = ReportReviewer(self.kb, enable_llm=enable_llm, query=self.query)
+        self.generator = ReportGenerator(self.kb, query=self.query)
 
     # ========================================================================
     # 知识库构建
@@ -65,6 +102,26 @@ class RealEstateKBSystem:
         if verbose:
             print(f"\n📥 添加: {os.path.basename(doc_path)}")
 
+        result, report_type = self.extract(doc_path)
+
+        # 存入知识库
+        doc_id = self.kb.add_report(result, report_type)
+
+        if verbose:
+            self._print_added(result, report_type, doc_id)
+
+        return doc_id
+
+    def extract(self, doc_path: str):
+        """
+        转换并提取报告（不入库）
+
+        Args:
+            doc_path: 文档路径
+
+        Returns:
+            (提取结果, 报告类型)
+        """
         # 转换doc
         if doc_path.lower().endswith('.doc'):
             doc_path = convert_doc_to_docx(doc_path)
@@ -75,91 +132,302 @@ class RealEstateKBSystem:
         # 提取
         result = extract_report(doc_path)
 
-        # 存入知识库
-        doc_id = self.kb.add_report(result, report_type)
+        return result, report_type
 
-        if verbose:
-            print(f"   ✓ 类型: {report_type}")
-            print(f"   ✓ 地址: {result.subject.address.value}")
-            print(f"   ✓ 案例: {len(result.cases)} 个")
-            print(f"   ✓ ID: {doc_id}")
+    def add_reports_bulk(self, doc_paths: List[str], verbose: bool = True,
+                         stage_times: Dict[str, float] = None,
+                         content_hashes: Dict[str, str] = None,
+                         backend: str = None) -> List[Dict]:
+        """
+        批量添加报告：逐个提取后单事务写入知识库
 
-        return doc_id
+        Args:
+            doc_paths: 文档路径列表
+            verbose: 是否打印详情
+            stage_times: 各阶段累计耗时（可选，原地累加）
+            content_hashes: {文档路径: 内容哈希}（可选，随报告一起入库）
+            backend: 解析后端 'docx' / 'stream'
 
-    def build_from_directory(self, docs_dir: str):
+        Returns:
+            [{'file': 文件名, 'path': ..., 'doc_id': ..., 'report_type': ...}
+             或 {'file': 文件名, 'path': ..., 'error': ...}, ...]
+        """
+        extracted = []
+        for doc_path in doc_paths:
+            if verbose:
+                print(f"\n📥 提取: {os.path.basename(doc_path)}")
+            item = extract_for_build(doc_path, backend)
+            if content_hashes:
+                item['content_hash'] = content_hashes.get(doc_path)
+            self._add_stage_times(stage_times, item['timings'])
+            if verbose and 'error' in item:
+                print(f"   ❌ 失败: {item['file']} - {item['error']}")
+            extracted.append(item)
+
+        return self._ingest_extracted(extracted, verbose, stage_times)
+
+    def _ingest_extracted(self, extracted: List[Dict], verbose: bool = True,
+                          stage_times: Dict[str, float] = None) -> List[Dict]:
+        """将 extract_for_build 的输出写入知识库"""
+        def outcome(item, **fields):
+            return {'file': item['file'], 'path': item.get('path'),
+                    'content_hash': item.get('content_hash'), **fields}
+
+        outcomes = [outcome(item, error=item['error']) for item in extracted if 'error' in item]
+        ok = [item for item in extracted if 'error' not in item]
+        if not ok:
+            return outcomes
+
+        start = time.perf_counter()
+        try:
+            doc_ids = self.kb.add_reports_bulk([
+                (item['result'], item['report_type'], item.get('content_hash'), item.get('path')) for item in ok
+            ])
+        except Exception as e:
+            # 整批写入失败时逐个写入，定位出错的报告
+            if verbose:
+                print(f"   ⚠️ 批量写入失败，改为逐个写入: {e}")
+            doc_ids = []
+            for item in ok:
+                try:
+                    doc_ids.append(self.kb.add_report(item['result'], item['report_type'],
+                                                      content_hash=item.get('content_hash'),
+                                                      file_path=item.get('path')))
+                except Exception as single_error:
+                    doc_ids.append(None)
+                    outcomes.append(outcome(item, error=str(single_error)))
+        self._add_stage_times(stage_times, {'ingest': time.perf_counter() - start})
+
+        for item, doc_id in zip(ok, doc_ids):
+            if doc_id is None:
+                continue
+            if verbose:
+                self._print_added(item['result'], item['report_type'], doc_id)
+            outcomes.append(outcome(item, doc_id=doc_id, report_type=item['report_type']))
+
+        return outcomes
+
+    @staticmethod
+    def _add_stage_times(stage_times: Optional[Dict[str, float]], timings: Dict[str, float]):
+        """累加阶段耗时"""
+        if stage_times is None:
+            return
+        for stage, seconds in timings.items():
+            stage_times[stage] = stage_times.get(stage, 0.0) + seconds
+
+    def _print_added(self, result, report_type: str, doc_id: str):
+        """打印入库结果"""
+        print(f"   ✓ 类型: {report_type}")
+        print(f"   ✓ 地址: {result.subject.address.value}")
+        print(f"   ✓ 案例: {len(result.cases)} 个")
+        print(f"   ✓ ID: {doc_id}")
+
+    def build_from_directory(self, docs_dir: str, batch_size: int = 50, workers: int = 1,
+                             manifest_path: str = None, force: bool = False, backend: str = None):
         """
-        从目录批量构建知识库
+        从目录批量构建知识库（支持断点续建和增量构建）
+
+        每个源文件计算内容哈希：知识库中已有相同内容的报告时直接跳过（以知识库为准，
+        清空或删除报告后会重新入库）；每批写入后更新检查点清单，中断后重新执行即可从断点继续。
+        同一源文件重新入库后删除其旧版本报告。
 
         Args:
             docs_dir: 文档目录
+            batch_size: 每批写入知识库的报告数
+            workers: 提取进程数（>1 时使用多进程并行提取）
+            manifest_path: 检查点清单路径（默认 <知识库路径>/build_manifest.json）
+            force: 忽略哈希，全部重新入库（替换旧版本）
+            backend: 解析后端 'docx'（默认）/ 'stream'（流式读取，内存占用低）
         """
         print(f"\n{'='*60}")
         print(f"📦 构建知识库")
         print(f"{'='*60}")
         print(f"目录: {docs_dir}")
+        if workers > 1:
+            print(f"并行: {workers} 个进程")
 
-        success = []
-        failed = []
+        manifest = BuildManifest(manifest_path or os.path.join(self.kb_path, 'build_manifest.json'))
 
-        for filename in sorted(os.listdir(docs_dir)):
-            if not filename.lower().endswith(('.doc', '.docx')):
-                continue
+        all_paths = [
+            os.path.join(docs_dir, filename)
+            for filename in sorted(os.listdir(docs_dir))
+            if filename.lower().endswith(('.doc', '.docx'))
+        ]
 
-            filepath = os.path.join(docs_dir, filename)
-            try:
-                self.add_report(filepath)
-                success.append(filename)
-            except Exception as e:
-                print(f"   ❌ 失败: {filename} - {e}")
-                failed.append({'file': filename, 'error': str(e)})
+        # 计算内容哈希（清单只用于复用哈希），跳过知识库中已有的内容
+        content_hashes = {path: manifest.content_hash(path) for path in all_paths}
+        if force:
+            doc_paths = all_paths
+        else:
+            ingested = self.kb.find_ingested_hashes(list(set(content_hashes.values())))
+            doc_paths = []
+            seen = set()
+            for path in all_paths:
+                content_hash = content_hashes[path]
+                if content_hash in ingested or content_hash in seen:
+                    continue
+                seen.add(content_hash)
+                doc_paths.append(path)
+        skipped = len(all_paths) - len(doc_paths)
+        if skipped:
+            print(f"跳过: {skipped} 个（内容未变化）")
+
+        stage_times = {'convert': 0.0, 'extract': 0.0, 'ingest': 0.0}
+        build_start = time.perf_counter()
+        outcomes = []
+
+        # 先用转换池并发转换 doc，提取阶段直接命中转换缓存
+        doc_files = [path for path in doc_paths if path.lower().endswith('.doc')]
+        if doc_files:
+            print(f"\n🔄 转换 doc: {len(doc_files)} 个")
+            start = time.perf_counter()
+            get_doc_converter().convert_batch(doc_files)
+            stage_times['convert'] += time.perf_counter() - start
+
+        def checkpoint(batch_outcomes: List[Dict]):
+            self._checkpoint(manifest, batch_outcomes)
+            outcomes.extend(batch_outcomes)
+
+        if workers > 1:
+            self._build_parallel(doc_paths, batch_size, workers, stage_times, content_hashes, checkpoint,
+                                 backend=backend)
+        else:
+            for i in range(0, len(doc_paths), batch_size):
+                checkpoint(self.add_reports_bulk(doc_paths[i:i + batch_size], stage_times=stage_times,
+                                                 content_hashes=content_hashes, backend=backend))
 
-        # 批量导入后重建向量索引
+        success = [o['file'] for o in outcomes if 'error' not in o]
+        failed = [{'file': o['file'], 'error': o['error']} for o in outcomes if 'error' in o]
+
+        # 新案例的向量已随入库增量写入，只有索引尚未构建或增量更新失败时才全量重建
         if self.kb.enable_vector and success:
-            print(f"\n📐 重建向量索引...")
+            print(f"\n📐 检查向量索引...")
+            start = time.perf_counter()
             try:
-                self.kb.rebuild_vector_index()
+                self.kb.ensure_vector_index()
             except Exception as e:
                 print(f"   ⚠️ 向量索引构建失败: {e}")
+            stage_times['vector'] = time.perf_counter() - start
+
+        elapsed = time.perf_counter() - build_start
 
         print(f"\n{'='*60}")
         print(f"✓ 构建完成")
         print(f"  成功: {len(success)} 个")
         print(f"  失败: {len(failed)} 个")
+        print(f"  跳过: {skipped} 个")
+        self._print_throughput(len(doc_paths), elapsed, stage_times, workers)
         print(f"  知识库: {self.kb.stats()}")
 
-        return {'success': success, 'failed': failed}
+        return {'success': success, 'failed': failed, 'skipped': skipped,
+                'elapsed': elapsed, 'stage_times': stage_times}
+
+    def _checkpoint(self, manifest: BuildManifest, outcomes: List[Dict]):
+        """记录一批入库结果并保存清单；重新入库的文件删除其旧版本报告（清单记录 + 按源文件路径查询）"""
+        done = [o for o in outcomes if o.get('path') and 'error' not in o]
+        try:
+            by_path = self.kb.find_reports_by_paths([o['path'] for o in done])
+        except Exception as e:
+            print(f"   ⚠️ 查询旧版本失败: {e}")
+            by_path = {}
+
+        for o in outcomes:
+            path = o.get('path')
+            if not path:
+                continue
+            if 'error' in o:
+                manifest.mark_failed(path, o.get('content_hash'), o['error'])
+                continue
+
+            previous = manifest.get(path) or {}
+            old_ids = set(by_path.get(os.path.abspath(path), []))
+            if previous.get('doc_id'):
+                old_ids.add(previous['doc_id'])
+            old_ids.discard(o['doc_id'])
+            for doc_id in sorted(old_ids):
+                try:
+                    self.kb.delete_report(doc_id)
+                except Exception as e:
+                    print(f"   ⚠️ 删除旧版本失败: {doc_id} - {e}")
+            manifest.mark_done(path, o.get('content_hash'), o['doc_id'])
+        manifest.save()
+
+    def _build_parallel(self, doc_paths: List[str], batch_size: int, workers: int,
+                        stage_times: Dict[str, float], content_hashes: Dict[str, str],
+                        on_batch, backend: str = None) -> None:
+        """多进程提取，主进程按批次流式写入知识库"""
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        pending = []
+
+        # 工作进程重试 doc 转换时会各自建立转换池，退出时由 initializer 注册的终结器关闭
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_converter_worker) as executor:
+            futures = {executor.submit(extract_for_build, path, backend): path for path in doc_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    item = future.result()
+                except Exception as e:
+                    # 工作进程异常退出
+                    item = {'file': os.path.basename(path), 'path': path, 'error': str(e), 'timings': {}}
+                item['content_hash'] = content_hashes.get(path)
+
+                self._add_stage_times(stage_times, item['timings'])
+                if 'error' in item:
+                    print(f"   ❌ 失败: {item['file']} - {item['error']}")
+                else:
+                    print(f"   ✓ 提取: {item['file']} ({len(item['result'].cases)} 个案例)")
+                pending.append(item)
+
+                if len(pending) >= batch_size:
+                    on_batch(self._ingest_extracted(pending, verbose=False, stage_times=stage_times))
+                    pending = []
+
+        if pending:
+            on_batch(self._ingest_extracted(pending, verbose=False, stage_times=stage_times))
+
+    @staticmethod
+    def _print_throughput(total: int, elapsed: float, stage_times: Dict[str, float], workers: int):
+        """打印各阶段吞吐"""
+        print(f"  耗时: {elapsed:.1f}s（{total / elapsed if elapsed > 0 else 0:.2f} 个/秒）")
+        labels = {'convert': 'doc转换', 'extract': '解析提取', 'ingest': '写入知识库', 'vector': '向量索引'}
+        for stage, seconds in stage_times.items():
+            rate = total / seconds if seconds > 0 else 0
+            note = f"（{workers} 进程累计）" if workers > 1 and stage in ('convert', 'extract') else ""
+            print(f"    {labels.get(stage, stage)}: {seconds:.1f}s{note}，{rate:.2f} 个/秒")
 
     # ========================================================================
     # 审查功能
     # ========================================================================
 
-    def review(self, doc_path: str, verbose: bool = True):
+    def review(self, doc_path: str, verbose: bool = True, parsed: ParsedDocument = None):
         """
         审查报告（基于知识库）
 
         Args:
             doc_path: 文档路径
             verbose: 是否打印详情
+            parsed: 已解析文档（可选，传入时不再重复解析）
         """
-        return self.reviewer.review(doc_path, verbose)
+        return self.reviewer.review(doc_path, verbose, parsed=parsed)
 
-    def validate(self, doc_path: str, verbose: bool = True):
+    def validate(self, doc_path: str, verbose: bool = True, parsed: ParsedDocument = None):
         """
         仅做基础校验（不对比知识库）
 
         Args:
             doc_path: 文档路径
             verbose: 是否打印详情
+            parsed: 已解析文档（可选，传入时不再重复解析）
         """
         if verbose:
             print(f"\n🔍 校验: {os.path.basename(doc_path)}")
 
-        # 转换doc
-        if doc_path.lower().endswith('.doc'):
-            doc_path = convert_doc_to_docx(doc_path)
+        # 解析（doc文件在解析时转换）
+        parsed = parsed or load_document(doc_path)
 
         # 提取
-        result = extract_report(doc_path)
+        result = extract_report(parsed)
 
         # 校验
         validation = validate_report(result)
@@ -235,6 +503,13 @@ class RealEstateKBSystem:
         """重建向量索引"""
         self.kb.rebuild_vector_index()
 
+    def clear(self):
+        """清空知识库（同时删除构建清单，下次构建全部重新入库）"""
+        self.kb.clear()
+        manifest_path = os.path.join(self.kb_path, 'build_manifest.json')
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
     def stats(self):
         """
         统计信息
@@ -252,6 +527,17 @@ class RealEstateKBSystem:
 # 命令行接口
 # ============================================================================
 
+def _positive_int(value: str) -> int:
+    """argparse 类型：正整数"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要整数: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"需要大于等于 1 的整数: {value}")
+    return number
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='房地产估价报告知识库系统',
@@ -260,6 +546,9 @@ def main():
 示例:
   # 构建知识库
   python main.py build -d ./data/docs
+
+  # 多进程并行构建
+  python main.py build -d ./data/docs --workers 8
   
   # 审查新报告（对比知识库）
   python main.py review -f 新报告.docx
@@ -283,6 +572,12 @@ def main():
     parser.add_argument('-k', '--keyword', help='搜索关键词')
     parser.add_argument('-t', '--type', help='报告类型 (shezhi/zujin/biaozhunfang)')
     parser.add_argument('--kb', default=None, help='知识库路径')
+    parser.add_argument('--workers', type=_positive_int, default=1, help='构建时的并行提取进程数')
+    parser.add_argument('--batch-size', type=_positive_int, default=50, help='构建时每批写入知识库的报告数')
+    parser.add_argument('--manifest', default=None, help='构建检查点清单路径')
+    parser.add_argument('--force', action='store_true', help='构建时忽略内容哈希，全部重新入库')
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help='文档解析后端：docx（默认）/ stream（流式读取）')
 
     args = parser.parse_args()
 
@@ -291,7 +586,9 @@ def main():
 
     if args.command == 'build':
         if args.dir:
-            system.build_from_directory(args.dir)
+            system.build_from_directory(args.dir, batch_size=args.batch_size, workers=args.workers,
+                                        manifest_path=args.manifest, force=args.force,
+                                        backend=args.backend)
         else:
             print("请指定目录: -d ./data/docs")
 
@@ -354,7 +651,7 @@ def main():
         print("\n" + "="*60)
         print("清空知识库")
         print("="*60)
-        system.kb.clear()
+        system.clear()
 
 
 if __name__ == "__main__":
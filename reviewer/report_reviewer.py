@@ -11,10 +11,11 @@ from dataclasses import dataclass, field
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from extractors import extract_report
+from extractors import extract_report, ParsedDocument, load_document
 from validators import validate_report, ValidationResult
 from knowledge_base import KnowledgeBaseManager, KnowledgeBaseQuery
-from utils import convert_doc_to_docx, detect_report_type
+from knowledge_base.quantile_sketch import SKETCH_CONFIG
+from utils import detect_report_type
 from reviewer.llm_reviewer import LLMReviewer, LLMReviewResult, LLMIssue
 
 
@@ -28,6 +29,11 @@ class ComparisonResult:
     kb_avg: float
     is_abnormal: bool
     description: str = ""
+    # 同区域/用途分布（分布草图，样本不足时放宽到更大范围）
+    kb_p5: float = None
+    kb_p50: float = None
+    kb_p95: float = None
+    kb_scope: str = ""
 
 
 @dataclass
@@ -53,24 +59,27 @@ class ReviewResult:
 class ReportReviewer:
     """报告审查器"""
     
-    def __init__(self, kb_manager: KnowledgeBaseManager, enable_llm: bool = True):
+    def __init__(self, kb_manager: KnowledgeBaseManager, enable_llm: bool = True,
+                 query: KnowledgeBaseQuery = None):
         """
         Args:
             kb_manager: 知识库管理器
             enable_llm: 是否启用LLM语义审查
+            query: 知识库查询器（可选，传入时与调用方共用）
         """
         self.kb = kb_manager
-        self.query = KnowledgeBaseQuery(kb_manager)
+        self.query = query or KnowledgeBaseQuery(kb_manager)
         self.enable_llm = enable_llm
         self.llm_reviewer = LLMReviewer() if enable_llm else None
     
-    def review(self, doc_path: str, verbose: bool = True) -> ReviewResult:
+    def review(self, doc_path: str, verbose: bool = True, parsed: ParsedDocument = None) -> ReviewResult:
         """
         审查报告
         
         Args:
             doc_path: 文档路径
             verbose: 是否打印详情
+            parsed: 已解析文档（可选，传入时不再重复解析）
         
         Returns:
             ReviewResult
@@ -80,15 +89,14 @@ class ReportReviewer:
             print(f"🔍 审查报告: {os.path.basename(doc_path)}")
             print(f"{'='*60}")
         
-        # 处理doc文件
-        if doc_path.lower().endswith('.doc'):
-            doc_path = convert_doc_to_docx(doc_path)
+        # 解析文档（doc文件在解析时转换）
+        parsed = parsed or load_document(doc_path)
         
         # 检测类型
-        report_type = detect_report_type(doc_path)
+        report_type = detect_report_type(parsed.path)
         
         # 提取数据
-        result = extract_report(doc_path)
+        result = extract_report(parsed)
         
         # 1. 基础校验
         validation = validate_report(result)
@@ -161,7 +169,11 @@ class ReportReviewer:
                 price = case.final_price.value
             
             if price and price_stats['count'] > 0:
-                is_abnormal = price < price_stats['min'] * 0.5 or price > price_stats['max'] * 1.5
+                quantiles = self._case_quantiles('price', report_type, case)
+                if quantiles:
+                    is_abnormal = self._outside_quantiles(price, quantiles)
+                else:
+                    is_abnormal = price < price_stats['min'] * 0.5 or price > price_stats['max'] * 1.5
                 comparisons.append(ComparisonResult(
                     item=f"实例{case.case_id}价格",
                     current_value=price,
@@ -170,6 +182,7 @@ class ReportReviewer:
                     kb_avg=price_stats['avg'],
                     is_abnormal=is_abnormal,
                     description="价格明显偏离知识库范围" if is_abnormal else "",
+                    **self._quantile_fields(quantiles),
                 ))
             
             # 修正系数对比
@@ -183,7 +196,11 @@ class ReportReviewer:
                     stats = correction_stats.get(key, {})
                     
                     if val and stats.get('count', 0) > 0:
-                        is_abnormal = val < stats['min'] * 0.8 or val > stats['max'] * 1.2
+                        quantiles = self._case_quantiles(field, report_type, case)
+                        if quantiles:
+                            is_abnormal = self._outside_quantiles(val, quantiles)
+                        else:
+                            is_abnormal = val < stats['min'] * 0.8 or val > stats['max'] * 1.2
                         comparisons.append(ComparisonResult(
                             item=f"实例{case.case_id}{name}",
                             current_value=val,
@@ -192,9 +209,39 @@ class ReportReviewer:
                             kb_avg=stats['avg'],
                             is_abnormal=is_abnormal,
                             description=f"{name}系数偏离知识库范围" if is_abnormal else "",
+                            **self._quantile_fields(quantiles),
                         ))
         
         return comparisons
+
+    def _case_quantiles(self, metric: str, report_type: str, case) -> Optional[Dict]:
+        """案例所在区域/用途的分布分位数（样本不足时返回 None，退回全局范围判断）"""
+        try:
+            quantiles = self.query.get_quantiles(metric, report_type,
+                                                 district=getattr(case, 'district', '') or None,
+                                                 usage=getattr(case, 'usage', '') or None)
+        except Exception as e:
+            print(f"⚠️ 分布草图查询失败: {e}")
+            return None
+        if not quantiles or quantiles['count'] < SKETCH_CONFIG['min_count']:
+            return None
+        return quantiles
+
+    @staticmethod
+    def _outside_quantiles(value: float, quantiles: Dict) -> bool:
+        margin = SKETCH_CONFIG['outlier_margin']
+        return value < quantiles['p5'] * (1 - margin) or value > quantiles['p95'] * (1 + margin)
+
+    @staticmethod
+    def _quantile_fields(quantiles: Optional[Dict]) -> Dict:
+        if not quantiles:
+            return {}
+        return {
+            'kb_p5': quantiles['p5'],
+            'kb_p50': quantiles['p50'],
+            'kb_p95': quantiles['p95'],
+            'kb_scope': quantiles['scope'],
+        }
     
     def _find_similar(self, result, report_type: str) -> List[Dict]:
         """查找相似案例"""
@@ -294,6 +341,8 @@ class ReportReviewer:
             for c in abnormal:
                 print(f"  ⚠️ {c.item}: {c.current_value:.2f}")
                 print(f"      知识库范围: {c.kb_min:.2f} ~ {c.kb_max:.2f} (平均: {c.kb_avg:.2f})")
+                if c.kb_p50 is not None:
+                    print(f"      同类分布: p5 {c.kb_p5:.2f} / p50 {c.kb_p50:.2f} / p95 {c.kb_p95:.2f} ({c.kb_scope})")
         
         # LLM语义审查问题
         if review_result.llm_issues:
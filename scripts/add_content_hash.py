@@ -0,0 +1,36 @@
+"""
+添加源文件内容哈希字段（增量构建去重用）和源文件路径索引（重新构建时替换旧版本）
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.db_connection import pg_cursor
+
+
+def migrate():
+    """添加 documents.content_hash 字段及 content_hash / file_path 索引"""
+
+    with pg_cursor() as cursor:
+        print("正在修改 documents 表...")
+
+        cursor.execute("""
+            ALTER TABLE documents 
+            ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_documents_file_path ON documents(file_path)
+        """)
+
+        print("  ✓ documents 表修改完成")
+
+    print("\n✓ 迁移完成!")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,39 @@
+"""
+添加修正系数字段（从 case_data 中提取，供 SQL 聚合统计）
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.db_connection import pg_cursor
+from knowledge_base.kb_manager_db import CORRECTION_FIELDS
+
+
+def migrate():
+    """添加 cases.*_correction 字段并回填"""
+
+    with pg_cursor() as cursor:
+        print("正在修改 cases 表...")
+
+        for field in CORRECTION_FIELDS:
+            cursor.execute(f"ALTER TABLE cases ADD COLUMN IF NOT EXISTS {field} FLOAT")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_report_type ON cases(report_type)")
+
+        print("  ✓ cases 表修改完成")
+
+        # 回填：只转换数值形式的 value
+        print("正在回填修正系数...")
+        assignments = ", ".join(
+            f"""{field} = CASE WHEN case_data->'{field}'->>'value' ~ '^-?[0-9]+(\\.[0-9]+)?$'
+                              THEN (case_data->'{field}'->>'value')::float END"""
+            for field in CORRECTION_FIELDS
+        )
+        cursor.execute(f"UPDATE cases SET {assignments}")
+        print(f"  ✓ 回填 {cursor.rowcount} 条案例")
+
+    print("\n✓ 迁移完成!")
+
+
+if __name__ == '__main__':
+    migrate()
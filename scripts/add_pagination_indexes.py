@@ -0,0 +1,31 @@
+"""
+添加列表分页索引（/kb/reports、/kb/cases 按 (create_time, id) 倒序的游标分页）
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.db_connection import pg_cursor
+
+
+def migrate():
+    """添加 documents / cases 的 (create_time DESC, id DESC) 索引"""
+
+    with pg_cursor() as cursor:
+        print("正在创建分页索引...")
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_documents_create_time_id ON documents(create_time DESC, id DESC)
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cases_create_time_id ON cases(create_time DESC, id DESC)
+        """)
+
+        print("  ✓ 分页索引创建完成")
+
+    print("\n✓ 迁移完成!")
+
+
+if __name__ == '__main__':
+    migrate()
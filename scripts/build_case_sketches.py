@@ -0,0 +1,32 @@
+"""
+创建并回填分布草图表（单价/修正系数分位数，供审查对比）
+
+需先执行 add_correction_columns.py
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_base.db_connection import pg_cursor
+from knowledge_base.kb_manager_db import KnowledgeBaseManager
+from knowledge_base.quantile_sketch import CASE_SKETCHES_DDL
+
+
+def migrate():
+    """创建 case_sketches 表并从 cases 表全量重建"""
+
+    with pg_cursor() as cursor:
+        print("正在创建 case_sketches 表...")
+        cursor.execute(CASE_SKETCHES_DDL)
+        print("  ✓ case_sketches 表创建完成")
+
+    print("正在重建分布草图...")
+    kb = KnowledgeBaseManager(enable_vector=False)
+    count = kb.rebuild_sketches()
+    print(f"  ✓ 写入 {count} 个草图")
+
+    print("\n✓ 迁移完成!")
+
+
+if __name__ == '__main__':
+    migrate()
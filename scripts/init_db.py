@@ -13,7 +13,8 @@ load_dotenv()
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from knowledge_base.db_connection import get_pg_connection, get_milvus_collection, connect_milvus
+from knowledge_base.db_connection import get_pg_connection, MILVUS_CONFIG
+from knowledge_base.quantile_sketch import CASE_SKETCHES_DDL
 
 
 def init_postgresql():
@@ -58,7 +59,8 @@ def init_postgresql():
                            case_count INT DEFAULT 0,
                            create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                            update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                           metadata JSONB
+                           metadata JSONB,
+                           content_hash VARCHAR(64)
                            )
                        """)
         print("  ✓ documents 表")
@@ -117,6 +119,11 @@ def init_postgresql():
                        (
                            50
                        ),
+                           transaction_correction FLOAT,
+                           market_correction FLOAT,
+                           location_correction FLOAT,
+                           physical_correction FLOAT,
+                           rights_correction FLOAT,
                            case_data JSONB,
                            create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                            )
@@ -168,13 +175,22 @@ def init_postgresql():
                        """)
         print("  ✓ review_tasks 表")
 
+        # case_sketches 表（单价/修正系数分布草图，入库和删除时增量更新）
+        cursor.execute(CASE_SKETCHES_DDL)
+        print("  ✓ case_sketches 表")
+
         # 索引
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_report_type ON documents(report_type)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_file_path ON documents(file_path)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_doc_id ON cases(doc_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_district ON cases(district)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_usage ON cases(usage)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_area ON cases(area)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_price ON cases(price)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_report_type ON cases(report_type)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_create_time_id ON documents(create_time DESC, id DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_create_time_id ON cases(create_time DESC, id DESC)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_tasks_status ON review_tasks(status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_tasks_create_time ON review_tasks(create_time DESC)")
         print("  ✓ 索引创建完成")
@@ -198,39 +214,15 @@ def init_postgresql():
 
 
 def init_milvus():
-    """初始化 Milvus Collection"""
+    """初始化 Milvus Collection（版本集合 + 检索别名）"""
     print("\n初始化 Milvus...")
 
     try:
-        connect_milvus()
-        from pymilvus import Collection, FieldSchema, CollectionSchema, DataType, utility
-
-        config = get_milvus_collection()
-        collection_name = config['collection']
-
-        if utility.has_collection(collection_name):
-            print(f"  Collection '{collection_name}' 已存在")
-            return
-
-        fields = [
-            FieldSchema(name="case_id", dtype=DataType.VARCHAR, max_length=64, is_primary=True),
-            FieldSchema(name="doc_id", dtype=DataType.VARCHAR, max_length=64),
-            FieldSchema(name="report_type", dtype=DataType.VARCHAR, max_length=50),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=1024),
-        ]
-
-        schema = CollectionSchema(fields=fields, description="案例向量索引")
-        collection = Collection(name=collection_name, schema=schema)
-
-        # 创建索引
-        index_params = {
-            "metric_type": "IP",
-            "index_type": "IVF_FLAT",
-            "params": {"nlist": 128}
-        }
-        collection.create_index(field_name="embedding", index_params=index_params)
+        from knowledge_base.vector_store_milvus import MilvusVectorStore
 
-        print(f"  ✓ Collection '{collection_name}' 创建完成")
+        # 首次初始化时创建第一个版本集合并建立别名
+        store = MilvusVectorStore()
+        print(f"  ✓ Collection '{MILVUS_CONFIG['collection']}' -> {store.current_collection_name()}")
         print("Milvus 初始化完成")
 
     except Exception as e:
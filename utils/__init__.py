@@ -3,11 +3,18 @@
 from .helpers import (
     generate_id,
     get_timestamp,
+    file_content_hash,
     convert_doc_to_docx,
     detect_report_type,
     safe_float,
     safe_int,
 )
+from .doc_converter import (
+    DocConverterPool,
+    get_doc_converter,
+    close_doc_converter,
+    init_converter_worker,
+)
 from .llm_client import (
     LLMClient,
     get_llm_client,
@@ -16,10 +23,15 @@ from .llm_client import (
 __all__ = [
     'generate_id',
     'get_timestamp', 
+    'file_content_hash',
     'convert_doc_to_docx',
     'detect_report_type',
     'safe_float',
     'safe_int',
+    'DocConverterPool',
+    'get_doc_converter',
+    'close_doc_converter',
+    'init_converter_worker',
     'LLMClient',
     'get_llm_client',
 ]
@@ -0,0 +1,333 @@
+"""
+doc 转换服务
+============
+常驻 LibreOffice 实例池，将 .doc 转换为 .docx
+
+- 每个实例使用独立的用户配置目录，可并发转换（共享配置目录会互相加锁）
+- 安装了 python3-uno 时通过 UNO 连接常驻实例转换，省去每次冷启动的开销；
+  实例通过命名管道连接（管道名含进程号和随机串），多个进程各自建池不会冲突
+- 未安装 python3-uno 时每个文件都冷启动一次 soffice 子进程（仍使用各自的配置目录，可并发），
+  首次转换时给出警告；设置 KB_SOFFICE_REQUIRE_UNO=true 时直接报错
+- 转换结果按源文件内容哈希缓存，相同内容只转换一次
+"""
+
+import os
+import time
+import queue
+import uuid
+import shutil
+import atexit
+import tempfile
+import threading
+import subprocess
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from .helpers import file_content_hash
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    HAS_UNO = True
+except ImportError:
+    HAS_UNO = False
+
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOC_CONVERTER_CONFIG = {
+    'pool_size': int(os.getenv('KB_SOFFICE_POOL_SIZE', '2')),
+    'soffice_bin': os.getenv('KB_SOFFICE_BIN', ''),
+    'require_uno': os.getenv('KB_SOFFICE_REQUIRE_UNO', 'false').lower() == 'true',   # 未安装 python3-uno 时报错而不是逐个冷启动
+    'cache_dir': os.getenv('KB_DOC_CACHE_DIR', os.path.join(_BASE_DIR, 'data', 'doc_cache')),
+    'timeout': float(os.getenv('KB_SOFFICE_TIMEOUT', '120')),   # 单个文件转换超时（秒）
+}
+
+
+def _find_soffice() -> Optional[str]:
+    return DOC_CONVERTER_CONFIG['soffice_bin'] or shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def _property(name: str, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class SofficeInstance:
+    """单个 LibreOffice 实例（独立配置目录）"""
+
+    def __init__(self, index: int, soffice_bin: str, work_dir: str, timeout: float):
+        self.index = index
+        self.soffice_bin = soffice_bin
+        self.profile_dir = os.path.join(work_dir, f'profile_{index}')
+        self.pipe_name = f'kb_soffice_{os.getpid()}_{index}_{uuid.uuid4().hex[:8]}'
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+
+    @property
+    def profile_url(self) -> str:
+        return 'file://' + os.path.abspath(self.profile_dir)
+
+    def _start(self):
+        """启动常驻实例并建立 UNO 连接"""
+        self.process = subprocess.Popen([
+            self.soffice_bin,
+            f'-env:UserInstallation={self.profile_url}',
+            '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_ctx)
+
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if self.process.poll() is not None or time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice 实例 {self.index} 启动失败")
+                time.sleep(0.2)
+
+        self.desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+
+    def _is_alive(self) -> bool:
+        return self.desktop is not None and self.process is not None and self.process.poll() is None
+
+    def convert(self, src_path: str, out_dir: str) -> str:
+        """转换单个文件，返回输出的 docx 路径"""
+        out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(src_path))[0] + '.docx')
+
+        if not HAS_UNO:
+            # 无 UNO：每次启动子进程，但使用本实例的配置目录，可与其他实例并发
+            subprocess.run([
+                self.soffice_bin,
+                f'-env:UserInstallation={self.profile_url}',
+                '--headless', '--convert-to', 'docx', '--outdir', out_dir, src_path,
+            ], check=True, capture_output=True, timeout=self.timeout)
+            return out_path
+
+        if not self._is_alive():
+            self.stop()
+            self._start()
+
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(src_path)), '_blank', 0,
+                (_property('Hidden', True), _property('ReadOnly', True)))
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(out_path)),
+                               (_property('FilterName', 'MS Word 2007 XML'),))
+            finally:
+                doc.close(True)
+        except Exception:
+            # 实例可能已崩溃，下次使用时重启
+            self.stop()
+            raise
+        return out_path
+
+    def stop(self):
+        """关闭实例"""
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+            self.process = None
+
+
+class DocConverterPool:
+    """
+    LibreOffice 转换池
+
+    实例在第一次需要转换时才启动；缓存命中时不启动任何进程
+    """
+
+    def __init__(self, pool_size: int = None, cache_dir: str = None, soffice_bin: str = None,
+                 timeout: float = None):
+        self.pool_size = max(1, pool_size or DOC_CONVERTER_CONFIG['pool_size'])
+        self.cache_dir = cache_dir or DOC_CONVERTER_CONFIG['cache_dir']
+        self.soffice_bin = soffice_bin or _find_soffice()
+        self.timeout = timeout or DOC_CONVERTER_CONFIG['timeout']
+
+        self._work_dir: Optional[str] = None
+        self._instances: List[SofficeInstance] = []
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+
+        self._stats = {'converted': 0, 'cache_hits': 0, 'failed': 0}
+
+    def _ensure_instances(self):
+        with self._lock:
+            if self._instances:
+                return
+            if not HAS_UNO:
+                if DOC_CONVERTER_CONFIG['require_uno']:
+                    raise RuntimeError("未安装 python3-uno，无法使用常驻 LibreOffice 实例（KB_SOFFICE_REQUIRE_UNO=true）")
+                print("⚠️ 未安装 python3-uno：每个 doc 文件都会冷启动一次 soffice 进程，批量转换较慢")
+            # 临时配置目录在首次启动实例时才创建（只命中缓存的池不创建）
+            self._work_dir = tempfile.mkdtemp(prefix='kb_soffice_')
+            for i in range(self.pool_size):
+                instance = SofficeInstance(i, self.soffice_bin, self._work_dir, self.timeout)
+                self._instances.append(instance)
+                self._idle.put(instance)
+
+    def _cache_path(self, content_hash: str, doc_path: str) -> str:
+        # 保留原文件名：报告类型按文件名识别
+        base_name = os.path.splitext(os.path.basename(doc_path))[0]
+        return os.path.join(self.cache_dir, content_hash[:2], content_hash, f'{base_name}.docx')
+
+    def _lookup(self, cache_path: str) -> Optional[str]:
+        """查找缓存（同内容不同文件名时复用已有的转换结果）"""
+        if os.path.exists(cache_path):
+            return cache_path
+        entry_dir = os.path.dirname(cache_path)
+        if not os.path.isdir(entry_dir):
+            return None
+        for name in os.listdir(entry_dir):
+            if name.endswith('.docx'):
+                try:
+                    os.link(os.path.join(entry_dir, name), cache_path)
+                except OSError:
+                    shutil.copyfile(os.path.join(entry_dir, name), cache_path)
+                return cache_path
+        return None
+
+    def _count(self, name: str):
+        # convert_batch 多线程调用
+        with self._lock:
+            self._stats[name] += 1
+
+    def convert(self, doc_path: str) -> str:
+        """
+        将doc转换为docx（已是docx时原样返回）
+
+        Returns:
+            转换后的 docx 路径；转换失败时返回原路径
+        """
+        if not doc_path.lower().endswith('.doc'):
+            return doc_path
+
+        try:
+            cache_path = self._cache_path(file_content_hash(doc_path), doc_path)
+        except OSError as e:
+            print(f"   ⚠️ doc转换失败: {e}")
+            return doc_path
+
+        cached = self._lookup(cache_path)
+        if cached:
+            self._count('cache_hits')
+            return cached
+
+        if not self.soffice_bin:
+            print(f"   ⚠️ 未安装libreoffice，无法转换doc文件")
+            return doc_path
+
+        self._ensure_instances()
+        instance = self._idle.get()
+        out_dir = tempfile.mkdtemp(dir=self._work_dir)
+        try:
+            out_path = instance.convert(doc_path, out_dir)
+            if not os.path.exists(out_path):
+                raise RuntimeError("未生成 docx 文件")
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            os.replace(out_path, cache_path)
+            self._count('converted')
+            print(f"   ✓ 已将 {os.path.basename(doc_path)} 转换为 docx")
+            return cache_path
+        except Exception as e:
+            self._count('failed')
+            print(f"   ⚠️ doc转换失败: {e}")
+            return doc_path
+        finally:
+            self._idle.put(instance)
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def convert_batch(self, doc_paths: List[str]) -> Dict[str, str]:
+        """
+        批量转换（各实例并发）
+
+        Returns:
+            {原路径: 转换后路径}
+        """
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return dict(zip(doc_paths, executor.map(self.convert, doc_paths)))
+
+    def stats(self) -> Dict:
+        return {
+            'pool_size': self.pool_size,
+            'running': sum(1 for i in self._instances if i.process is not None),
+            'uno': HAS_UNO,
+            **self._stats,
+        }
+
+    def close(self):
+        """关闭所有实例并清理临时配置目录"""
+        with self._lock:
+            for instance in self._instances:
+                instance.stop()
+            self._instances = []
+            self._idle = queue.Queue()
+            work_dir, self._work_dir = self._work_dir, None
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ============================================================================
+# 全局转换池（按进程）
+# ============================================================================
+
+_converter: Optional[DocConverterPool] = None
+_converter_pid: Optional[int] = None
+_converter_lock = threading.Lock()
+
+
+def get_doc_converter() -> DocConverterPool:
+    """获取当前进程的转换池"""
+    global _converter, _converter_pid
+    pid = os.getpid()
+    if _converter is None or _converter_pid != pid:
+        with _converter_lock:
+            if _converter is None or _converter_pid != pid:
+                # fork 出的子进程不能复用父进程的实例
+                _converter = DocConverterPool()
+                _converter_pid = pid
+    return _converter
+
+
+def close_doc_converter():
+    """关闭当前进程的转换池"""
+    global _converter, _converter_pid
+    with _converter_lock:
+        if _converter is not None and _converter_pid == os.getpid():
+            _converter.close()
+        _converter = None
+        _converter_pid = None
+
+
+def init_converter_worker():
+    """
+    进程池工作进程的 initializer
+
+    ProcessPoolExecutor 的工作进程退出时不执行 atexit，改用 multiprocessing 的终结器关闭转换池
+    """
+    from multiprocessing.util import Finalize
+    Finalize(None, close_doc_converter, exitpriority=10)
+
+
+atexit.register(close_doc_converter)
@@ -2,17 +2,19 @@
 工具函数
 """
 
-import os
-import subprocess
 import hashlib
+import uuid
 from datetime import datetime
 from typing import Optional
 
 
 def generate_id(prefix: str = "doc") -> str:
-    """生成唯一ID"""
-    hash_str = hashlib.md5(f"{prefix}_{datetime.now().isoformat()}".encode()).hexdigest()[:12]
-    return f"{prefix}_{hash_str}"
+    """
+    生成唯一ID
+
+    使用随机UUID而不是当前时间，多进程/多线程在同一微秒内生成也不会冲突
+    """
+    return f"{prefix}_{uuid.uuid4().hex[:12]}"
 
 
 def get_timestamp() -> str:
@@ -20,39 +22,27 @@ def get_timestamp() -> str:
     return datetime.now().isoformat()
 
 
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的 SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def convert_doc_to_docx(doc_path: str) -> str:
     """
     将doc转换为docx
-    需要安装: sudo apt install libreoffice
+    需要安装: sudo apt install libreoffice（可选 python3-uno，常驻实例转换更快）
+
+    使用常驻 LibreOffice 转换池，结果按内容哈希缓存（见 utils.doc_converter）
     """
     if not doc_path.lower().endswith('.doc'):
         return doc_path
-    
-    # 检查是否已有docx
-    docx_path = doc_path + 'x'
-    if os.path.exists(docx_path):
-        return docx_path
-    
-    # 转换
-    output_dir = os.path.dirname(doc_path) or '.'
-    try:
-        subprocess.run([
-            'libreoffice', '--headless', '--convert-to', 'docx',
-            '--outdir', output_dir, doc_path
-        ], check=True, capture_output=True)
-        
-        base_name = os.path.splitext(os.path.basename(doc_path))[0]
-        converted_path = os.path.join(output_dir, f"{base_name}.docx")
-        
-        if os.path.exists(converted_path):
-            print(f"   ✓ 已将 {os.path.basename(doc_path)} 转换为 docx")
-            return converted_path
-    except FileNotFoundError:
-        print(f"   ⚠️ 未安装libreoffice，无法转换doc文件")
-    except Exception as e:
-        print(f"   ⚠️ doc转换失败: {e}")
-    
-    return doc_path
+
+    from .doc_converter import get_doc_converter
+    return get_doc_converter().convert(doc_path)
 
 
 def detect_report_type(filename: str) -> str: